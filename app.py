@@ -1,29 +1,126 @@
+import logging
 import os
-from flask import Flask, request, render_template, redirect, url_for, send_from_directory
+import base64
+import json
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from flask import (Flask, Request, request, render_template, redirect, url_for, send_from_directory, jsonify, g,
+                   Response, stream_with_context)
 from werkzeug.utils import secure_filename
 
 from finquery.analyzer import ReportAnalyzer
 from finquery.fetcher import DataFetcher
 from finquery.visualizer import DataVisualizer
-from finquery.database import DataBaseManager
+from finquery.database import DataBaseManager, JOB_STALE_SECONDS
+from finquery.retriever import ReportIndex, INDEX_VERSION, join_spans
+from finquery.pipeline import ReportPipeline, FAILED_SUMMARY_MARKERS
+from finquery.jobs import JobQueue
+from finquery.metrics import REGISTRY, HTTP_SECONDS, setup_logging
+from finquery.uploads import UploadSpool, cleanup_stale_spools, UPLOAD_MAX_MB, UPLOAD_SPOOL_DIR
+from finquery.symbols import default_symbol_master
 
-UPLOAD_FOLDER = 'uploads'
+logger = logging.getLogger(__name__)
+
+UPLOAD_FOLDER = UPLOAD_SPOOL_DIR
 STATIC_CHART_FOLDER = os.path.join("static", "charts")
 ALLOWED_EXTENSIONS = {"pdf"}
 
-# How many characters we pass to the AI (same as your main.py)
-AI_CHAR_LIMIT = 20000
+# Q&A context: how many of the best matching chunks, and at most how many characters in total
+QA_TOP_K = 8
+QA_CHAR_BUDGET = 12000
+
+# Report listing API: rows per page by default, and the most a client may ask for
+REPORT_PAGE_SIZE = int(os.environ.get("REPORT_PAGE_SIZE", 50))
+REPORT_PAGE_MAX = int(os.environ.get("REPORT_PAGE_MAX", 200))
+
+# Add a Server-Timing header with the handling time to every response
+METRICS_TIMING_HEADER = os.environ.get("METRICS_TIMING_HEADER", "0") == "1"
+
+
+class FinQueryRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # uploaded files are parsed straight into a hashing spool (memory first, temp file when big)
+        return UploadSpool()
+
+
+setup_logging()
 
 app = Flask(__name__)
+app.request_class = FinQueryRequest
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
+# the PDF plus a little room for the rest of the multipart form
+app.config["MAX_CONTENT_LENGTH"] = int(UPLOAD_MAX_MB * 1024 * 1024) + 64 * 1024
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(STATIC_CHART_FOLDER, exist_ok=True)
+cleanup_stale_spools(UPLOAD_FOLDER)
 
-analyzer = ReportAnalyzer()
-fetcher = DataFetcher()
-visualizer = DataVisualizer()
 db = DataBaseManager()
+jobs = JobQueue(db)
+# whichever server runs the app: jobs that stopped making progress lost their worker in a restart
+db.fail_unfinished_jobs(reason="abandoned: no progress", older_than=JOB_STALE_SECONDS)
+
+# API clients are built on first use: workers boot fast, and a missing key only
+# breaks the feature that needs it instead of the whole app
+_clients = {}
+_clients_lock = threading.RLock()  # re-entrant: get_pipeline() builds the other clients
+
+
+def _client(name, factory):
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = factory()
+    return client
+
+
+def get_analyzer():
+    return _client("analyzer", ReportAnalyzer)
+
+
+def get_fetcher():
+    return _client("fetcher", DataFetcher)
+
+
+def get_visualizer():
+    return _client("visualizer", lambda: DataVisualizer(charts_in_use=db.chart_files_in_use))
+
+
+def get_pipeline():
+    return _client("pipeline", lambda: ReportPipeline(get_analyzer(), get_fetcher(), get_visualizer(),
+                                                      db, STATIC_CHART_FOLDER))
+
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_time(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        # endpoint name, not the path: report ids and chart names would explode the label set
+        HTTP_SECONDS.observe(elapsed, endpoint=request.endpoint or "unmatched", method=request.method,
+                             status=response.status_code)
+        if METRICS_TIMING_HEADER:
+            response.headers["Server-Timing"] = f"app;dur={elapsed * 1000:.1f}"
+    return response
+
+
+@app.teardown_request
+def release_upload_spools(error=None):
+    """Drop every uploaded file no job claimed: rejected uploads, duplicates, errors, other routes."""
+    # only if the form was parsed; request.files would otherwise read the body now
+    files = request.__dict__.get("files")
+    for storage in (files.values() if files else ()):
+        if isinstance(storage.stream, UploadSpool) and not storage.stream.claimed:
+            storage.stream.release()
+
 
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -44,93 +141,123 @@ def upload():
         return redirect(url_for("index"))
 
     filename = secure_filename(file.filename)
-    save_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-    file.save(save_path)
-
-    # 1) Extract text (full text kept in variable, but we will store a bounded version)
-    pdf_text = analyzer.extract_text_from_pdf(save_path) or ""
-
-    # Keep a bounded stored version (so DB doesn't grow huge). Store first + last portions.
-    MAX_STORE = 350000
-    if len(pdf_text) > MAX_STORE:
-        prefix = pdf_text[:175000]
-        suffix = pdf_text[-175000:]
-        pdf_text_to_store = prefix + "\n\n....(truncated middle)....\n\n" + suffix
-    else:
-        pdf_text_to_store = pdf_text
-
-    ai_text = pdf_text[:AI_CHAR_LIMIT] + "\n\n" + pdf_text[-3000:]
+    spool = file.stream  # an UploadSpool (see FinQueryRequest): hashed while it was received
+    if not spool.looks_like_pdf():
+        logger.debug("[Upload] '%s' is not a PDF", filename)
+        return redirect(url_for("index"))
 
+    # 0) Dedup: the same document (even under another filename) maps to the same hash
+    content_hash = spool.hexdigest()
+    existing_id = db.find_report_by_hash(content_hash)
+    if existing_id:
+        logger.debug("[Upload] '%s' already analyzed as report %s", filename, existing_id)
+        job = db.get_job(report_id=existing_id)
+        if job and job["status"] in ("queued", "running"):
+            job_id = job["id"]
+        else:
+            stale = stale_stages(existing_id)
+            job_id = submit_refresh(existing_id, stale, spool) if stale else None
+        return upload_response(existing_id, job_id)
 
-    try:
-        summary = analyzer.summarize_text(ai_text)
-    except Exception as e:
-        print("Summary AI failed:", e)
-        summary = "Summary unavailable (AI error)."
+    # The report row exists from the start; the background job fills it in stage by stage
+    report_id = db.save_report({"ticker": "PENDING", "summary": ""})
+    if not report_id:
+        return "Could not create report", 500
 
+    # the PDF's bytes (small uploads) or its spool file path; both are dropped once the job ends
+    source = spool.source()
 
-    try:
-        company_info = analyzer.get_competitors(ai_text)
-        main_ticker = company_info.get("main_ticker", "UNKNOWN")
-        competitors = company_info.get("competitors", []) or []
-    except Exception as e:
-        print("Competitor detection AI failed:", e)
-        main_ticker = "UNKNOWN"
-        competitors = []
-
-    # 4) Fetch competitor data (simple loop / fetcher helper)
-    competitor_rows = []
-    if competitors:
+    def analyze(job):
         try:
-            # use existing fetcher method (should handle per-ticker errors)
-            competitor_rows = fetcher.get_competitor_stats(competitors)
-        except Exception as e:
-            print("get_competitor_stats failed:", e)
-            # fallback: try single-company overviews
-            competitor_rows = []
-            for t in competitors:
-                try:
-                    info = fetcher.get_company_overview(t)
-                    competitor_rows.append({"ticker": t, "info": info})
-                except Exception:
-                    competitor_rows.append({"ticker": t, "info": None})
-
-    # 5) Extract financial table and create chart (pass limited text to AI)
-    chart_filename = ""
-    try:
-        chart_data = analyzer.extract_financial_table(ai_text) or {}
-    except Exception as e:
-        print("Table extraction AI failed:", e)
-        chart_data = {}
-
-    if chart_data:
-        keys = list(chart_data.keys())
-        if keys and str(keys[0]).upper().startswith("Q"):
-            chart_title = "Quarterly Revenue (Cr)"
-        else:
-            chart_title = "Annual Revenue (Cr)"
+            # only a readable PDF is worth deduplicating against
+            get_pipeline().run(report_id, source, progress=job,
+                               on_extracted=lambda: db.save_pdf_hash(content_hash, report_id))
+        except Exception:
+            # let the next upload of this file try again from scratch
+            db.delete_pdf_hash(content_hash, report_id)
+            db.fail_placeholder_report(report_id)
+            raise
+
+    spool.claim()
+    job_id = jobs.submit(analyze, report_id, cleanup=spool.release)
+    return upload_response(report_id, job_id)
+
+
+@app.errorhandler(413)
+def upload_too_large(error):
+    message = f"PDF uploads are limited to {UPLOAD_MAX_MB:.0f} MB."
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify({"error": message}), 413
+    return message, 413
+
+
+def upload_response(report_id, job_id):
+    """202 + job info for API clients, otherwise straight to the (filling-in) report page."""
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify({
+            "job_id": job_id,
+            "report_id": report_id,
+            "status_url": url_for("job_status", job_id=job_id) if job_id else None,
+            "report_url": url_for("view_report", report_id=report_id),
+        }), 202
+    return redirect(url_for("view_report", report_id=report_id))
 
-        chart_filename = f"{main_ticker}_revenue_chart.png"
-        chart_path = os.path.join(STATIC_CHART_FOLDER, chart_filename)
+
+def load_report_index(report_id):
+    """Load a report's Q&A index, building it on the fly for reports saved before indexing existed."""
+    payload = db.get_report_index(report_id, INDEX_VERSION)
+    if payload:
         try:
-            visualizer.create_bar_chart(chart_data, chart_title, chart_path)
+            return ReportIndex.from_bytes(payload)
         except Exception as e:
-            print("Chart creation failed:", e)
-            chart_filename = ""
-
-    # 6) Build report dict and save to DB
-    report = {
-        "ticker": main_ticker,
-        "summary": summary,
-        "competitors": competitors,
-        "competitor_rows": competitor_rows,
-        # chart path referenced relative to /static/
-        "chart_filename": f"charts/{chart_filename}" if chart_filename else "",
-        "pdf_text": pdf_text_to_store
-    }
-
-    report_id = db.save_report(report)
-    return redirect(url_for("view_report", report_id=report_id))
+            logger.warning("[Index] Stored index for report %s is unreadable: %s", report_id, e)
+    text = db.get_report_text(report_id)
+    if not text:
+        return None
+    return get_pipeline().build_report_index(report_id, text)
+
+
+def stale_stages(report_id):
+    """Pipeline stages of a stored report that failed or came back empty, to re-run on a duplicate upload."""
+    rec = db.get_report(report_id)
+    if not rec or not rec.get("has_text"):
+        return set()
+    stale = set(db.get_failed_stages(report_id))
+    # reports analyzed before stage failures were recorded: only a failed summary is recognizable
+    summary = rec.get("summary") or ""
+    if not summary or summary.startswith(FAILED_SUMMARY_MARKERS):
+        stale.add("summary")
+    return stale
+
+
+def submit_refresh(report_id, stages, spool):
+    """Queue a job re-running only the given stages of a stored report; returns the job id."""
+    source = spool.source()  # the same bytes: lets the local table reader see the page layout
+
+    def refresh(job):
+        get_pipeline().refresh(report_id, stages, pdf_path=source, progress=job)
+
+    spool.claim()
+    return jobs.submit(refresh, report_id, cleanup=spool.release)
+
+
+def qa_context(report_id, question):
+    """
+    Only the chunks most relevant to the question go to the AI;
+    just the pages containing them are read from the DB.
+    """
+    index = load_report_index(report_id)
+    if index is not None:
+        spans = index.select_spans(question, QA_CHAR_BUDGET, QA_TOP_K)
+    else:
+        spans = [(0, QA_CHAR_BUDGET)]
+    return join_spans(db.read_text_spans(report_id, spans))
+
+
+def sse_event(data, event=None):
+    """One server-sent event; data is JSON so newlines in the answer survive the framing."""
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data)}\n\n"
 
 
 @app.route("/report/<int:report_id>", methods=["GET", "POST"])
@@ -143,28 +270,183 @@ def view_report(report_id):
     if request.method == "POST":
         question = (request.form.get("question") or "").strip()
         if question:
-            full_text = rec.get("pdf_text", "") or ""
-            chunk_size = 20000 
+            context = qa_context(report_id, question)
+            try:
+                qa_answer = get_analyzer().answer_question(context, question)
+            except Exception as e:
+                logger.warning("QA AI failed: %s", e)
+                qa_answer = "AI answer currently unavailable."
+
+
+    job = db.get_job(report_id=report_id)
+    if job and job["status"] not in ("queued", "running"):
+        job = None
+    return render_template("report.html", report=rec, qa_answer=qa_answer, job=job)
+
 
-            if len(full_text) <= chunk_size * 3:
-                tri_text = full_text
-            else:
-               
-                start = full_text[:chunk_size]              
-                middle_index = len(full_text) // 2
-                middle = full_text[middle_index: middle_index + chunk_size]  
-                end = full_text[-chunk_size:]                 
+@app.route("/report/<int:report_id>/ask", methods=["GET"])
+def ask_stream(report_id):
+    """
+    Q&A answer streamed as server-sent events: "message" events carry {"text": piece},
+    then one "done" (or "error") event. If the streaming call fails before the first
+    piece, the answer is fetched with the normal blocking call and sent as one piece.
+    """
+    question = (request.args.get("question") or "").strip()
+    if not question:
+        return jsonify({"error": "question is required"}), 400
+    if not db.get_report(report_id):
+        return jsonify({"error": "report not found"}), 404
 
-                tri_text = start + "\n\n" + middle + "\n\n" + end
+    context = qa_context(report_id, question)
 
+    def generate():
+        yield ": stream open\n\n"  # first byte goes out before the model call starts
+        sent = False
+        try:
+            analyzer = get_analyzer()
+            for piece in analyzer.answer_question_stream(context, question):
+                sent = True
+                yield sse_event({"text": piece})
+        except Exception as e:
+            logger.warning("QA streaming failed: %s", e)
+            if sent:
+                yield sse_event({"message": "The answer was cut off. Please ask again."}, event="error")
+                return
             try:
-                qa_answer = analyzer.answer_question(tri_text, question)
+                answer = get_analyzer().answer_question(context, question)
             except Exception as e:
-                print("QA AI failed:", e)
-                qa_answer = "AI answer currently unavailable."
+                logger.warning("QA AI failed: %s", e)
+                answer = "AI answer currently unavailable."
+            yield sse_event({"text": answer})
+        yield sse_event({}, event="done")
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
-    return render_template("report.html", report=rec, qa_answer=qa_answer)
+@app.route("/report/<int:report_id>/competitors", methods=["GET"])
+def competitor_quotes(report_id):
+    """Current market data for a report's competitors (from the market cache, fetched on a miss)."""
+    rec = db.get_report(report_id)
+    if not rec:
+        return jsonify({"error": "report not found"}), 404
+    return jsonify({"report_id": report_id,
+                    "competitors": get_fetcher().get_competitor_stats(rec["competitors"] or [])})
+
+
+def encode_cursor(row):
+    """Opaque page token holding the sort key (analysis_date, id) of a page's last row."""
+    raw = json.dumps([row["analysis_date"], row["id"]]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    key = json.loads(raw)
+    if (not isinstance(key, list) or len(key) != 2 or not isinstance(key[0], str)
+            or not isinstance(key[1], int) or isinstance(key[1], bool)):
+        raise ValueError("malformed cursor")
+    return key[0], key[1]
+
+
+def parse_date_arg(value, end=False):
+    """
+    YYYY-MM-DD or an ISO timestamp, as the text stored in analysis_date (UTC, "YYYY-MM-DD HH:MM:SS").
+    A bare date used as the end of a range covers that whole day; timestamps with an offset are
+    converted to UTC, those without one are taken as UTC.
+    """
+    if len(value) == 10:
+        day = date.fromisoformat(value)
+        return (day + timedelta(days=1) if end else day).isoformat() + " 00:00:00"
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def canonical_ticker(value):
+    """Symbol as reports store it: names the symbol master knows ("Infosys") become their symbol."""
+    value = value.strip()
+    master = default_symbol_master()
+    listing = master.resolve(value) if master else None
+    return listing.symbol if listing else value.upper()
+
+
+def report_page(ticker=None, newest_first=True, extra=None):
+    """
+    One page of list_reports from the query string (since, until, cursor, limit) as a JSON
+    response (plus the extra fields); next_cursor goes back as ?cursor= for the following page.
+    """
+    try:
+        limit = min(max(int(request.args.get("limit", REPORT_PAGE_SIZE)), 1), REPORT_PAGE_MAX)
+        since = request.args.get("since")
+        since = parse_date_arg(since) if since else None
+        until = request.args.get("until")
+        until = parse_date_arg(until, end=True) if until else None
+        cursor = request.args.get("cursor")
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({"error": f"bad query parameter: {e}"}), 400
+
+    rows, has_more = db.list_reports(ticker=ticker, since=since, until=until, after=after, limit=limit,
+                                     newest_first=newest_first)
+    for row in rows:
+        chart = row.pop("chart_filename")
+        row["chart_url"] = url_for("static_files", filename=chart) if chart else ""
+        row["url"] = url_for("view_report", report_id=row["id"])
+    return jsonify({
+        **(extra or {}),
+        "reports": rows,
+        "next_cursor": encode_cursor(rows[-1]) if has_more else None,
+    })
+
+
+@app.route("/api/reports", methods=["GET"])
+def list_reports():
+    """Reports, newest first, optionally filtered by ?ticker= and a since/until date range."""
+    ticker = request.args.get("ticker")
+    return report_page(ticker=canonical_ticker(ticker) if ticker else None)
+
+
+@app.route("/api/tickers/<ticker>/reports", methods=["GET"])
+def ticker_history(ticker):
+    """Every analysis of one ticker, oldest first, to follow how its reports evolved."""
+    symbol = canonical_ticker(ticker)
+    return report_page(ticker=symbol, newest_first=request.args.get("order") == "desc",
+                       extra={"ticker": symbol})
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """Job progress plus whatever parts of the report are ready, for polling."""
+    job = db.get_job(job_id)
+    if not job:
+        return jsonify({"error": "job not found"}), 404
+
+    rec = db.get_report(job["report_id"]) if job["report_id"] else None
+    report = None
+    if rec:
+        report = {
+            "id": rec["id"],
+            "ticker": rec["ticker"],
+            "summary": rec["summary"],
+            "competitors": rec["competitors"],
+            "competitor_rows": rec["competitor_rows"],
+            "chart_url": url_for("static_files", filename=rec["chart_filename"]) if rec["chart_filename"] else "",
+        }
+    return jsonify({
+        "id": job["id"],
+        "status": job["status"],
+        "stages": job["stages"],
+        "error": job["error"],
+        "report": report,
+    })
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus scrape endpoint."""
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
 
 
 @app.route("/static/<path:filename>")
@@ -174,5 +456,7 @@ def static_files(filename):
 
 
 if __name__ == "__main__":
+    # single dev process: anything still "running" in the DB lost its worker thread
+    db.fail_unfinished_jobs()
     # disable reloader to avoid duplicate model calls in dev
     app.run(debug=True, use_reloader=False, port=5000)
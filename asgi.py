@@ -0,0 +1,145 @@
+"""
+ASGI entry point (async serving mode), for any ASGI server:
+
+    pip install uvicorn asgiref
+    uvicorn asgi:app --workers 2
+
+The endpoints that mostly wait on upstream services run as coroutines on the event loop:
+Q&A streaming (async Gemini client) and competitor quotes (pooled aiohttp session). Hundreds
+of them can be in flight per worker without holding a thread each. Every other route is the
+Flask app from app.py, run on threads through asgiref's WSGI adapter.
+"""
+import asyncio
+import json
+import logging
+import re
+import time
+from urllib.parse import parse_qs
+
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+
+import app as web
+from finquery.metrics import HTTP_SECONDS
+
+logger = logging.getLogger(__name__)
+
+wsgi_app = WsgiToAsgi(web.app)
+
+
+def query_param(scope, name):
+    values = parse_qs(scope.get("query_string", b"").decode("latin-1")).get(name)
+    return values[0] if values else None
+
+
+async def send_json(send, data, status=200):
+    body = json.dumps(data).encode("utf-8")
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+    return status
+
+
+async def ask_stream(scope, receive, send, report_id):
+    """Same events as app.ask_stream, with the answer streamed by the async model client."""
+    question = (query_param(scope, "question") or "").strip()
+    if not question:
+        return await send_json(send, {"error": "question is required"}, 400)
+    if not await asyncio.to_thread(web.db.get_report, report_id):
+        return await send_json(send, {"error": "report not found"}, 404)
+
+    context = await asyncio.to_thread(web.qa_context, report_id, question)
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"text/event-stream; charset=utf-8"), (b"cache-control", b"no-cache"),
+                            (b"x-accel-buffering", b"no")]})
+
+    async def emit(text, more=True):
+        await send({"type": "http.response.body", "body": text.encode("utf-8"), "more_body": more})
+
+    await emit(": stream open\n\n")  # first byte goes out before the model call starts
+    sent = False
+    try:
+        analyzer = web.get_analyzer()
+        async for piece in analyzer.answer_question_stream_async(context, question):
+            sent = True
+            await emit(web.sse_event({"text": piece}))
+    except Exception as e:
+        logger.warning("QA streaming failed: %s", e)
+        if sent:
+            await emit(web.sse_event({"message": "The answer was cut off. Please ask again."}, event="error"),
+                       more=False)
+            return 200
+        try:
+            answer = await web.get_analyzer().answer_question_async(context, question)
+        except Exception as e:
+            logger.warning("QA AI failed: %s", e)
+            answer = "AI answer currently unavailable."
+        await emit(web.sse_event({"text": answer}))
+    await emit(web.sse_event({}, event="done"), more=False)
+    return 200
+
+
+async def competitor_quotes(scope, receive, send, report_id):
+    """Same response as app.competitor_quotes, with the symbols fetched concurrently on the loop."""
+    rec = await asyncio.to_thread(web.db.get_report, report_id)
+    if not rec:
+        return await send_json(send, {"error": "report not found"}, 404)
+    rows = await web.get_fetcher().get_competitor_stats_async(rec["competitors"] or [])
+    return await send_json(send, {"report_id": report_id, "competitors": rows})
+
+
+# (method, path pattern, endpoint name for the metrics, handler); the first group is the report id
+ROUTES = [
+    ("GET", re.compile(r"^/report/(\d+)/ask$"), "ask_stream", ask_stream),
+    ("GET", re.compile(r"^/report/(\d+)/competitors$"), "competitor_quotes", competitor_quotes),
+]
+
+
+def warm_up():
+    """Build the API clients before the first request (the Gemini import alone takes ~1s)."""
+    try:
+        web.get_analyzer().model
+        web.get_fetcher()
+    except Exception as e:
+        logger.warning("[ASGI] Warm-up failed (%s); clients will be built on first use", e)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await asyncio.to_thread(warm_up)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            fetcher = web._clients.get("fetcher")
+            if fetcher is not None:
+                await fetcher.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+
+    if scope["type"] == "http":
+        for method, pattern, endpoint, handler in ROUTES:
+            match = pattern.match(scope["path"])
+            if match and scope["method"] == method:
+                started = time.perf_counter()
+                status = 500
+                try:
+                    status = await handler(scope, receive, send, int(match.group(1)))
+                finally:
+                    HTTP_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint, method=method,
+                                         status=status)
+                return
+
+    await run_wsgi(scope, receive, send)
+
+
+async def run_wsgi(scope, receive, send):
+    """Serve a request with the Flask app, on a thread of its own."""
+    # asgiref runs WSGI calls on one shared thread unless each request has its own context
+    async with ThreadSensitiveContext():
+        await wsgi_app(scope, receive, send)
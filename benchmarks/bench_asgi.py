@@ -0,0 +1,154 @@
+"""
+Concurrency benchmark for the ASGI entry point (asgi.py): many clients at once on the Q&A
+stream or the competitor quotes, served either by the native async routes or by the same
+Flask views through the WSGI bridge. Runs in-process on one event loop (no server needed),
+with the local fakes from benchmarks/fakes.py.
+
+    python benchmarks/bench_asgi.py                                  # 200 Q&A streams, both modes
+    python benchmarks/bench_asgi.py --endpoint competitors --clients 500 --mode native
+    python benchmarks/bench_asgi.py --llm-latency 2 --json
+
+Reports wall time, p50/p95 time to first byte and to the end of the response, and the peak
+number of threads, which is what the async routes save: the Flask views hold one per request.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUESTION = "What was the revenue growth this year?"
+PAGE_TEXT = ("The Company reported revenue from operations of 2,40,893 crore for FY24, up 6.8% over FY23. "
+             "Operating margin stood at 24.6% and net profit was 45,908 crore. ") * 20
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_e2e import percentile  # noqa: E402
+
+
+async def request(target, path, query=None):
+    """One GET through an ASGI callable; returns (status, seconds to first body byte, total seconds)."""
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+             "query_string": urlencode(query or {}).encode(), "headers": [(b"host", b"bench")],
+             "client": ("127.0.0.1", 0), "server": ("bench", 80)}
+    started = time.perf_counter()
+    result = {"status": None, "first": None}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+        elif message["type"] == "http.response.body" and message.get("body") and result["first"] is None:
+            result["first"] = time.perf_counter() - started
+
+    await target(scope, receive, send)
+    return result["status"], result["first"], time.perf_counter() - started
+
+
+async def run_mode(target, path, query, clients):
+    peak = threading.active_count()
+    done = asyncio.Event()
+
+    async def watch_threads():
+        nonlocal peak
+        while not done.is_set():
+            peak = max(peak, threading.active_count())
+            await asyncio.sleep(0.01)
+
+    watcher = asyncio.ensure_future(watch_threads())
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(request(target, path, query) for _ in range(clients)))
+    wall = time.perf_counter() - started
+    done.set()
+    await watcher
+
+    firsts = [r[1] for r in responses if r[1] is not None]
+    totals = [r[2] for r in responses]
+    return {
+        "wall_s": wall,
+        "failures": sum(1 for r in responses if r[0] != 200),
+        "first_byte_p50_s": percentile(firsts, 50), "first_byte_p95_s": percentile(firsts, 95),
+        "total_p50_s": percentile(totals, 50), "total_p95_s": percentile(totals, 95),
+        "peak_threads": peak,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", choices=["ask", "competitors"], default="ask")
+    parser.add_argument("--mode", choices=["native", "wsgi", "both"], default="both")
+    parser.add_argument("--clients", type=int, default=200, help="concurrent requests")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="seconds per fake Gemini call")
+    parser.add_argument("--market-latency", type=float, default=0.5, help="seconds per fake market data call")
+    parser.add_argument("--jitter", type=float, default=0.2, help="+/- fraction of the latency, seeded")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="show the app's own log lines")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="finquery_bench_asgi_")
+    os.environ.update({
+        "GOOGLE_API_KEY": "offline-benchmark",
+        "ALPHA_VANTAGE_KEY": "offline-benchmark",
+        "REPORTS_DB": os.path.join(workdir, "reports.db"),
+        "LOG_LEVEL": "DEBUG" if args.verbose else "ERROR",
+        "LLM_CACHE": "0",
+        "ALPHA_VANTAGE_PER_MINUTE": os.environ.get("ALPHA_VANTAGE_PER_MINUTE", "1000000"),
+        "ALPHA_VANTAGE_PER_DAY": os.environ.get("ALPHA_VANTAGE_PER_DAY", "1000000"),
+    })
+    sys.path.insert(0, ROOT)
+    import fakes
+    fakes.install(args.llm_latency, args.market_latency, args.jitter, args.seed)
+
+    os.chdir(workdir)
+    try:
+        import asgi
+
+        report_id = asgi.web.db.save_report({"ticker": fakes.MAIN_TICKER, "summary": "",
+                                             "competitors": fakes.COMPETITORS})
+        asgi.web.db.save_report_pages(report_id, [PAGE_TEXT] * 5)
+        asgi.warm_up()
+        path = f"/report/{report_id}/{'ask' if args.endpoint == 'ask' else 'competitors'}"
+        query = {"question": QUESTION} if args.endpoint == "ask" else None
+
+        modes = ["native", "wsgi"] if args.mode == "both" else [args.mode]
+        results = {}
+        for mode in modes:
+            print(f"--- [Bench] {mode}: {args.clients} x GET {path} ---")
+            target = asgi.app if mode == "native" else asgi.run_wsgi
+            asgi.web.get_fetcher().cache.clear()  # each mode starts with a cold market cache
+            results[mode] = asyncio.run(run_mode(target, path, query, args.clients))
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = {
+        "config": {k: getattr(args, k) for k in ("endpoint", "clients", "llm_latency", "market_latency",
+                                                  "jitter", "seed")},
+        "modes": results,
+        "fake_calls": fakes.calls.snapshot(),
+    }
+    if args.json:
+        print(json.dumps(output, indent=2))
+        return output
+
+    print(f"\n{args.clients} concurrent {args.endpoint} requests")
+    print(f"  {'mode':<8}{'wall s':>9}{'first p50':>11}{'first p95':>11}{'total p50':>11}{'total p95':>11}"
+          f"{'threads':>9}{'failed':>8}")
+    for mode, r in results.items():
+        print(f"  {mode:<8}{r['wall_s']:>9.2f}{r['first_byte_p50_s'] or 0:>11.3f}{r['first_byte_p95_s'] or 0:>11.3f}"
+              f"{r['total_p50_s']:>11.3f}{r['total_p95_s']:>11.3f}{r['peak_threads']:>9}{r['failures']:>8}")
+    print("fake calls: " + ", ".join(f"{k}={v}" for k, v in sorted(output["fake_calls"].items())))
+    return output
+
+
+if __name__ == "__main__":
+    main()
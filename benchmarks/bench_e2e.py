@@ -0,0 +1,237 @@
+"""
+Offline end-to-end benchmark: upload -> background analysis -> report page -> Q&A,
+driven through the Flask test client with local fakes for Gemini, yfinance and
+Alpha Vantage (see benchmarks/fakes.py). No API keys or network needed.
+
+Reports p50/p95 per pipeline stage and per request, plus peak memory.
+
+    python benchmarks/bench_e2e.py                          # TCS sample report, 5 iterations
+    python benchmarks/bench_e2e.py --synthetic-pages 200,1000 --iterations 3
+    python benchmarks/bench_e2e.py --llm-latency 0 --market-latency 0 --json
+
+Every iteration uploads a byte-wise different copy of the PDF (a trailing comment), so the
+duplicate-upload shortcut never kicks in. The LLM response cache is off unless --llm-cache
+is given; the market data cache stays on, as in production (the first iteration pays for it).
+"""
+import argparse
+import io
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_PDF = os.path.join(ROOT, "Reports for testing", "tcs_report.pdf")
+QUESTION = "What was the revenue growth this year?"
+
+STAGE_ORDER = ["extract", "summary", "company_info", "competitor_rows", "chart_data", "chart", "index"]
+REQUEST_ORDER = ["upload_request", "analysis_total", "report_page", "qa_request", "qa_stream_first_token",
+                 "qa_stream_total"]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile (no interpolation, so p95 of 5 samples is the max)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and of reaped children (extraction workers), in MB."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None, None
+    scale = 1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0  # bytes on macOS, KB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return own, children
+
+
+def make_synthetic_pdf(path, pages):
+    """Annual-report-like PDF: dense paragraphs with numbers, a revenue table every few pages."""
+    import fitz
+
+    paragraph = ("The Company reported consolidated revenue of {rev:,} crore for the year, an increase of "
+                 "{growth}% over the previous year. Operating margin stood at {margin}% while net profit "
+                 "was {profit:,} crore. Segment {seg} contributed {share}% of revenue, driven by deal wins "
+                 "across banking, retail and manufacturing clients. ")
+    doc = fitz.open()
+    for page_no in range(pages):
+        page = doc.new_page()
+        lines = []
+        for i in range(6):
+            n = page_no * 7 + i
+            lines.append(paragraph.format(rev=150000 + n * 37, growth=3 + n % 9, margin=20 + n % 7,
+                                          profit=30000 + n * 11, seg=n % 5 + 1, share=10 + n % 30))
+        if page_no % 5 == 0:
+            lines.append("Revenue from operations (crore)  FY21 164,177  FY22 191,754  FY23 225,458  FY24 240,893")
+        page.insert_textbox(fitz.Rect(40, 40, 555, 800), "\n\n".join(lines), fontsize=8)
+    doc.save(path)
+    doc.close()
+
+
+def run_scenario(client, name, pdf_bytes, iterations, poll_interval, timeout):
+    samples = {}
+
+    def record(key, seconds):
+        samples.setdefault(key, []).append(seconds)
+
+    failures = 0
+    for i in range(iterations):
+        payload = pdf_bytes + f"\n%bench {name} {i} {time.time_ns()}\n".encode()
+
+        t0 = time.perf_counter()
+        resp = client.post("/upload", data={"pdf_file": (io.BytesIO(payload), f"{name}-{i}.pdf")},
+                           headers={"Accept": "application/json"}, content_type="multipart/form-data")
+        record("upload_request", time.perf_counter() - t0)
+        if resp.status_code != 202:
+            print(f"--- [Bench] Upload failed with HTTP {resp.status_code} ---")
+            failures += 1
+            continue
+        info = resp.get_json()
+
+        deadline = time.monotonic() + timeout
+        status = {"status": "queued"}
+        while status["status"] in ("queued", "running") and time.monotonic() < deadline:
+            time.sleep(poll_interval)
+            status = client.get(info["status_url"]).get_json()
+        record("analysis_total", time.perf_counter() - t0)
+        if status["status"] != "done":
+            print(f"--- [Bench] Job ended as '{status['status']}': {status.get('error')} ---")
+            failures += 1
+        for stage, detail in (status.get("stages") or {}).items():
+            if detail.get("seconds") is not None:
+                record(stage, detail["seconds"])
+
+        t1 = time.perf_counter()
+        client.get(info["report_url"])
+        record("report_page", time.perf_counter() - t1)
+
+        t2 = time.perf_counter()
+        client.post(info["report_url"], data={"question": QUESTION})
+        record("qa_request", time.perf_counter() - t2)
+
+        # same question over SSE (a different question string, so the LLM cache cannot serve it)
+        t3 = time.perf_counter()
+        resp = client.get(info["report_url"] + "/ask", query_string={"question": f"{QUESTION} ({i})"},
+                          buffered=False)
+        first = None
+        for chunk in resp.response:
+            if first is None and chunk.startswith(b"data:"):
+                first = time.perf_counter() - t3
+        resp.close()
+        record("qa_stream_total", time.perf_counter() - t3)
+        if first is not None:
+            record("qa_stream_first_token", first)
+
+    return samples, failures
+
+
+def summarize(samples):
+    keys = [k for k in STAGE_ORDER + REQUEST_ORDER if k in samples]
+    keys += sorted(k for k in samples if k not in keys)
+    return {k: {"n": len(samples[k]), "p50": percentile(samples[k], 50), "p95": percentile(samples[k], 95)}
+            for k in keys}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--pdf", action="append", help="PDF to benchmark (repeatable; default: the TCS sample)")
+    parser.add_argument("--synthetic-pages", default="", help="comma-separated page counts of generated PDFs")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per fake Gemini call")
+    parser.add_argument("--market-latency", type=float, default=0.15, help="seconds per fake yfinance/Alpha Vantage call")
+    parser.add_argument("--jitter", type=float, default=0.2, help="+/- fraction of the latency, seeded")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-cache", action="store_true", help="keep the LLM response cache on")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report peak Python heap (slower)")
+    parser.add_argument("--timeout", type=float, default=300, help="max seconds to wait for one analysis")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary work directory")
+    parser.add_argument("--verbose", action="store_true", help="show the app's own log lines")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="finquery_bench_")
+    os.environ.update({
+        "GOOGLE_API_KEY": "offline-benchmark",
+        "ALPHA_VANTAGE_KEY": "offline-benchmark",
+        "REPORTS_DB": os.path.join(workdir, "reports.db"),
+        "LOG_LEVEL": "DEBUG" if args.verbose else "ERROR",
+        "LLM_CACHE": "1" if args.llm_cache else "0",
+        # the limiter would otherwise stall the run after 5 fake Alpha Vantage calls
+        "ALPHA_VANTAGE_PER_MINUTE": os.environ.get("ALPHA_VANTAGE_PER_MINUTE", "1000"),
+        "ALPHA_VANTAGE_PER_DAY": os.environ.get("ALPHA_VANTAGE_PER_DAY", "100000"),
+    })
+
+    scenarios = [(os.path.splitext(os.path.basename(p))[0], p) for p in (args.pdf or [SAMPLE_PDF])]
+    for pages in filter(None, (s.strip() for s in args.synthetic_pages.split(","))):
+        path = os.path.join(workdir, f"synthetic_{pages}p.pdf")
+        make_synthetic_pdf(path, int(pages))
+        scenarios.append((f"synthetic-{pages}p", path))
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, ROOT)
+    import fakes
+    fakes.install(args.llm_latency, args.market_latency, args.jitter, args.seed)
+
+    # uploads/ and static/charts/ are relative to the working directory
+    os.chdir(workdir)
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    try:
+        import app as finquery_app
+        client = finquery_app.app.test_client()
+        results = {}
+        for name, path in scenarios:
+            with open(path, "rb") as f:
+                pdf_bytes = f.read()
+            print(f"--- [Bench] {name}: {len(pdf_bytes) / 1e6:.1f} MB x {args.iterations} ---")
+            samples, failures = run_scenario(client, name, pdf_bytes, args.iterations,
+                                             poll_interval=0.02, timeout=args.timeout)
+            results[name] = {"failures": failures, "timings": summarize(samples)}
+        finquery_app.jobs.shutdown()
+        analyzer = finquery_app._clients.get("analyzer")
+        if analyzer is not None:
+            analyzer.extractor.shutdown()  # reap the workers so their peak RSS is counted
+    finally:
+        os.chdir(ROOT)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    rss, child_rss = peak_rss_mb()
+    memory = {"peak_rss_mb": rss, "peak_child_rss_mb": child_rss}
+    if args.tracemalloc:
+        memory["peak_python_heap_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    output = {
+        "config": {k: getattr(args, k) for k in ("iterations", "llm_latency", "market_latency", "jitter",
+                                                  "seed", "llm_cache")},
+        "scenarios": results,
+        "memory": memory,
+        "fake_calls": fakes.calls.snapshot(),
+    }
+
+    if args.json:
+        print(json.dumps(output, indent=2))
+        return output
+
+    for name, result in results.items():
+        print(f"\n{name} ({args.iterations} iterations, {result['failures']} failed)")
+        print(f"  {'stage':<24}{'p50 ms':>10}{'p95 ms':>10}")
+        for key, t in result["timings"].items():
+            print(f"  {key:<24}{t['p50'] * 1000:>10.1f}{t['p95'] * 1000:>10.1f}")
+    print("\nmemory: " + ", ".join(f"{k} {v:.1f}" for k, v in memory.items() if v is not None))
+    print("fake calls: " + ", ".join(f"{k}={v}" for k, v in sorted(output["fake_calls"].items())))
+    return output
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Cold-start benchmark: import time of app.py and time to the first served request.
+
+Every run happens in a fresh interpreter so nothing is warm in sys.modules.
+
+    python benchmarks/bench_startup.py            # 5 runs, median + worst
+    python benchmarks/bench_startup.py --runs 10 --json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child interpreter; prints one JSON line with the timings.
+CHILD = r"""
+import json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+client = app.app.test_client()
+resp = client.get("/")
+t2 = time.perf_counter()
+assert resp.status_code == 200, resp.status_code
+import sys
+heavy = [m for m in ("google.generativeai", "yfinance", "matplotlib", "fitz", "requests") if m in sys.modules]
+print(json.dumps({"import_s": t1 - t0, "first_request_s": t2 - t1, "total_s": t2 - t0, "heavy_modules": heavy}))
+"""
+
+
+def run_once(env):
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ)
+    env.setdefault("REPORTS_DB", os.path.join(tempfile.gettempdir(), "finquery_bench_startup.db"))
+    env["PYTHONWARNINGS"] = "ignore"
+
+    runs = [run_once(env) for _ in range(args.runs)]
+    result = {"runs": args.runs, "heavy_modules_loaded": runs[-1]["heavy_modules"]}
+    for key in ("import_s", "first_request_s", "total_s"):
+        values = [r[key] for r in runs]
+        result[key] = {"median": statistics.median(values), "max": max(values)}
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"cold start over {args.runs} runs (median / worst):")
+        for key, label in (("import_s", "import app"), ("first_request_s", "first request"), ("total_s", "total")):
+            print(f"  {label:<14} {result[key]['median'] * 1000:8.1f} ms / {result[key]['max'] * 1000:8.1f} ms")
+        print(f"  heavy modules loaded at boot: {', '.join(result['heavy_modules_loaded']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Deterministic local stand-ins for the external services, used by the benchmarks.
+
+install() puts fake `google.generativeai`, `yfinance`, `requests` and `aiohttp` modules into
+sys.modules, so the app's lazy imports pick them up instead of the network clients.
+Every call sleeps for a configurable latency (with seeded jitter) to mimic the real
+round-trips; answers depend only on the prompt / symbol, so runs are repeatable.
+"""
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+import types
+
+# Symbols the fake yfinance knows (as .NS tickers); anything else falls through to Alpha Vantage
+NSE_SYMBOLS = {"TCS", "INFY", "WIPRO", "HCLTECH", "TECHM"}
+
+MAIN_TICKER = "TCS"
+COMPETITORS = ["INFY", "WIPRO", "ACN"]
+REVENUE = {"FY21": 164177, "FY22": 191754, "FY23": 225458, "FY24": 240893}
+
+
+class Latency:
+    """Sleep for base seconds +/- jitter (fraction of base), from a seeded RNG shared by all threads."""
+
+    def __init__(self, base, jitter=0.2, seed=0):
+        self.base = base
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if self.base <= 0:
+            return
+        with self._lock:
+            factor = 1.0 + self._rng.uniform(-self.jitter, self.jitter)
+        time.sleep(self.base * factor)
+
+    def wait_fraction(self, fraction):
+        if self.base > 0:
+            time.sleep(self.base * fraction)
+
+    async def wait_async(self, fraction=1.0):
+        """wait() for coroutines: the same delay, without blocking the event loop."""
+        if self.base <= 0:
+            return
+        with self._lock:
+            factor = 1.0 + self._rng.uniform(-self.jitter, self.jitter)
+        await asyncio.sleep(self.base * factor * fraction)
+
+
+class Calls:
+    """Thread-safe call counters per fake service."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    def add(self, name):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+calls = Calls()
+
+
+# ======================Gemini====================================================================================
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+def fake_answer(prompt):
+    """Canned model output, picked from the prompt the same way the analyzer builds them."""
+    if "main_ticker" in prompt:
+        return json.dumps({"main_ticker": MAIN_TICKER, "competitors": COMPETITORS})
+    if "revenue figures" in prompt:
+        return "```json\n" + json.dumps(REVENUE) + "\n```"
+    if "SECTION TEXT" in prompt:
+        return "- Revenue: ₹2,40,893 crore, up 6.8%\n- Operating margin: 24.6%"
+    if "USER QUESTION" in prompt:
+        return ("Revenue grew 7% to ₹2,40,893 crore.\n"
+                "Details:\n- Revenue: ₹2,40,893 crore — up 6.8% YoY.\n- Operating margin: 24.6%.")
+    bullet = ("- Headline: Revenue kept growing.\n"
+              "  Details:\n  • Revenue: ₹2,40,893 crore\n  • Growth: 6.8%\n")
+    return bullet * 5
+
+
+def make_genai_module(latency):
+    module = types.ModuleType("google.generativeai")
+
+    class GenerativeModel:
+        def __init__(self, model_name, *args, **kwargs):
+            self.model_name = model_name
+
+        def generate_content(self, prompt, *args, stream=False, **kwargs):
+            calls.add("gemini")
+            text = fake_answer(str(prompt))
+            if stream:
+                return self._stream(text)
+            latency.wait()
+            return _Response(text)
+
+        @staticmethod
+        def _stream(text, pieces=8):
+            # the latency is spread over the pieces, like tokens arriving over time
+            step = max(1, -(-len(text) // pieces))
+            for i in range(0, len(text), step):
+                latency.wait_fraction(1.0 / pieces)
+                yield _Response(text[i:i + step])
+
+        async def generate_content_async(self, prompt, *args, stream=False, **kwargs):
+            calls.add("gemini")
+            text = fake_answer(str(prompt))
+            if stream:
+                return self._stream_async(text)
+            await latency.wait_async()
+            return _Response(text)
+
+        @staticmethod
+        async def _stream_async(text, pieces=8):
+            step = max(1, -(-len(text) // pieces))
+            for i in range(0, len(text), step):
+                await latency.wait_async(1.0 / pieces)
+                yield _Response(text[i:i + step])
+
+    module.GenerativeModel = GenerativeModel
+    module.configure = lambda **kwargs: None
+    return module
+
+
+# ======================yfinance====================================================================================
+def make_yfinance_module(latency):
+    module = types.ModuleType("yfinance")
+
+    class Ticker:
+        def __init__(self, symbol):
+            self.symbol = symbol
+
+        @property
+        def info(self):
+            calls.add("yfinance")
+            latency.wait()
+            base = self.symbol.upper().replace(".NS", "")
+            if base not in NSE_SYMBOLS:
+                return {}
+            seed = sum(map(ord, base))
+            return {
+                "longName": f"{base} Ltd",
+                "trailingPE": 20 + seed % 15,
+                "marketCap": seed * 10 ** 9,
+                "trailingEps": round(50 + seed % 90 + 0.5, 2),
+                "dividendYield": (seed % 40) / 1000,
+            }
+
+    module.Ticker = Ticker
+    return module
+
+
+# ======================Alpha Vantage (requests)====================================================================================
+def alpha_vantage_payload(params):
+    symbol = (params or {}).get("symbol", "")
+    seed = sum(map(ord, symbol))
+    return {
+        "Symbol": symbol,
+        "Name": f"{symbol} Inc",
+        "PERatio": str(15 + seed % 20),
+        "MarketCapitalization": str(seed * 10 ** 8),
+        "EPS": str(round(5 + seed % 12 + 0.25, 2)),
+        "DividendYield": str((seed % 30) / 1000),
+    }
+
+
+def make_requests_module(latency):
+    module = types.ModuleType("requests")
+
+    class HTTPError(Exception):
+        pass
+
+    class Response:
+        def __init__(self, payload, status_code=200):
+            self._payload = payload
+            self.status_code = status_code
+
+        def raise_for_status(self):
+            if self.status_code >= 400:
+                raise HTTPError(f"HTTP {self.status_code}")
+
+        def json(self):
+            return self._payload
+
+    def get(url, params=None, timeout=None, **kwargs):
+        calls.add("alpha_vantage")
+        latency.wait()
+        return Response(alpha_vantage_payload(params))
+
+    module.get = get
+    module.HTTPError = HTTPError
+    module.RequestException = HTTPError
+    return module
+
+
+def make_aiohttp_module(latency):
+    """Just the ClientSession surface DataFetcher's async path uses."""
+    module = types.ModuleType("aiohttp")
+
+    class Response:
+        def __init__(self, payload):
+            self._payload = payload
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        def raise_for_status(self):
+            pass
+
+        async def json(self, content_type=None):
+            return self._payload
+
+    class _Request:
+        def __init__(self, params):
+            self.params = params
+
+        async def __aenter__(self):
+            calls.add("alpha_vantage")
+            await latency.wait_async()
+            return Response(alpha_vantage_payload(self.params))
+
+        async def __aexit__(self, *exc):
+            return False
+
+    class ClientSession:
+        def __init__(self, *args, **kwargs):
+            self.closed = False
+
+        def get(self, url, params=None, **kwargs):
+            return _Request(params)
+
+        async def close(self):
+            self.closed = True
+
+    module.ClientSession = ClientSession
+    module.TCPConnector = lambda *args, **kwargs: None
+    module.ClientTimeout = lambda *args, **kwargs: None
+    return module
+
+
+def install(llm_latency=0.5, market_latency=0.15, jitter=0.2, seed=0):
+    """Replace the external clients in sys.modules. Call before the app uses them."""
+    genai = make_genai_module(Latency(llm_latency, jitter, seed))
+    try:
+        import google  # real namespace package (protobuf etc. live there too)
+    except ImportError:
+        google = sys.modules["google"] = types.ModuleType("google")
+        google.__path__ = []
+    sys.modules["google.generativeai"] = genai
+    google.generativeai = genai
+    sys.modules["yfinance"] = make_yfinance_module(Latency(market_latency, jitter, seed + 1))
+    sys.modules["requests"] = make_requests_module(Latency(market_latency, jitter, seed + 2))
+    sys.modules["aiohttp"] = make_aiohttp_module(Latency(market_latency, jitter, seed + 3))
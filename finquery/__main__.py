@@ -0,0 +1,122 @@
+"""
+Command line entry point:
+
+    python -m finquery ingest "Reports for testing" --workers 4 --ai-concurrency 4
+    python -m finquery facts backfill
+    python -m finquery facts export facts.parquet
+    python -m finquery facts rank --tickers TCS,INFY,WIPRO
+    python -m finquery db migrate-texts --vacuum
+
+Run it from the app directory, so charts land in the static/charts folder the web app serves.
+"""
+import argparse
+import os
+import sys
+
+
+def ingest(args):
+    from finquery.database import DataBaseManager
+    from finquery.ingest import BulkIngestor
+
+    if not os.path.isdir(args.directory):
+        print(f"Error: {args.directory} is not a directory")
+        return 2
+    if not os.getenv("GOOGLE_API_KEY"):
+        print("Error: GOOGLE_API_KEY is not set")
+        return 2
+
+    os.makedirs(args.chart_folder, exist_ok=True)
+    ingestor = BulkIngestor(DataBaseManager(), args.chart_folder, workers=args.workers,
+                            ai_concurrency=args.ai_concurrency, batch_size=args.batch_size,
+                            quiet=not args.verbose)
+    files, skipped = ingestor.scan(args.directory, args.pattern, retry_failed=args.retry_failed)
+    if skipped:
+        print(f"--- [Ingest] Skipping {skipped} files already ingested ---")
+    if args.limit:
+        files = files[:args.limit]
+    counts = ingestor.run(files)
+    return 1 if counts["failed"] else 0
+
+
+def facts(args):
+    from finquery.database import DataBaseManager
+    from finquery import facts as fact_store
+
+    db = DataBaseManager()
+    tickers = [t.strip().upper() for t in args.tickers.split(",") if t.strip()] if args.tickers else None
+    if args.action == "backfill":
+        fact_store.backfill_facts(db)
+        return 0
+    if args.action == "export":
+        if not args.path:
+            print("Error: export needs an output path")
+            return 2
+        fact_store.export_parquet(db, args.path, tickers=tickers, metric=args.metric)
+        return 0
+
+    import pandas as pd
+
+    analytics = fact_store.FactAnalytics.from_db(db, tickers=tickers, metric=args.metric)
+    table = analytics.peer_ranking(tickers=tickers, fy=args.fy, metric=args.metric)
+    if table.empty:
+        print("No full-year facts for these tickers (run `facts backfill` for older reports)")
+        return 1
+    with pd.option_context("display.width", 120, "display.float_format", "{:,.3f}".format):
+        print(table.to_string(index=False))
+    return 0
+
+
+def database(args):
+    from finquery.database import DataBaseManager
+
+    db = DataBaseManager()
+    if args.action == "migrate-texts":
+        db.migrate_report_texts(batch_size=args.batch_size)
+    if args.vacuum:
+        return 0 if db.vacuum() else 1
+    return 0
+
+
+def main(argv=None):
+    from finquery.ingest import INGEST_WORKERS, INGEST_AI_CONCURRENCY, INGEST_BATCH_SIZE
+
+    parser = argparse.ArgumentParser(prog="python -m finquery", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("ingest", help="analyze every PDF in a directory (resumable)")
+    p.add_argument("directory")
+    p.add_argument("--pattern", default="*.pdf", help="file name pattern (default: *.pdf)")
+    p.add_argument("--workers", type=int, default=INGEST_WORKERS, help="worker processes")
+    p.add_argument("--ai-concurrency", type=int, default=INGEST_AI_CONCURRENCY,
+                   help="Gemini requests in flight across all workers")
+    p.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="reports per database commit")
+    p.add_argument("--chart-folder", default=os.path.join("static", "charts"))
+    p.add_argument("--retry-failed", action="store_true", help="also retry files that failed before")
+    p.add_argument("--limit", type=int, default=0, help="ingest at most this many files")
+    p.add_argument("--verbose", action="store_true", help="show the workers' own log lines")
+    p.set_defaults(func=ingest)
+
+    p = commands.add_parser("facts", help="stored financial facts: backfill, Parquet export, peer ranking")
+    p.add_argument("action", choices=["backfill", "export", "rank"])
+    p.add_argument("path", nargs="?", help="output file for export")
+    p.add_argument("--tickers", help="comma-separated tickers (default: all)")
+    p.add_argument("--metric", default="revenue")
+    p.add_argument("--fy", type=int, help="fiscal year to rank, e.g. 2024 (default: latest)")
+    p.set_defaults(func=facts)
+
+    p = commands.add_parser("db", help="database maintenance")
+    p.add_argument("action", choices=["migrate-texts"],
+                   help="migrate-texts: compress the text of reports saved before compressed storage")
+    p.add_argument("--batch-size", type=int, default=200, help="reports per transaction")
+    p.add_argument("--vacuum", action="store_true", help="give the freed space back to the file system afterwards")
+    p.set_defaults(func=database)
+
+    args = parser.parse_args(argv)
+    from finquery.metrics import setup_logging
+    setup_logging("INFO")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,81 @@
+import asyncio
+import logging
 import os
-import fitz
 import json
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from dotenv import load_dotenv
 
-import google.generativeai as genai
-from google.generativeai import types
+from finquery.extractor import PDFExtractor, source_label
+from finquery.cache import default_llm_cache, make_key
+from finquery.metrics import LLM_SECONDS, LLM_PROMPT_CHARS, LLM_RESPONSE_CHARS, LLM_REQUESTS, timed
+
+logger = logging.getLogger(__name__)
 
 # ------------------------------------------------------------------------
 
 load_dotenv()
 
+# Map-reduce summaries: characters per map chunk, most chunks per document (chunks grow
+# beyond SUMMARY_CHUNK_CHARS to stay under it), and map calls running at once
+SUMMARY_CHUNK_CHARS = int(os.environ.get("SUMMARY_CHUNK_CHARS", 30000))
+SUMMARY_MAX_CHUNKS = int(os.environ.get("SUMMARY_MAX_CHUNKS", 24))
+SUMMARY_MAP_WORKERS = int(os.environ.get("SUMMARY_MAP_WORKERS", 4))
+
+
+def group_pages(pages, chunk_chars=SUMMARY_CHUNK_CHARS, max_chunks=SUMMARY_MAX_CHUNKS):
+    """
+    Split a document into map chunks along page boundaries: [(first_page, last_page, text), ...]
+    (1-based pages). Pages longer than a chunk are cut into slices.
+    """
+    total = sum(len(p) for p in pages)
+    chunk_chars = max(chunk_chars, math.ceil(total / max(1, max_chunks)))
+
+    chunks = []
+    parts, size, first = [], 0, 1
+    for page_no, text in enumerate(pages, start=1):
+        if parts and size + len(text) > chunk_chars:
+            chunks.append((first, page_no - 1, "".join(parts)))
+            parts, size = [], 0
+        if not parts:
+            first = page_no
+        if len(text) > chunk_chars:
+            for start in range(0, len(text), chunk_chars):
+                chunks.append((page_no, page_no, text[start:start + chunk_chars]))
+            continue
+        parts.append(text)
+        size += len(text)
+    if parts:
+        chunks.append((first, len(pages), "".join(parts)))
+    return [c for c in chunks if c[2].strip()]
+
+
+def _is_json_object(text):
+    """True if the model returned a (possibly ```json fenced) JSON object worth caching."""
+    try:
+        return isinstance(json.loads(text.replace("```json", "").replace("```", "").strip()), dict)
+    except Exception:
+        return False
+
+
 class ReportAnalyzer:
 
-    def __init__(self):
+    def __init__(self, cache=None, call_limit=None):
         
         self.google_api_key = os.getenv("GOOGLE_API_KEY")
         if not self.google_api_key:
             raise ValueError("API key 'GOOGLE_API_KEY' not found in .env file.")
         
-        genai.configure(api_key=self.google_api_key)
-        self.model = genai.GenerativeModel("gemini-2.5-flash")
+        self.model_name = "gemini-2.5-flash"
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.extractor = PDFExtractor()
+        # any object with get/set (see finquery/cache.py); None = default tiers, False = no caching
+        self.cache = default_llm_cache() if cache is None else (cache or None)
+        # optional semaphore held around every model request (bulk ingestion shares one across processes)
+        self.call_limit = call_limit
 
         self.safety_settings = [
             {
@@ -41,9 +97,164 @@ class ReportAnalyzer:
         ]
 
 
+# ======================model call block====================================================================================
+    @property
+    def model(self):
+        """Gemini client, created on first use (importing google.generativeai alone takes ~1s)."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    import google.generativeai as genai
+                    genai.configure(api_key=self.google_api_key)
+                    self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    @model.setter
+    def model(self, value):
+        self._model = value
+
+    def _generate(self, prompt, cache_if=None, op="other"):
+        """
+        Call the model, serving identical prompts (same model) from the response cache.
+        cache_if: optional check on the response text; failed checks are not cached.
+        op: label for the metrics (summary, competitors, qa, table).
+        """
+        LLM_PROMPT_CHARS.observe(len(prompt), op=op)
+        key = make_key(self.model_name, prompt) if self.cache else None
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.debug("[Cache] Using cached AI response")
+                LLM_REQUESTS.inc(op=op, result="hit")
+                return cached
+
+        try:
+            with self.call_limit or nullcontext(), timed(LLM_SECONDS, op=op):
+                response = self.model.generate_content(prompt, safety_settings=self.safety_settings)
+                text = response.text
+        except Exception:
+            LLM_REQUESTS.inc(op=op, result="error")
+            raise
+        LLM_REQUESTS.inc(op=op, result="miss")
+        LLM_RESPONSE_CHARS.observe(len(text or ""), op=op)
+        if key and text and (cache_if is None or cache_if(text)):
+            self.cache.set(key, text)
+        return text
+
+    def _generate_stream(self, prompt, op="other"):
+        """
+        Like _generate, but yields the response text piece by piece as the model produces it.
+        A cached response comes out in one piece; a completed stream is cached as a whole.
+        """
+        LLM_PROMPT_CHARS.observe(len(prompt), op=op)
+        key = make_key(self.model_name, prompt) if self.cache else None
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.debug("[Cache] Using cached AI response")
+                LLM_REQUESTS.inc(op=op, result="hit")
+                yield cached
+                return
+
+        parts = []
+        try:
+            with self.call_limit or nullcontext(), timed(LLM_SECONDS, op=op):
+                response = self.model.generate_content(prompt, safety_settings=self.safety_settings, stream=True)
+                for chunk in response:
+                    text = chunk.text
+                    if text:
+                        parts.append(text)
+                        yield text
+        except Exception:
+            LLM_REQUESTS.inc(op=op, result="error")
+            raise
+        LLM_REQUESTS.inc(op=op, result="miss")
+        full_text = "".join(parts)
+        LLM_RESPONSE_CHARS.observe(len(full_text), op=op)
+        if key and full_text:
+            self.cache.set(key, full_text)
+
+    async def _generate_async(self, prompt, cache_if=None, op="other"):
+        """_generate for the event loop (async serving mode): the model call does not hold a thread."""
+        LLM_PROMPT_CHARS.observe(len(prompt), op=op)
+        key = make_key(self.model_name, prompt) if self.cache else None
+        if key:
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                logger.debug("[Cache] Using cached AI response")
+                LLM_REQUESTS.inc(op=op, result="hit")
+                return cached
+
+        try:
+            with timed(LLM_SECONDS, op=op):
+                response = await self.model.generate_content_async(prompt, safety_settings=self.safety_settings)
+                text = response.text
+        except Exception:
+            LLM_REQUESTS.inc(op=op, result="error")
+            raise
+        LLM_REQUESTS.inc(op=op, result="miss")
+        LLM_RESPONSE_CHARS.observe(len(text or ""), op=op)
+        if key and text and (cache_if is None or cache_if(text)):
+            await asyncio.to_thread(self.cache.set, key, text)
+        return text
+
+    async def _generate_stream_async(self, prompt, op="other"):
+        """_generate_stream for the event loop: an async generator of response pieces."""
+        LLM_PROMPT_CHARS.observe(len(prompt), op=op)
+        key = make_key(self.model_name, prompt) if self.cache else None
+        if key:
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                logger.debug("[Cache] Using cached AI response")
+                LLM_REQUESTS.inc(op=op, result="hit")
+                yield cached
+                return
+
+        parts = []
+        try:
+            with timed(LLM_SECONDS, op=op):
+                response = await self.model.generate_content_async(prompt, safety_settings=self.safety_settings,
+                                                                   stream=True)
+                async for chunk in response:
+                    text = chunk.text
+                    if text:
+                        parts.append(text)
+                        yield text
+        except Exception:
+            LLM_REQUESTS.inc(op=op, result="error")
+            raise
+        LLM_REQUESTS.inc(op=op, result="miss")
+        full_text = "".join(parts)
+        LLM_RESPONSE_CHARS.observe(len(full_text), op=op)
+        if key and full_text:
+            await asyncio.to_thread(self.cache.set, key, full_text)
+
+
 # ======================summarize text block====================================================================================
     def summarize_text(self, text_to_summarize):
-        prompt = (
+        prompt = self._summary_prompt(text_to_summarize)
+
+        logger.debug("Calling AI for summary...")
+        try:
+            return self._generate(prompt, op="summary")
+        except Exception as e:
+            logger.warning("An error occurred while calling the AI: %s", e)
+            return "Error: Could not generate summary."
+
+    async def summarize_text_async(self, text_to_summarize):
+        """summarize_text for the event loop."""
+        prompt = self._summary_prompt(text_to_summarize)
+
+        logger.debug("Calling AI for summary (async)...")
+        try:
+            return await self._generate_async(prompt, op="summary")
+        except Exception as e:
+            logger.warning("An error occurred while calling the AI: %s", e)
+            return "Error: Could not generate summary."
+
+    @staticmethod
+    def _summary_prompt(text_to_summarize):
+        return (
                 "You are a senior equity research analyst who explains financials in simple, beginner-friendly English.\n"
                 "Rewrite the text into EXACTLY 5 bullet points.\n\n"
                 
@@ -70,34 +281,153 @@ class ReportAnalyzer:
                 f"{text_to_summarize}"
             )
 
-        print("--- Calling AI for summary... ---")
-        try:
-            response = self.model.generate_content(prompt,
-                safety_settings=self.safety_settings)
-            return response.text
-        except Exception as e:
-            print(f"An error occurred while calling the AI: {e}")
-            return "Error: Could not generate summary."
 
+# ======================summarize document block====================================================================================
+    def summarize_document(self, pages, chunk_chars=SUMMARY_CHUNK_CHARS, max_chunks=SUMMARY_MAX_CHUNKS,
+                           max_workers=SUMMARY_MAP_WORKERS):
+        """
+        Five-bullet summary of the whole document (map-reduce). Page chunks are condensed
+        into notes in parallel, then the notes are summarized with summarize_text.
+        The chunk prompts don't change when the final prompt does, so with the response
+        cache on only the reduce step is redone after a prompt tweak.
+        """
+        chunks = group_pages(pages, chunk_chars, max_chunks)
+        if len(chunks) <= 1:
+            return self.summarize_text("".join(pages))
+
+        logger.debug("[Summary] Map step over %s chunks (%s at a time)", len(chunks), max_workers)
+        notes = self._map_notes(chunks, max_workers)
+        if not notes:
+            logger.debug("[Summary] No chunk notes, falling back to the start of the document")
+            return self.summarize_text("".join(pages)[:chunk_chars])
+
+        # notes that still don't fit one prompt are condensed again, a level at a time
+        for _ in range(3):
+            if sum(len(n) for n in notes) <= chunk_chars:
+                break
+            logger.debug("[Summary] Condensing %s notes further", len(notes))
+            condensed = self._map_notes(group_pages(notes, chunk_chars, max_chunks), max_workers, label="Notes")
+            if not condensed:
+                break
+            notes = condensed
+
+        return self.summarize_text("\n\n".join(notes)[:chunk_chars])
+
+    def _map_notes(self, chunks, max_workers, label="Pages"):
+        """Notes for each (first, last, text) chunk, in document order; failed or empty chunks are dropped."""
+        def work(chunk):
+            first, last, text = chunk
+            try:
+                note = self._generate(self._chunk_prompt(text), op="summary_map").strip()
+            except Exception as e:
+                logger.warning("[Summary] Chunk %s %s-%s failed: %s", label.lower(), first, last, e)
+                return None
+            if not note or note.upper().startswith("NONE"):
+                return None
+            return f"[{label} {first}-{last}]\n{note}"
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="summary") as pool:
+            return [n for n in pool.map(work, chunks) if n]
+
+    async def summarize_document_async(self, pages, chunk_chars=SUMMARY_CHUNK_CHARS, max_chunks=SUMMARY_MAX_CHUNKS,
+                                       max_workers=SUMMARY_MAP_WORKERS):
+        """summarize_document for the event loop: the map calls are coroutines, max_workers at a time."""
+        chunks = group_pages(pages, chunk_chars, max_chunks)
+        if len(chunks) <= 1:
+            return await self.summarize_text_async("".join(pages))
+
+        logger.debug("[Summary] Map step over %s chunks (%s at a time, async)", len(chunks), max_workers)
+        notes = await self._map_notes_async(chunks, max_workers)
+        if not notes:
+            logger.debug("[Summary] No chunk notes, falling back to the start of the document")
+            return await self.summarize_text_async("".join(pages)[:chunk_chars])
+
+        for _ in range(3):
+            if sum(len(n) for n in notes) <= chunk_chars:
+                break
+            logger.debug("[Summary] Condensing %s notes further", len(notes))
+            condensed = await self._map_notes_async(group_pages(notes, chunk_chars, max_chunks), max_workers,
+                                                    label="Notes")
+            if not condensed:
+                break
+            notes = condensed
+
+        return await self.summarize_text_async("\n\n".join(notes)[:chunk_chars])
+
+    async def _map_notes_async(self, chunks, max_workers, label="Pages"):
+        """_map_notes for the event loop."""
+        slots = asyncio.Semaphore(max(1, max_workers))
+
+        async def work(chunk):
+            first, last, text = chunk
+            async with slots:
+                try:
+                    note = (await self._generate_async(self._chunk_prompt(text), op="summary_map")).strip()
+                except Exception as e:
+                    logger.warning("[Summary] Chunk %s %s-%s failed: %s", label.lower(), first, last, e)
+                    return None
+            if not note or note.upper().startswith("NONE"):
+                return None
+            return f"[{label} {first}-{last}]\n{note}"
+
+        return [n for n in await asyncio.gather(*(work(c) for c in chunks)) if n]
+
+    @staticmethod
+    def _chunk_prompt(text):
+        return (
+            "You are reading one section of a company's annual report.\n"
+            "List the key facts of this section as at most 8 short bullet points: revenue, profit, margins, "
+            "growth, segments, balance sheet, cash flow, guidance and risks. Keep every number with its unit "
+            "and period exactly as written. No intro, no outro.\n"
+            "If the section has no financial substance (cover page, index, boilerplate), reply exactly: NONE\n\n"
+            "SECTION TEXT:\n"
+            f"{text}"
+        )
 
 # ======================extract text block====================================================================================
     def extract_text_from_pdf(self,pdf_file_path):
-        print(f"--- Extracting from {pdf_file_path} ---")
-        try:
-            doc = fitz.open(pdf_file_path)
-            full_text = ""
-            for page in doc:
-                full_text += page.get_text()
+        pages = self.extract_pages_from_pdf(pdf_file_path)
+        if pages is None:
+            return None
+        return "".join(pages)
 
-            doc.close()
-            return full_text
+    def extract_pages_from_pdf(self, pdf_file_path):
+        """Per-page text in page order (extracted in parallel for big PDFs), or None on failure."""
+        logger.debug("Extracting from %s", source_label(pdf_file_path))
+        try:
+            return self.extractor.extract_pages(pdf_file_path)
         except Exception as e:
-            print(f"An error occured while extracting text from pdf")
+            logger.warning("An error occured while extracting text from pdf: %s", e)
             return None
 
 # ======================extract text block====================================================================================        
     def get_competitors(self,text_to_analyze):
-        prompt = (
+        prompt = self._competitors_prompt(text_to_analyze)
+        logger.debug("Calling AI to find compitators..")
+        try:
+            raw_text = self._generate(prompt, cache_if=_is_json_object, op="competitors")
+
+            clean_json = raw_text.replace("```json", "").replace("```", "").strip()
+            company_data = json.loads(clean_json)
+            return company_data
+        except Exception as e:
+            logger.warning("an error occurred : %s", e)
+            return {"main_ticker": "UNKNOWN", "competitors": []}
+
+    async def get_competitors_async(self, text_to_analyze):
+        """get_competitors for the event loop."""
+        prompt = self._competitors_prompt(text_to_analyze)
+        logger.debug("Calling AI to find compitators (async)..")
+        try:
+            raw_text = await self._generate_async(prompt, cache_if=_is_json_object, op="competitors")
+            return json.loads(raw_text.replace("```json", "").replace("```", "").strip())
+        except Exception as e:
+            logger.warning("an error occurred : %s", e)
+            return {"main_ticker": "UNKNOWN", "competitors": []}
+
+    @staticmethod
+    def _competitors_prompt(text_to_analyze):
+        return (
             "Step 1: Identify the main company discussed in the following text.\n"
             "Step 2: Based on your general knowledge, identify 3 major publicly traded competitors for that company.\n"
             "Step 3: Return ONLY a raw JSON object with exactly two keys: 'main_ticker' (string) and 'competitors' (list of strings).\n"
@@ -105,21 +435,47 @@ class ReportAnalyzer:
             "TEXT TO ANALYZE:\n"
             f"{text_to_analyze}"
         )
-        print("--- Calling AI to find compitators.. ---")
-        try:
-            response = self.model.generate_content(prompt,
-                safety_settings=self.safety_settings)
-            
-            clean_json = response.text.replace("```json", "").replace("```", "").strip()
-            company_data = json.loads(clean_json)
-            return company_data
-        except Exception as e:
-            print(f"an error occurred : {e}")
-            return {"main_ticker": "UNKNOWN", "competitors": []}
 
 # ======================user query block====================================================================================        
     def answer_question(self, text_to_analyze, user_question):
-        prompt = (
+        prompt = self._qa_prompt(text_to_analyze, user_question)
+
+        logger.debug("Asking AI for Q&A: '%s' (text chars: %s)", user_question, len(text_to_analyze))
+        try:
+            return self._generate(prompt, op="qa")
+        except Exception as e:
+            logger.warning("An error occurred while answering question: %s", e)
+            return "Error: Could not generate answer."
+
+    def answer_question_stream(self, text_to_analyze, user_question):
+        """
+        Same answer as answer_question, yielded in pieces while the model writes it.
+        Errors are raised to the caller, which decides how to fall back.
+        """
+        prompt = self._qa_prompt(text_to_analyze, user_question)
+        logger.debug("Streaming AI Q&A: '%s' (text chars: %s)", user_question, len(text_to_analyze))
+        yield from self._generate_stream(prompt, op="qa")
+
+    async def answer_question_async(self, text_to_analyze, user_question):
+        """answer_question for the event loop."""
+        prompt = self._qa_prompt(text_to_analyze, user_question)
+        logger.debug("Asking AI for Q&A (async): '%s' (text chars: %s)", user_question, len(text_to_analyze))
+        try:
+            return await self._generate_async(prompt, op="qa")
+        except Exception as e:
+            logger.warning("An error occurred while answering question: %s", e)
+            return "Error: Could not generate answer."
+
+    async def answer_question_stream_async(self, text_to_analyze, user_question):
+        """answer_question_stream for the event loop (an async generator); errors go to the caller."""
+        prompt = self._qa_prompt(text_to_analyze, user_question)
+        logger.debug("Streaming AI Q&A (async): '%s' (text chars: %s)", user_question, len(text_to_analyze))
+        async for piece in self._generate_stream_async(prompt, op="qa"):
+            yield piece
+
+    @staticmethod
+    def _qa_prompt(text_to_analyze, user_question):
+        return (
                         f"""
             You are a concise financial analyst. Answer ONLY from the REPORT TEXT below.
 
@@ -140,19 +496,35 @@ class ReportAnalyzer:
             {text_to_analyze}
             """
         )
-
-        print(f"--- Asking AI for Q&A: '{user_question}' (text chars: {len(text_to_analyze)}) ---")
-        try:
-            response = self.model.generate_content(prompt, safety_settings=self.safety_settings)
-            return response.text
-        except Exception as e:
-            print(f"An error occurred while answering question: {e}")
-            return "Error: Could not generate answer."
         
 
 # ======================Chart analysis block====================================================================================        
     def extract_financial_table(self, text_to_analyze):
-        prompt = (
+        prompt = self._table_prompt(text_to_analyze)
+
+        logger.debug("Calling AI to extract table data...")
+        try:
+            raw_text = self._generate(prompt, cache_if=_is_json_object, op="table") or ""
+        except Exception as e:
+            logger.warning("An error occurred while extracting table: %s", e)
+            return {}
+        return self._parse_table(raw_text)
+
+    async def extract_financial_table_async(self, text_to_analyze):
+        """extract_financial_table for the event loop."""
+        prompt = self._table_prompt(text_to_analyze)
+
+        logger.debug("Calling AI to extract table data (async)...")
+        try:
+            raw_text = await self._generate_async(prompt, cache_if=_is_json_object, op="table") or ""
+        except Exception as e:
+            logger.warning("An error occurred while extracting table: %s", e)
+            return {}
+        return self._parse_table(raw_text)
+
+    @staticmethod
+    def _table_prompt(text_to_analyze):
+        return (
             "Extract the revenue figures from the text below. "
             "If quarterly data is available return quarterly keys like "
             "{\"Q1 FY25\": 62613, \"Q2 FY25\": 64000}. "
@@ -162,26 +534,14 @@ class ReportAnalyzer:
             "TEXT TO ANALYZE:\n" + text_to_analyze
         )
 
-        print("--- Calling AI to extract table data... ---")
+    @staticmethod
+    def _parse_table(raw_text):
+        clean_json_text = raw_text.replace("```json", "").replace("```", "").strip()
         try:
-            response = self.model.generate_content(
-                prompt,
-                safety_settings=self.safety_settings
-            )
-            raw_text = response.text or ""
-            clean_json_text = raw_text.replace("```json", "").replace("```", "").strip()
-
-    
-            try:
-                chart_data = json.loads(clean_json_text)
-                print("--- [Analyzer] Table JSON parsed successfully.")
-                return chart_data
-            except Exception as e:
-                print(f"--- [Analyzer] JSON parsing failed: {e}")
-                print("--- [Analyzer] AI output was:\n", clean_json_text)
-               
-                return {}
-
+            chart_data = json.loads(clean_json_text)
+            logger.debug("[Analyzer] Table JSON parsed successfully.")
+            return chart_data
         except Exception as e:
-            print(f"An error occurred while extracting table: {e}")
+            logger.warning("[Analyzer] JSON parsing failed: %s", e)
+            logger.debug("[Analyzer] AI output was:\n %s", clean_json_text)
             return {}
\ No newline at end of file
@@ -0,0 +1,227 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from finquery.database import DB_FILENAME, get_connections
+from finquery.metrics import LLM_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+# Defaults for the analyzer's response cache (override with env vars)
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE", "1") != "0"
+LLM_CACHE_DB = os.environ.get("LLM_CACHE_DB", DB_FILENAME)
+LLM_CACHE_TTL = int(os.environ.get("LLM_CACHE_TTL", 7 * 24 * 3600))  # seconds
+LLM_CACHE_MEMORY_ITEMS = int(os.environ.get("LLM_CACHE_MEMORY_ITEMS", 256))
+LLM_CACHE_DISK_ITEMS = int(os.environ.get("LLM_CACHE_DISK_ITEMS", 5000))
+
+# SQLite tier reads stay read-only: access times of hits are collected in memory and written
+# in one statement with the next set(), or after this many hits / this many seconds
+CACHE_TOUCH_BATCH = int(os.environ.get("CACHE_TOUCH_BATCH", 100))
+CACHE_TOUCH_SECONDS = float(os.environ.get("CACHE_TOUCH_SECONDS", 30))
+
+
+def make_key(model_name, prompt):
+    """Cache key: model name + sha256 of the prompt."""
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return f"{model_name}:{digest}"
+
+
+class LRUCache:
+    """In-process tier: least-recently-used eviction plus a TTL per entry."""
+
+    def __init__(self, max_items=LLM_CACHE_MEMORY_ITEMS, ttl=LLM_CACHE_TTL):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires and expires < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = time.time() + self.ttl if self.ttl else 0
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteCache:
+    """
+    Persistent tier shared by processes; expired rows are skipped on read and deleted on write,
+    least recently used rows evicted on write. Hits do not write: their access times are
+    batched (see CACHE_TOUCH_BATCH), so eviction order is approximate by up to one batch.
+    """
+
+    def __init__(self, db_path=LLM_CACHE_DB, table="llm_cache", max_items=LLM_CACHE_DISK_ITEMS, ttl=LLM_CACHE_TTL):
+        self.db_path = db_path
+        self.table = table
+        self.max_items = max_items
+        self.ttl = ttl
+        self._writes = 0
+        self._touched = {}  # key -> access time not yet written
+        self._touch_hits = 0
+        self._touched_since = time.time()
+        self._touch_lock = threading.Lock()
+        self._connections = get_connections(db_path)
+        self._create_table()
+
+    def _get_connection(self):
+        return self._connections.get()
+
+    def _create_table(self):
+        try:
+            conn = self._get_connection()
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_accessed ON {self.table} (accessed_at)")
+            conn.commit()
+        except Exception as e:
+            logger.error("[Cache] could not create %s: %s", self.table, e)
+
+    def get(self, key):
+        value, _ = self.get_with_age(key)
+        return value
+
+    def get_with_age(self, key):
+        """(value, age in seconds) for a live entry, or (None, None). Counts as a use for eviction, like get()."""
+        try:
+            conn = self._get_connection()
+            row = conn.execute(f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        except Exception as e:
+            logger.error("[Cache] get failed: %s", e)
+            return None, None
+        if row is None:
+            return None, None
+        now = time.time()
+        age = now - row[1]
+        if self.ttl and age > self.ttl:
+            return None, None  # deleted by the next eviction pass
+        self._touch(key, now)
+        return row[0], age
+
+    def _touch(self, key, now):
+        with self._touch_lock:
+            self._touched[key] = now
+            self._touch_hits += 1
+            due = self._touch_hits >= CACHE_TOUCH_BATCH or now - self._touched_since >= CACHE_TOUCH_SECONDS
+        if due:
+            conn = self._get_connection()
+            try:
+                self._write_touches(conn)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error("[Cache] access-time update failed: %s", e)
+
+    def _write_touches(self, conn):
+        """Write the collected access times (in the caller's transaction)."""
+        with self._touch_lock:
+            touched, self._touched = self._touched, {}
+            self._touch_hits = 0
+            self._touched_since = time.time()
+        if touched:
+            conn.executemany(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?",
+                             [(at, key) for key, at in touched.items()])
+
+    def set(self, key, value):
+        conn = self._get_connection()
+        try:
+            now = time.time()
+            self._write_touches(conn)  # this is a write anyway; the eviction below needs them
+            conn.execute(f"""
+                INSERT OR REPLACE INTO {self.table} (key, value, created_at, accessed_at)
+                VALUES (?, ?, ?, ?)
+            """, (key, value, now, now))
+            # size-based eviction, checked every few writes to keep set() cheap
+            self._writes += 1
+            if self._writes % 20 == 1:
+                self._evict(conn, now)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error("[Cache] set failed: %s", e)
+
+    def _evict(self, conn, now):
+        if self.ttl:
+            conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.ttl,))
+        count = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        if count > self.max_items:
+            conn.execute(f"""
+                DELETE FROM {self.table} WHERE key IN (
+                    SELECT key FROM {self.table} ORDER BY accessed_at LIMIT ?
+                )
+            """, (count - self.max_items,))
+
+    def clear(self):
+        try:
+            conn = self._get_connection()
+            conn.execute(f"DELETE FROM {self.table}")
+            conn.commit()
+        except Exception as e:
+            logger.error("[Cache] clear failed: %s", e)
+
+
+class TieredCache:
+    """
+    Checks each tier in order (fastest first) and copies hits into the faster tiers.
+    Any object with get(key) / set(key, value) can be used as a tier. With a lookups counter
+    (labelled by tier), every get() counts under the name of the tier that answered, or "miss".
+    """
+
+    def __init__(self, tiers, names=None, lookups=None):
+        self.tiers = list(tiers)
+        self.names = list(names) if names else [type(t).__name__ for t in self.tiers]
+        self.lookups = lookups
+
+    def get(self, key):
+        for i, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for faster in self.tiers[:i]:
+                    faster.set(key, value)
+                if self.lookups is not None:
+                    self.lookups.inc(tier=self.names[i])
+                return value
+        if self.lookups is not None:
+            self.lookups.inc(tier="miss")
+        return None
+
+    def set(self, key, value):
+        for tier in self.tiers:
+            tier.set(key, value)
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+
+def default_llm_cache():
+    """Memory LRU in front of the SQLite table, or None when LLM_CACHE=0."""
+    if not LLM_CACHE_ENABLED:
+        return None
+    # hit rates per tier show on /metrics (finquery_llm_cache_lookups_total)
+    return TieredCache([LRUCache(), SQLiteCache()], names=["memory", "disk"], lookups=LLM_CACHE_LOOKUPS)
@@ -1,48 +1,282 @@
+import logging
 import sqlite3
 import json
 import os
+import threading
+import zlib
+from contextlib import contextmanager
+
+from finquery.metrics import DB_SECONDS, DB_ERRORS, timed
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib is used when zstandard is not installed
+    zstandard = None
 
 DB_FILENAME = os.environ.get("REPORTS_DB", "finquery.db")
 
+# Page cache per connection in KiB (SQLite's negative cache_size convention)
+SQLITE_CACHE_KB = int(os.environ.get("SQLITE_CACHE_KB", 32000))
+# How long a writer waits for a lock before failing (ms)
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+# A queued/running job with no heartbeat for this long (seconds) lost its process (restart, crash);
+# the JobQueue that owns a job touches it every JOB_HEARTBEAT_SECONDS (finquery/jobs.py)
+JOB_STALE_SECONDS = int(os.environ.get("JOB_STALE_SECONDS", 1800))
+
+# Tickers of report rows whose analysis is still running ("PENDING") or died before it found one
+PLACEHOLDER_TICKERS = ("PENDING", "FAILED")
+
+
+class ThreadLocalConnections:
+    """
+    One long-lived SQLite connection per thread for a database file, opened in WAL mode
+    (readers no longer block on the writer) with tuned pragmas. Connections are
+    reused across calls instead of being opened and closed every time.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+    def get(self):
+        if os.getpid() != self._pid:
+            # forked child: the inherited connections belong to the parent and must never be used here
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KB}")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Close the calling thread's connection (it is reopened on next use)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_connections(db_path):
+    """Shared per-file connection layer, so every component using the same DB shares it."""
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ThreadLocalConnections(db_path)
+        return pool
+
+
+def compress_text(text):
+    """Compress report text for storage; returns (codec, blob)."""
+    data = text.encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=6).compress(data)
+    return "zlib", zlib.compress(data, 6)
+
+
+def decompress_text(codec, blob):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("report text is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(blob).decode("utf-8")
+    return zlib.decompress(blob).decode("utf-8")
+
 
 class DataBaseManager:
-    
+
     def __init__(self, db_path: str = DB_FILENAME):
         self.db_path = db_path
+        self._connections = get_connections(db_path)
         self._create_tables()
 
     def _get_connection(self):
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        conn.row_factory = sqlite3.Row
-        return conn
+        return self._connections.get()
+
+    @contextmanager
+    def _transaction(self, op="query"):
+        """
+        Cursor on this thread's connection; commits on success, rolls back on error.
+        op names the operation in the DB metrics.
+        """
+        with timed(DB_SECONDS, DB_ERRORS, op=op):
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            try:
+                yield cursor
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def close(self):
+        self._connections.close()
 
     def _create_tables(self):
         """
         Create the reports table and ensure it has columns for competitor_rows and pdf_text.
+        Also creates the pdf_hashes table used to deduplicate uploads and
+        the report_index table holding each report's Q&A search index,
+        the jobs table tracking background analysis, report_pages with the compressed
+        text of every page, and report_texts (single compressed blob, reports saved before
+        page storage; reports.pdf_text is only read for even older rows), ingest_files with
+        the per-file status of bulk ingestion runs, financial_facts with the figures
+        extracted from each report, and report_stage_failures with the analysis stages
+        that failed or came back empty (re-run when the same PDF is uploaded again).
         """
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS reports (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    ticker TEXT,
-                    summary TEXT,
-                    competitors TEXT,
-                    competitor_rows TEXT,
-                    chart_filename TEXT,
-                    pdf_text TEXT,
-                    analysis_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            conn.commit()
+            with self._transaction("create_tables") as cursor:
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS reports (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        ticker TEXT,
+                        summary TEXT,
+                        competitors TEXT,
+                        competitor_rows TEXT,
+                        chart_filename TEXT,
+                        pdf_text TEXT,
+                        analysis_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_ticker ON reports (ticker, analysis_date)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_date ON reports (analysis_date)")
+                # content hash (sha256 of the uploaded PDF bytes) -> report id, used to skip re-analysis
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS pdf_hashes (
+                        content_hash TEXT PRIMARY KEY,
+                        report_id INTEGER NOT NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                # serialized search index (see finquery/retriever.py) used for report Q&A
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS report_index (
+                        report_id INTEGER PRIMARY KEY,
+                        version INTEGER NOT NULL,
+                        payload BLOB NOT NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                # background analysis jobs (see finquery/jobs.py); stages is a JSON dict of per-stage progress
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS jobs (
+                        id TEXT PRIMARY KEY,
+                        report_id INTEGER,
+                        status TEXT NOT NULL,
+                        stages TEXT,
+                        error TEXT,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_report ON jobs (report_id)")
+                # full report text, compressed and kept out of the reports row so normal reads stay small
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS report_texts (
+                        report_id INTEGER PRIMARY KEY,
+                        codec TEXT NOT NULL,
+                        char_count INTEGER NOT NULL,
+                        body BLOB NOT NULL
+                    )
+                """)
+                # one row per PDF page; char_offset is the page's position in the joined full text
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS report_pages (
+                        report_id INTEGER NOT NULL,
+                        page_no INTEGER NOT NULL,
+                        char_offset INTEGER NOT NULL,
+                        char_count INTEGER NOT NULL,
+                        codec TEXT NOT NULL,
+                        body BLOB NOT NULL,
+                        PRIMARY KEY (report_id, page_no)
+                    )
+                """)
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_report_pages_offset ON report_pages (report_id, char_offset)
+                """)
+                # bulk ingestion (see finquery/ingest.py): one row per source file, so a restart can resume
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS ingest_files (
+                        path TEXT PRIMARY KEY,
+                        size INTEGER,
+                        mtime REAL,
+                        content_hash TEXT,
+                        status TEXT NOT NULL,
+                        report_id INTEGER,
+                        error TEXT,
+                        seconds REAL,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                # extracted figures (see finquery/facts.py), one row per report, metric and fiscal period;
+                # fy is the fiscal year (2025 for FY25), quarter 1-4 or 0 for the full year
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS financial_facts (
+                        report_id INTEGER NOT NULL,
+                        metric TEXT NOT NULL,
+                        period TEXT NOT NULL,
+                        fy INTEGER NOT NULL,
+                        quarter INTEGER NOT NULL,
+                        value REAL NOT NULL,
+                        PRIMARY KEY (report_id, metric, period)
+                    )
+                """)
+                # pipeline stages (summary, company_info, ...) whose result is a fallback; rows are
+                # removed when the stage succeeds on a later run
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS report_stage_failures (
+                        report_id INTEGER NOT NULL,
+                        stage TEXT NOT NULL,
+                        error TEXT,
+                        failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (report_id, stage)
+                    )
+                """)
         except Exception as e:
-            print("[DB ERROR] _create_tables:", e)
-        finally:
-            try:
-                conn.close()
-            except:
-                pass
+            logger.error("[DB] _create_tables: %s", e)
+
+    @staticmethod
+    def _report_values(report_data):
+        return (
+            report_data.get('ticker', 'UNKNOWN'),
+            report_data.get('summary', ''),
+            json.dumps(report_data.get('competitors', [])),
+            json.dumps(report_data.get('competitor_rows', [])),
+            report_data.get('chart_filename', '')
+        )
+
+    def _insert_report(self, cursor, report_data):
+        """INSERT one reports row (in the caller's transaction) and return its id."""
+        cursor.execute("""
+            INSERT INTO reports (ticker, summary, competitors, competitor_rows, chart_filename)
+            VALUES (?, ?, ?, ?, ?)
+        """, self._report_values(report_data))
+        return cursor.lastrowid
+
+    @staticmethod
+    def _write_text(cursor, report_id, text):
+        codec, blob = compress_text(text or "")
+        cursor.execute("""
+            INSERT OR REPLACE INTO report_texts (report_id, codec, char_count, body)
+            VALUES (?, ?, ?, ?)
+        """, (report_id, codec, len(text or ""), sqlite3.Binary(blob)))
+        # drop any legacy uncompressed copy
+        cursor.execute("UPDATE reports SET pdf_text = NULL WHERE id = ? AND pdf_text IS NOT NULL", (report_id,))
 
     def save_report(self, report_data):
         """
@@ -56,50 +290,60 @@ class DataBaseManager:
          - pdf_text (str)
         """
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-
-            comps_str = json.dumps(report_data.get('competitors', []))
-            comp_rows_str = json.dumps(report_data.get('competitor_rows', []))
-            pdf_text = report_data.get('pdf_text', '') or ''
-
-            cursor.execute("""
-                INSERT INTO reports (ticker, summary, competitors, competitor_rows, chart_filename, pdf_text)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                report_data.get('ticker', 'UNKNOWN'),
-                report_data.get('summary', ''),
-                comps_str,
-                comp_rows_str,
-                report_data.get('chart_filename', ''),
-                pdf_text
-            ))
-            conn.commit()
-            new_id = cursor.lastrowid
-            conn.close()
-            print(f"--- [DB] Report saved successfully with ID: {new_id} ---")
+            with self._transaction("save_report") as cursor:
+                new_id = self._insert_report(cursor, report_data)
+                if report_data.get('pdf_text'):
+                    self._write_text(cursor, new_id, report_data['pdf_text'])
+            logger.debug("[DB] Report saved successfully with ID: %s", new_id)
             return new_id
         except Exception as e:
-            print(f"--- [DB ERROR] save_report failed: {e}")
-            try:
-                conn.close()
-            except:
-                pass
+            logger.error("[DB] save_report failed: %s", e)
             return None
 
-    def get_report(self, report_id):
+    def update_report(self, report_id, fields):
+        """
+        Update some columns of an existing report.
+        fields is a dict using the same keys as save_report (unknown keys are ignored).
+        """
+        allowed = ("ticker", "summary", "competitors", "competitor_rows", "chart_filename")
+        fields = fields or {}
+        updates = {k: v for k, v in fields.items() if k in allowed}
+        if not updates and "pdf_text" not in fields:
+            return False
+
+        for key in ("competitors", "competitor_rows"):
+            if key in updates:
+                updates[key] = json.dumps(updates[key] or [])
+
+        try:
+            with self._transaction("update_report") as cursor:
+                if "pdf_text" in fields:
+                    self._write_text(cursor, report_id, fields["pdf_text"])
+                if not updates:
+                    return True
+                assignments = ", ".join(f"{k} = ?" for k in updates)
+                cursor.execute(f"UPDATE reports SET {assignments} WHERE id = ?",
+                               (*updates.values(), report_id))
+                return cursor.rowcount > 0
+        except Exception as e:
+            logger.error("[DB] update_report failed for id=%s: %s", report_id, e)
+            return False
+
+    def get_report(self, report_id, include_text=False):
         """
         Fetch a single report by id. Returns a dict or None.
+        The full text is not loaded unless include_text=True; use get_report_text() when it is needed.
         """
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, ticker, summary, competitors, competitor_rows, chart_filename, pdf_text, analysis_date
-                FROM reports WHERE id = ?
-            """, (report_id,))
-            row = cursor.fetchone()
-            conn.close()
+            with self._transaction("get_report") as cursor:
+                cursor.execute("""
+                    SELECT id, ticker, summary, competitors, competitor_rows, chart_filename, analysis_date,
+                           (pdf_text IS NOT NULL AND pdf_text != '') OR
+                           EXISTS (SELECT 1 FROM report_texts t WHERE t.report_id = reports.id) OR
+                           EXISTS (SELECT 1 FROM report_pages p WHERE p.report_id = reports.id) AS has_text
+                    FROM reports WHERE id = ?
+                """, (report_id,))
+                row = cursor.fetchone()
             if not row:
                 return None
 
@@ -111,20 +355,613 @@ class DataBaseManager:
                 except Exception:
                     return []
 
-            return {
+            report = {
                 "id": row["id"],
                 "ticker": row["ticker"],
                 "summary": row["summary"],
                 "competitors": _safe_load(row["competitors"]),
                 "competitor_rows": _safe_load(row["competitor_rows"]),
                 "chart_filename": row["chart_filename"] or "",
-                "pdf_text": row["pdf_text"] or "",
+                "has_text": bool(row["has_text"]),
                 "analysis_date": row["analysis_date"]
             }
+            if include_text:
+                report["pdf_text"] = self.get_report_text(report_id) if report["has_text"] else ""
+            return report
         except Exception as e:
-            print(f"[DB ERROR] get_report failed for id={report_id}: {e}")
-            try:
-                conn.close()
-            except:
-                pass
+            logger.error("[DB] get_report failed for id=%s: %s", report_id, e)
             return None
+
+    def list_reports(self, ticker=None, since=None, until=None, after=None, limit=50, newest_first=True,
+                     summary_chars=200):
+        """
+        One page of reports, ordered by (analysis_date, id), as light rows: id, ticker, analysis_date,
+        competitors, chart_filename and the first summary_chars of the summary (never the text).
+        ticker filters exactly; since/until bound analysis_date (since inclusive, until exclusive).
+        after is the (analysis_date, id) of the last row of the previous page (keyset pagination:
+        every page is a range seek on idx_reports_ticker / idx_reports_date, whatever its depth).
+        Returns (rows, has_more), or ([], False) on error.
+        """
+        # placeholder rows of unfinished or failed analyses are not reports yet
+        where, params = [f"ticker NOT IN ({', '.join('?' * len(PLACEHOLDER_TICKERS))})"], list(PLACEHOLDER_TICKERS)
+        if ticker is not None:
+            where.append("ticker = ?")
+            params.append(ticker)
+        if since is not None:
+            where.append("analysis_date >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("analysis_date < ?")
+            params.append(until)
+        if after is not None:
+            # id is the rowid, which SQLite keeps at the end of every index key
+            where.append(f"(analysis_date, id) {'<' if newest_first else '>'} (?, ?)")
+            params.extend(after)
+        direction = "DESC" if newest_first else "ASC"
+        params.append(limit + 1)  # one extra row tells whether there is another page
+
+        try:
+            with self._transaction("list_reports") as cursor:
+                cursor.execute(f"""
+                    SELECT id, ticker, analysis_date, competitors, chart_filename,
+                           substr(summary, 1, {int(summary_chars)}) AS summary
+                    FROM reports
+                    WHERE {" AND ".join(where)}
+                    ORDER BY analysis_date {direction}, id {direction}
+                    LIMIT ?
+                """, params)
+                rows = cursor.fetchall()
+            reports = []
+            for row in rows[:limit]:
+                try:
+                    competitors = json.loads(row["competitors"]) if row["competitors"] else []
+                except Exception:
+                    competitors = []
+                reports.append({
+                    "id": row["id"],
+                    "ticker": row["ticker"],
+                    "analysis_date": row["analysis_date"],
+                    "summary": row["summary"] or "",
+                    "competitors": competitors,
+                    "chart_filename": row["chart_filename"] or "",
+                })
+            return reports, len(rows) > limit
+        except Exception as e:
+            logger.error("[DB] list_reports failed: %s", e)
+            return [], False
+
+    def save_report_pages(self, report_id, pages):
+        """
+        Store the text of every page (compressed, one row per page) in one transaction.
+        pages is an iterable of page strings in page order; returns the total character count.
+        """
+        try:
+            with self._transaction("save_report_pages") as cursor:
+                return self._write_pages(cursor, report_id, pages)
+        except Exception as e:
+            logger.error("[DB] save_report_pages failed for id=%s: %s", report_id, e)
+            return 0
+
+    @staticmethod
+    def _write_pages(cursor, report_id, pages):
+        def rows():
+            offset = 0
+            for page_no, text in enumerate(pages):
+                codec, blob = compress_text(text)
+                yield (report_id, page_no, offset, len(text), codec, sqlite3.Binary(blob))
+                offset += len(text)
+            totals.append(offset)
+
+        totals = []
+        cursor.execute("DELETE FROM report_pages WHERE report_id = ?", (report_id,))
+        cursor.executemany("""
+            INSERT INTO report_pages (report_id, page_no, char_offset, char_count, codec, body)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, rows())
+        return totals[0] if totals else 0
+
+    @staticmethod
+    def _write_facts(cursor, report_id, facts):
+        """Replace the facts of a report; facts are (metric, period, fy, quarter, value) tuples."""
+        cursor.execute("DELETE FROM financial_facts WHERE report_id = ?", (report_id,))
+        cursor.executemany("""
+            INSERT OR REPLACE INTO financial_facts (report_id, metric, period, fy, quarter, value)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [(report_id, *fact) for fact in facts])
+
+    def save_facts(self, report_id, facts):
+        """
+        Store the extracted figures of a report (replacing earlier ones, e.g. after a refresh).
+        facts: (metric, period, fy, quarter, value) tuples, see facts.revenue_facts.
+        """
+        try:
+            with self._transaction("save_facts") as cursor:
+                self._write_facts(cursor, report_id, facts)
+            return True
+        except Exception as e:
+            logger.error("[DB] save_facts failed for id=%s: %s", report_id, e)
+            return False
+
+    def iter_facts(self, tickers=None, metric=None, batch_size=50000):
+        """
+        Stream every fact with its report's ticker and analysis_date, as lists of rows
+        (report_id, ticker, analysis_date, metric, period, fy, quarter, value) of up to batch_size.
+        """
+        where, params = [], []
+        if tickers:
+            where.append(f"r.ticker IN ({', '.join('?' * len(tickers))})")
+            params.extend(tickers)
+        if metric:
+            where.append("f.metric = ?")
+            params.append(metric)
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT f.report_id, r.ticker, r.analysis_date, f.metric, f.period, f.fy, f.quarter, f.value
+                FROM financial_facts f JOIN reports r ON r.id = f.report_id
+                {"WHERE " + " AND ".join(where) if where else ""}
+                ORDER BY f.report_id
+            """, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [tuple(row) for row in rows]
+        finally:
+            cursor.close()
+
+    def reports_without_facts(self, after_id=0, limit=500):
+        """Ids of reports with no stored facts (saved before facts were kept), above after_id, in id order."""
+        try:
+            with self._transaction("reports_without_facts") as cursor:
+                cursor.execute("""
+                    SELECT id FROM reports
+                    WHERE id > ? AND NOT EXISTS (SELECT 1 FROM financial_facts f WHERE f.report_id = reports.id)
+                    ORDER BY id LIMIT ?
+                """, (after_id, limit))
+                return [row["id"] for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error("[DB] reports_without_facts failed: %s", e)
+            return []
+
+    def chart_files_in_use(self):
+        """File names of the charts saved reports show (chart_filename is "charts/<name>")."""
+        with self._transaction("chart_files_in_use") as cursor:
+            cursor.execute("SELECT DISTINCT chart_filename FROM reports WHERE chart_filename != ''")
+            return {os.path.basename(row["chart_filename"]) for row in cursor.fetchall()}
+
+    def iter_report_pages(self, report_id, start_page=0, end_page=None, batch_size=16):
+        """
+        Stream (page_no, text) for pages [start_page, end_page) without loading the whole
+        document: rows are fetched and decompressed a batch at a time.
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT page_no, codec, body FROM report_pages
+                WHERE report_id = ? AND page_no >= ? AND page_no < ?
+                ORDER BY page_no
+            """, (report_id, start_page, end_page if end_page is not None else 2 ** 31))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row["page_no"], decompress_text(row["codec"], bytes(row["body"]))
+        finally:
+            cursor.close()
+
+    def read_text_spans(self, report_id, spans):
+        """
+        Return the text for each (start, end) character span of the full report text,
+        decompressing only the pages that overlap a span. Each span (overlapping ones merged)
+        is its own index seek, so spans far apart never load the pages between them.
+        """
+        spans = [(int(a), int(b)) for a, b in spans]
+        if not spans:
+            return []
+        ranges = []
+        for a, b in sorted(s for s in spans if s[1] > s[0]):
+            if ranges and a <= ranges[-1][1]:
+                ranges[-1][1] = max(ranges[-1][1], b)
+            else:
+                ranges.append([a, b])
+
+        pages = {}
+        try:
+            with self._transaction("read_text_spans") as cursor:
+                for a, b in ranges:
+                    # from the page holding character a (the last one starting at or before it) up to b
+                    cursor.execute("""
+                        SELECT char_offset, char_count, codec, body FROM report_pages
+                        WHERE report_id = ? AND char_offset < ? AND char_offset >= COALESCE(
+                            (SELECT MAX(char_offset) FROM report_pages WHERE report_id = ? AND char_offset <= ?), 0)
+                        ORDER BY char_offset
+                    """, (report_id, b, report_id, a))
+                    for row in cursor.fetchall():
+                        offset, count = row["char_offset"], row["char_count"]
+                        if offset not in pages and offset + count > a:
+                            pages[offset] = (count, decompress_text(row["codec"], bytes(row["body"])))
+                has_pages = bool(pages)
+                if not has_pages:
+                    cursor.execute("SELECT 1 FROM report_pages WHERE report_id = ? LIMIT 1", (report_id,))
+                    has_pages = cursor.fetchone() is not None
+        except Exception as e:
+            logger.error("[DB] read_text_spans failed for id=%s: %s", report_id, e)
+            return ["" for _ in spans]
+
+        if not has_pages:
+            # report saved before page storage: slice the single stored text
+            text = self.get_report_text(report_id)
+            return [text[a:b] for a, b in spans]
+
+        out = []
+        for a, b in spans:
+            parts = [text[max(a - offset, 0):b - offset] for offset, (count, text) in sorted(pages.items())
+                     if a < offset + count and b > offset]
+            out.append("".join(parts))
+        return out
+
+    def get_report_text(self, report_id):
+        """
+        Full stored text of a report ('' if none), decompressed on demand.
+        """
+        try:
+            with self._transaction("get_report_text") as cursor:
+                cursor.execute("SELECT 1 FROM report_pages WHERE report_id = ? LIMIT 1", (report_id,))
+                if cursor.fetchone() is not None:
+                    return "".join(text for _, text in self.iter_report_pages(report_id))
+
+                cursor.execute("SELECT codec, body FROM report_texts WHERE report_id = ?", (report_id,))
+                row = cursor.fetchone()
+                if row is None:
+                    # rows saved before report_texts existed
+                    cursor.execute("SELECT pdf_text FROM reports WHERE id = ?", (report_id,))
+                    legacy = cursor.fetchone()
+                    return (legacy["pdf_text"] or "") if legacy else ""
+            return decompress_text(row["codec"], bytes(row["body"]))
+        except Exception as e:
+            logger.error("[DB] get_report_text failed for id=%s: %s", report_id, e)
+            return ""
+
+    def migrate_report_texts(self, batch_size=200):
+        """
+        Move legacy uncompressed reports.pdf_text values into report_texts.
+        Returns the number of rows moved (vacuum() afterwards gives the space back).
+        Run by `python -m finquery db migrate-texts`.
+        """
+        moved = 0
+        try:
+            while True:
+                with self._transaction("migrate_report_texts") as cursor:
+                    cursor.execute("""
+                        SELECT id, pdf_text FROM reports
+                        WHERE pdf_text IS NOT NULL AND pdf_text != '' LIMIT ?
+                    """, (batch_size,))
+                    rows = cursor.fetchall()
+                    for row in rows:
+                        self._write_text(cursor, row["id"], row["pdf_text"])
+                if not rows:
+                    break
+                moved += len(rows)
+            logger.info("[DB] Moved %s report texts to compressed storage", moved)
+        except Exception as e:
+            logger.error("[DB] migrate_report_texts failed: %s", e)
+        return moved
+
+    def vacuum(self):
+        """Rebuild the database file so the space of deleted data is returned (locks the database meanwhile)."""
+        try:
+            conn = self._get_connection()
+            conn.commit()
+            conn.execute("VACUUM")
+            logger.info("[DB] Vacuumed %s", self.db_path)
+            return True
+        except Exception as e:
+            logger.error("[DB] vacuum failed: %s", e)
+            return False
+
+    @staticmethod
+    def _write_stage_failures(cursor, report_id, failures):
+        cursor.executemany("""
+            INSERT OR REPLACE INTO report_stage_failures (report_id, stage, error) VALUES (?, ?, ?)
+        """, [(report_id, stage, error) for stage, error in failures.items()])
+
+    def record_stage_result(self, report_id, stage, error=None):
+        """Remember that a report's stage failed (error set) or clear it once the stage succeeded."""
+        try:
+            with self._transaction("record_stage_result") as cursor:
+                if error is None:
+                    cursor.execute("DELETE FROM report_stage_failures WHERE report_id = ? AND stage = ?",
+                                   (report_id, stage))
+                else:
+                    self._write_stage_failures(cursor, report_id, {stage: str(error)})
+            return True
+        except Exception as e:
+            logger.error("[DB] record_stage_result failed for id=%s: %s", report_id, e)
+            return False
+
+    def get_failed_stages(self, report_id):
+        """{stage: error} for the stages of a report whose last run failed or came back empty."""
+        try:
+            with self._transaction("get_failed_stages") as cursor:
+                cursor.execute("SELECT stage, error FROM report_stage_failures WHERE report_id = ?", (report_id,))
+                return {row["stage"]: row["error"] for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error("[DB] get_failed_stages failed for id=%s: %s", report_id, e)
+            return {}
+
+    def find_report_by_hash(self, content_hash):
+        """
+        Look up the report id previously stored for a PDF content hash.
+        Returns the id, or None if the hash is unknown or its report was deleted.
+        """
+        try:
+            with self._transaction("find_report_by_hash") as cursor:
+                cursor.execute("""
+                    SELECT h.report_id FROM pdf_hashes h
+                    JOIN reports r ON r.id = h.report_id
+                    WHERE h.content_hash = ?
+                """, (content_hash,))
+                row = cursor.fetchone()
+            return row["report_id"] if row else None
+        except Exception as e:
+            logger.error("[DB] find_report_by_hash failed: %s", e)
+            return None
+
+    def delete_pdf_hash(self, content_hash, report_id=None):
+        """
+        Forget a content hash (e.g. its analysis failed and should run again on the next upload);
+        with report_id, only while it still maps to that report.
+        """
+        try:
+            with self._transaction("delete_pdf_hash") as cursor:
+                cursor.execute("DELETE FROM pdf_hashes WHERE content_hash = ? AND (? IS NULL OR report_id = ?)",
+                               (content_hash, report_id, report_id))
+            return True
+        except Exception as e:
+            logger.error("[DB] delete_pdf_hash failed: %s", e)
+            return False
+
+    def fail_placeholder_report(self, report_id):
+        """Mark a report whose analysis failed before it found a ticker (hidden from listings)."""
+        try:
+            with self._transaction("fail_placeholder_report") as cursor:
+                cursor.execute("UPDATE reports SET ticker = 'FAILED' WHERE id = ? AND ticker = 'PENDING'",
+                               (report_id,))
+            return True
+        except Exception as e:
+            logger.error("[DB] fail_placeholder_report failed for id=%s: %s", report_id, e)
+            return False
+
+    def save_pdf_hash(self, content_hash, report_id):
+        """
+        Map a PDF content hash to a report id (replaces any stale mapping).
+        """
+        try:
+            with self._transaction("save_pdf_hash") as cursor:
+                cursor.execute("""
+                    INSERT OR REPLACE INTO pdf_hashes (content_hash, report_id)
+                    VALUES (?, ?)
+                """, (content_hash, report_id))
+            return True
+        except Exception as e:
+            logger.error("[DB] save_pdf_hash failed: %s", e)
+            return False
+
+    def save_report_index(self, report_id, payload, version):
+        """
+        Store (or replace) the serialized Q&A index of a report.
+        """
+        try:
+            with self._transaction("save_report_index") as cursor:
+                cursor.execute("""
+                    INSERT OR REPLACE INTO report_index (report_id, version, payload)
+                    VALUES (?, ?, ?)
+                """, (report_id, version, sqlite3.Binary(payload)))
+            return True
+        except Exception as e:
+            logger.error("[DB] save_report_index failed for id=%s: %s", report_id, e)
+            return False
+
+    def get_report_index(self, report_id, version):
+        """
+        Return the serialized index bytes of a report, or None if missing or built with another version.
+        """
+        try:
+            with self._transaction("get_report_index") as cursor:
+                cursor.execute("""
+                    SELECT payload FROM report_index WHERE report_id = ? AND version = ?
+                """, (report_id, version))
+                row = cursor.fetchone()
+            return bytes(row["payload"]) if row else None
+        except Exception as e:
+            logger.error("[DB] get_report_index failed for id=%s: %s", report_id, e)
+            return None
+
+    def get_ingest_files(self):
+        """
+        Bulk ingestion status of every file seen so far: {path: {"size", "mtime", "content_hash",
+        "status", "report_id"}}.
+        """
+        try:
+            with self._transaction("get_ingest_files") as cursor:
+                cursor.execute("SELECT path, size, mtime, content_hash, status, report_id FROM ingest_files")
+                return {row["path"]: dict(row) for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error("[DB] get_ingest_files failed: %s", e)
+            return {}
+
+    def save_ingest_batch(self, entries, index_version):
+        """
+        Commit a batch of bulk-ingested files in a single transaction (all or nothing).
+        Each entry is a dict with path, size, mtime, content_hash, status ("done", "duplicate"
+        or "failed"), error, seconds, and for new reports: report (save_report fields, plus facts
+        and failed_stages), pages, index (serialized Q&A index or None). Returns {path: report_id}, or None on failure.
+        """
+        try:
+            ids = {}
+            with self._transaction("save_ingest_batch") as cursor:
+                for entry in entries:
+                    report_id = entry.get("report_id")
+                    if entry["status"] == "duplicate" and report_id is None:
+                        # copy of a file committed earlier in this same batch
+                        cursor.execute("SELECT report_id FROM pdf_hashes WHERE content_hash = ?",
+                                       (entry["content_hash"],))
+                        row = cursor.fetchone()
+                        report_id = row["report_id"] if row else None
+                    if entry["status"] == "done" and entry.get("report") is not None:
+                        report_id = self._insert_report(cursor, entry["report"])
+                        self._write_pages(cursor, report_id, entry.get("pages") or [])
+                        self._write_facts(cursor, report_id, entry["report"].get("facts") or [])
+                        self._write_stage_failures(cursor, report_id, entry["report"].get("failed_stages") or {})
+                        if entry.get("index"):
+                            cursor.execute("""
+                                INSERT OR REPLACE INTO report_index (report_id, version, payload)
+                                VALUES (?, ?, ?)
+                            """, (report_id, index_version, sqlite3.Binary(entry["index"])))
+                        cursor.execute("""
+                            INSERT OR REPLACE INTO pdf_hashes (content_hash, report_id) VALUES (?, ?)
+                        """, (entry["content_hash"], report_id))
+                    cursor.execute("""
+                        INSERT OR REPLACE INTO ingest_files
+                            (path, size, mtime, content_hash, status, report_id, error, seconds, updated_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    """, (entry["path"], entry.get("size"), entry.get("mtime"), entry.get("content_hash"),
+                          entry["status"], report_id, entry.get("error"), entry.get("seconds")))
+                    ids[entry["path"]] = report_id
+            return ids
+        except Exception as e:
+            logger.error("[DB] save_ingest_batch failed: %s", e)
+            return None
+
+    def create_job(self, job_id, report_id, status="queued"):
+        """
+        Register a background job for a report.
+        """
+        try:
+            with self._transaction("create_job") as cursor:
+                cursor.execute("""
+                    INSERT INTO jobs (id, report_id, status, stages) VALUES (?, ?, ?, ?)
+                """, (job_id, report_id, status, json.dumps({})))
+            return True
+        except Exception as e:
+            logger.error("[DB] create_job failed: %s", e)
+            return False
+
+    def update_job(self, job_id, status=None, stages=None, error=None):
+        """
+        Update a job's status, per-stage progress dict and/or error message.
+        """
+        updates = {}
+        if status is not None:
+            updates["status"] = status
+        if stages is not None:
+            updates["stages"] = json.dumps(stages)
+        if error is not None:
+            updates["error"] = error
+        if not updates:
+            return False
+        try:
+            with self._transaction("update_job") as cursor:
+                assignments = ", ".join(f"{k} = ?" for k in updates)
+                cursor.execute(f"UPDATE jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                               (*updates.values(), job_id))
+            return True
+        except Exception as e:
+            logger.error("[DB] update_job failed for %s: %s", job_id, e)
+            return False
+
+    def start_job(self, job_id):
+        """Move a queued job to running; False if it is no longer queued (e.g. failed as abandoned)."""
+        try:
+            with self._transaction("start_job") as cursor:
+                cursor.execute("""
+                    UPDATE jobs SET status = 'running', updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND status = 'queued'
+                """, (job_id,))
+                return cursor.rowcount > 0
+        except Exception as e:
+            logger.error("[DB] start_job failed for %s: %s", job_id, e)
+            return False
+
+    def touch_jobs(self, job_ids):
+        """Heartbeat: mark unfinished jobs as still owned by a live process."""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return True
+        try:
+            with self._transaction("touch_jobs") as cursor:
+                cursor.execute(f"""
+                    UPDATE jobs SET updated_at = CURRENT_TIMESTAMP
+                    WHERE id IN ({', '.join('?' * len(job_ids))}) AND status IN ('queued', 'running')
+                """, job_ids)
+            return True
+        except Exception as e:
+            logger.error("[DB] touch_jobs failed: %s", e)
+            return False
+
+    def get_job(self, job_id=None, report_id=None):
+        """
+        Fetch a job by id, or the latest job of a report. Returns a dict or None.
+        A queued/running job without a heartbeat for JOB_STALE_SECONDS is failed first (its process is gone).
+        """
+        stale_before = f"-{JOB_STALE_SECONDS} seconds"
+        try:
+            with self._transaction("get_job") as cursor:
+                if job_id is not None:
+                    cursor.execute("SELECT *, updated_at < datetime('now', ?) AS stale FROM jobs WHERE id = ?",
+                                   (stale_before, job_id))
+                else:
+                    cursor.execute("""
+                        SELECT *, updated_at < datetime('now', ?) AS stale FROM jobs
+                        WHERE report_id = ? ORDER BY created_at DESC, rowid DESC LIMIT 1
+                    """, (stale_before, report_id))
+                row = cursor.fetchone()
+            if not row:
+                return None
+            if row["stale"] and row["status"] in ("queued", "running"):
+                self.fail_unfinished_jobs(reason="abandoned: no progress", older_than=JOB_STALE_SECONDS)
+                return self.get_job(job_id=row["id"])
+            return {
+                "id": row["id"],
+                "report_id": row["report_id"],
+                "status": row["status"],
+                "stages": json.loads(row["stages"] or "{}"),
+                "error": row["error"],
+                "created_at": row["created_at"],
+                "updated_at": row["updated_at"],
+            }
+        except Exception as e:
+            logger.error("[DB] get_job failed: %s", e)
+            return None
+
+    def fail_unfinished_jobs(self, reason="interrupted by restart", older_than=None):
+        """
+        Mark queued/running jobs as failed because their worker threads are gone: all of them
+        (single process start-up), or those without progress for older_than seconds. Their
+        placeholder reports are marked FAILED and lose their content hash, so a re-upload of
+        the same PDF is analyzed again.
+        """
+        unfinished = "status IN ('queued', 'running')"
+        params = ()
+        if older_than is not None:
+            unfinished += " AND updated_at < datetime('now', ?)"
+            params = (f"-{int(older_than)} seconds",)
+        placeholders = f"""
+            SELECT id FROM reports WHERE ticker = 'PENDING' AND id IN (SELECT report_id FROM jobs WHERE {unfinished})
+        """
+        try:
+            with self._transaction("fail_unfinished_jobs") as cursor:
+                cursor.execute(f"DELETE FROM pdf_hashes WHERE report_id IN ({placeholders})", params)
+                cursor.execute(f"UPDATE reports SET ticker = 'FAILED' WHERE id IN ({placeholders})", params)
+                cursor.execute(f"""
+                    UPDATE jobs SET status = 'failed', error = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE {unfinished}
+                """, (reason, *params))
+                return cursor.rowcount
+        except Exception as e:
+            logger.error("[DB] fail_unfinished_jobs failed: %s", e)
+            return 0
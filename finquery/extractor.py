@@ -0,0 +1,152 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from finquery.metrics import EXTRACT_SECONDS, EXTRACT_PAGES, EXTRACT_ERRORS, timed
+
+logger = logging.getLogger(__name__)
+
+# Worker processes used for page extraction (0/1 = always extract in-process)
+PDF_EXTRACT_WORKERS = int(os.environ.get("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+# Below this many pages per worker the process start-up costs more than it saves
+MIN_PAGES_PER_WORKER = int(os.environ.get("PDF_MIN_PAGES_PER_WORKER", 25))
+# Print the time spent on every single page (otherwise only a one-line summary)
+PDF_EXTRACT_TIMINGS = os.environ.get("PDF_EXTRACT_TIMINGS", "0") == "1"
+
+
+def open_pdf(source):
+    """fitz Document for a PDF given as a path or as its bytes (e.g. an upload kept in memory)."""
+    import fitz
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+
+def source_label(source):
+    """Printable name of a PDF source."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return f"<in-memory PDF, {len(source) / 1e6:.1f} MB>"
+    return str(source)
+
+
+def _extract_page_range(pdf_path, start, stop):
+    """
+    Worker entry point: open the PDF independently and extract pages [start, stop).
+    Returns a list of (page_text, seconds) tuples in page order.
+    """
+    results = []
+    doc = open_pdf(pdf_path)
+    try:
+        for page_no in range(start, stop):
+            t0 = time.perf_counter()
+            text = doc[page_no].get_text()
+            results.append((text, time.perf_counter() - t0))
+    finally:
+        doc.close()
+    return results
+
+
+def _split_ranges(page_count, parts):
+    """Split page_count pages into `parts` contiguous (start, stop) ranges of near-equal size."""
+    size, extra = divmod(page_count, parts)
+    ranges = []
+    start = 0
+    for i in range(parts):
+        stop = start + size + (1 if i < extra else 0)
+        if stop > start:
+            ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+class PDFExtractor:
+
+    def __init__(self, max_workers=PDF_EXTRACT_WORKERS, min_pages_per_worker=MIN_PAGES_PER_WORKER,
+                 show_timings=PDF_EXTRACT_TIMINGS):
+        self.max_workers = max(1, int(max_workers or 1))
+        self.min_pages_per_worker = max(1, int(min_pages_per_worker))
+        self.show_timings = show_timings
+        self._pool = None
+        self._pool_lock = threading.Lock()  # one extractor is shared by the web app's job threads
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                # never forked: the app has gRPC, SQLite and job threads running, which a fork would copy mid-state
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context(method))
+            return self._pool
+
+    def shutdown(self):
+        """Stop the worker processes (they are started lazily on the first big PDF)."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def extract_pages(self, pdf_path):
+        """
+        Extract the text of every page, in page order. pdf_path may also be the PDF's bytes.
+        Large documents are split into page ranges and handled by a process pool, each
+        worker opening the file (or its copy of the bytes) itself; small ones are read in-process.
+        """
+        with timed(EXTRACT_SECONDS, EXTRACT_ERRORS):
+            pages, _ = self._extract_pages(pdf_path)
+        EXTRACT_PAGES.inc(len(pages))
+        return pages
+
+    def _extract_pages(self, pdf_path):
+        """(pages, per-page seconds) of this call; nothing is kept on the shared instance."""
+        t0 = time.perf_counter()
+        doc = open_pdf(pdf_path)
+        page_count = doc.page_count
+        doc.close()
+
+        workers = min(self.max_workers, page_count // self.min_pages_per_worker)
+        if isinstance(pdf_path, (bytearray, memoryview)):
+            pdf_path = bytes(pdf_path)  # picklable for the workers
+        results = None
+        if workers > 1:
+            try:
+                ranges = _split_ranges(page_count, workers)
+                pool = self._get_pool()
+                futures = [pool.submit(_extract_page_range, pdf_path, start, stop) for start, stop in ranges]
+                results = [item for fut in futures for item in fut.result()]
+            except BrokenProcessPool as e:
+                logger.warning("[Extractor] Process pool failed (%s), falling back to single process", e)
+                with self._pool_lock:
+                    if self._pool is pool:  # another job may already have started a new one
+                        self._pool = None
+                results = None
+                workers = 1
+
+        if results is None:
+            workers = 1
+            results = _extract_page_range(pdf_path, 0, page_count)
+
+        pages = [text for text, _ in results]
+        timings = [seconds for _, seconds in results]
+        self._report_timings(timings, page_count, workers, time.perf_counter() - t0)
+        return pages, timings
+
+    def extract_text(self, pdf_path):
+        """Full document text (pages joined once, no repeated string concatenation)."""
+        return "".join(self.extract_pages(pdf_path))
+
+    def _report_timings(self, timings, page_count, workers, elapsed):
+        if self.show_timings:
+            for page_no, seconds in enumerate(timings, start=1):
+                logger.info("    page %4s: %.1f ms", page_no, seconds * 1000)
+
+        if timings:
+            slowest = max(range(len(timings)), key=timings.__getitem__)
+            logger.debug("[Extractor] %s pages in %.2fs using %s worker(s) (slowest: page %s, %.1f ms)",
+                         page_count, elapsed, workers, slowest + 1, timings[slowest] * 1000)
+        else:
+            logger.debug("[Extractor] PDF has no pages (%.2fs)", elapsed)
@@ -0,0 +1,166 @@
+import logging
+
+from finquery.tables import fiscal_year, normalize_period, parse_amount
+
+logger = logging.getLogger(__name__)
+
+# Columns of the facts export (and of FactAnalytics.frame); values are in ₹ crore like the charts
+FACT_COLUMNS = ["report_id", "ticker", "analysis_date", "metric", "period", "fy", "quarter", "value"]
+
+
+def revenue_facts(chart_data):
+    """
+    Normalized facts from the chart data of a report ({"Q1 FY25": 62613, "FY24": "2,40,893"}):
+    (metric, period, fy, quarter, value) tuples for database.save_facts. Labels that are not a
+    fiscal period, estimates (FY26E) and values that are not numbers are dropped. fy is the
+    four-digit year: "FY1998" and "FY98" are both 1998.
+    """
+    facts = {}
+    for label, raw in (chart_data or {}).items():
+        parsed = normalize_period(label)
+        if parsed is None or parsed[1]:
+            continue
+        period = parsed[0]
+        value = raw if isinstance(raw, (int, float)) and not isinstance(raw, bool) else parse_amount(str(raw))
+        if value is None:
+            continue
+        fy = fiscal_year(label)
+        quarter = int(period[1]) if period.startswith("Q") else 0
+        facts[period] = ("revenue", period, fy, quarter, float(value))
+    return list(facts.values())
+
+
+def backfill_facts(db, extractor=None, batch_size=500):
+    """
+    Facts for reports saved before facts were kept, read from their stored text with the local
+    table reader (no LLM calls). Reports it cannot read confidently are left without facts.
+    Returns (reports filled, reports checked).
+    """
+    from finquery.tables import RevenueTableExtractor
+
+    extractor = extractor or RevenueTableExtractor()
+    filled = checked = 0
+    last_id = 0
+    while True:
+        ids = db.reports_without_facts(after_id=last_id, limit=batch_size)
+        if not ids:
+            break
+        for report_id in ids:
+            pages = [text for _, text in db.iter_report_pages(report_id)] or [db.get_report_text(report_id) or ""]
+            try:
+                data, confidence = extractor.extract(pages=pages)
+            except Exception as e:
+                logger.warning("[Facts] Report %s: table extraction failed: %s", report_id, e)
+                data, confidence = {}, 0.0
+            facts = revenue_facts(data) if confidence >= extractor.min_confidence else []
+            if facts and db.save_facts(report_id, facts):
+                filled += 1
+            checked += 1
+        last_id = ids[-1]
+        logger.info("[Facts] Backfill: %s of %s reports filled", filled, checked)
+    return filled, checked
+
+
+def export_parquet(db, path, tickers=None, metric=None, batch_size=50000):
+    """
+    Write the facts (FACT_COLUMNS, one row per report, metric and period) to a Parquet file,
+    streaming from SQLite a batch at a time. Returns the number of rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("report_id", pa.int64()), ("ticker", pa.string()), ("analysis_date", pa.string()),
+        ("metric", pa.string()), ("period", pa.string()), ("fy", pa.int16()), ("quarter", pa.int8()),
+        ("value", pa.float64()),
+    ])
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for batch in db.iter_facts(tickers=tickers, metric=metric, batch_size=batch_size):
+            columns = list(zip(*batch))
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)], schema=schema))
+            rows += len(batch)
+    logger.info("[Facts] Exported %s facts to %s", rows, path)
+    return rows
+
+
+class FactAnalytics:
+    """
+    Cross-report analytics over the stored facts with pandas: every computation is a
+    whole-column operation (merge, groupby, rank), so thousands of reports take
+    milliseconds and no PDF or LLM is touched. When several reports give a figure for the
+    same ticker and period, the most recently analyzed one wins.
+    """
+
+    def __init__(self, frame):
+        frame = frame.sort_values(["analysis_date", "report_id"], kind="stable")
+        self.frame = frame.drop_duplicates(["ticker", "metric", "fy", "quarter"], keep="last").reset_index(drop=True)
+
+    @classmethod
+    def from_db(cls, db, tickers=None, metric="revenue"):
+        import pandas as pd
+
+        batches = [pd.DataFrame.from_records(batch, columns=FACT_COLUMNS)
+                   for batch in db.iter_facts(tickers=tickers, metric=metric)]
+        frame = pd.concat(batches, ignore_index=True) if batches else pd.DataFrame(columns=FACT_COLUMNS)
+        return cls(frame.astype({"fy": "int64", "quarter": "int64", "value": "float64"}))
+
+    @classmethod
+    def from_parquet(cls, path):
+        import pandas as pd
+
+        return cls(pd.read_parquet(path).astype({"fy": "int64", "quarter": "int64"}))
+
+    def series(self, ticker, metric="revenue"):
+        """One ticker's figures in period order."""
+        f = self.frame
+        rows = f[(f["ticker"] == ticker) & (f["metric"] == metric)]
+        return rows.sort_values(["fy", "quarter"])[["period", "fy", "quarter", "value", "report_id"]]
+
+    def yoy(self, metric="revenue"):
+        """Year-on-year growth of every period against the same period a year earlier (quarters vs quarters)."""
+        f = self.frame[self.frame["metric"] == metric]
+        prior = f[["ticker", "fy", "quarter", "value"]].assign(fy=f["fy"] + 1)
+        out = f.merge(prior, on=["ticker", "fy", "quarter"], how="left", suffixes=("", "_prior"))
+        out["yoy"] = (out["value"] / out["value_prior"].where(out["value_prior"] > 0)) - 1
+        return out[["ticker", "period", "fy", "quarter", "value", "value_prior", "yoy"]]
+
+    def cagr(self, metric="revenue", start_fy=None, end_fy=None):
+        """Compound annual growth per ticker between its first and last full-year figure in [start_fy, end_fy]."""
+        import numpy as np
+
+        f = self.frame
+        annual = f[(f["metric"] == metric) & (f["quarter"] == 0)]
+        if start_fy is not None:
+            annual = annual[annual["fy"] >= start_fy]
+        if end_fy is not None:
+            annual = annual[annual["fy"] <= end_fy]
+        grouped = annual.sort_values("fy").groupby("ticker")[["fy", "value"]]
+        first, last = grouped.first(), grouped.last()
+        years = last["fy"] - first["fy"]
+        valid = (years > 0) & (first["value"] > 0) & (last["value"] > 0)
+        ratio = (last["value"] / first["value"]).where(valid)
+        out = first.join(last, lsuffix="_start", rsuffix="_end")
+        out["years"] = years
+        out["cagr"] = np.power(ratio, 1.0 / years.where(valid)) - 1
+        return out.reset_index()
+
+    def peer_ranking(self, tickers=None, fy=None, metric="revenue"):
+        """
+        Full-year figure, YoY growth and CAGR per ticker for fiscal year fy (default: the latest
+        year with data), with a rank for each (1 = largest / fastest growing).
+        """
+        growth = self.yoy(metric)
+        annual = growth[growth["quarter"] == 0]
+        if tickers:
+            annual = annual[annual["ticker"].isin(tickers)]
+        columns = ["ticker", "period", "value", "yoy", "cagr", "value_rank", "yoy_rank", "cagr_rank"]
+        if annual.empty:
+            return annual.reindex(columns=columns)
+        fy = fy or int(annual["fy"].max())
+        table = annual[annual["fy"] == fy].merge(self.cagr(metric, end_fy=fy)[["ticker", "cagr"]],
+                                                 on="ticker", how="left")
+        for column in ("value", "yoy", "cagr"):
+            table[f"{column}_rank"] = table[column].rank(ascending=False, method="min").astype("Int64")
+        return table.sort_values("value_rank").reset_index(drop=True)[columns]
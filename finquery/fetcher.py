@@ -1,21 +1,77 @@
 # fetcher.py (simplified version without retry logic)
+import asyncio
+import logging
 import os
+import json
 import time
-import requests
-import yfinance as yf
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 
 from dotenv import load_dotenv
 
+from finquery.cache import SQLiteCache
+from finquery.database import DB_FILENAME
+from finquery.metrics import FETCH_SECONDS, FETCH_REQUESTS, MARKET_CACHE
+from finquery.ratelimit import RateLimitScheduler
+from finquery.symbols import default_symbol_master
+
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 
+# Competitor symbols fetched in parallel, and how long (seconds) the whole batch may take
+FETCH_WORKERS = int(os.environ.get("FETCH_WORKERS", 8))
+FETCH_BATCH_TIMEOUT = float(os.environ.get("FETCH_BATCH_TIMEOUT", 25))
+
+# Company overviews are fresh for MARKET_CACHE_TTL seconds; after that they are still served
+# for MARKET_CACHE_STALE more seconds while a background refresh runs (stale-while-revalidate)
+MARKET_CACHE_TTL = int(os.environ.get("MARKET_CACHE_TTL", 6 * 3600))
+MARKET_CACHE_STALE = int(os.environ.get("MARKET_CACHE_STALE", 24 * 3600))
+
+# Alpha Vantage free tier limits; calls wait up to ALPHA_VANTAGE_MAX_WAIT seconds for a slot
+ALPHA_VANTAGE_PER_MINUTE = int(os.environ.get("ALPHA_VANTAGE_PER_MINUTE", 5))
+ALPHA_VANTAGE_PER_DAY = int(os.environ.get("ALPHA_VANTAGE_PER_DAY", 25))
+ALPHA_VANTAGE_MAX_WAIT = float(os.environ.get("ALPHA_VANTAGE_MAX_WAIT", 20))
+
+# Pooled connections of the async HTTP client (async serving mode)
+ASYNC_HTTP_CONNECTIONS = int(os.environ.get("ASYNC_HTTP_CONNECTIONS", 100))
+# Threads for the blocking yfinance calls of the async methods (kept apart from asyncio's default pool)
+ASYNC_YFINANCE_THREADS = int(os.environ.get("ASYNC_YFINANCE_THREADS", 32))
+
+# the quota belongs to the API key, not to a DataFetcher instance or a process: the bucket state
+# is kept in the shared database, so web workers and ingest processes draw on one quota
+alpha_vantage_scheduler = RateLimitScheduler(ALPHA_VANTAGE_PER_MINUTE, ALPHA_VANTAGE_PER_DAY,
+                                             db_path=DB_FILENAME, name="alpha_vantage")
+
 class DataFetcher:
-    def __init__(self):
+    def __init__(self, cache=None, scheduler=None, symbols=None):
         self.api_key = os.getenv("ALPHA_VANTAGE_KEY")
         self.base_url = "https://www.alphavantage.co/query"
 
         if not self.api_key:
             raise ValueError("API key 'ALPHA_VANTAGE_KEY' not found in .env file.")
 
+        self.cache = cache or SQLiteCache(DB_FILENAME, table="market_cache", max_items=10000,
+                                          ttl=MARKET_CACHE_TTL + MARKET_CACHE_STALE)
+        self.scheduler = scheduler or alpha_vantage_scheduler
+        # symbols.SymbolMaster; None = the default master, loaded on first use; False = no validation
+        self._symbols = symbols
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self._http = None  # aiohttp session for the async methods, created on first use
+        self._yfinance_pool = None
+        self._inflight = {}  # cache key -> task fetching it, shared by concurrent async callers
+
+    @property
+    def symbols(self):
+        if self._symbols is None:
+            self._symbols = default_symbol_master() or False
+        return self._symbols or None
+
+    def resolve_symbol(self, ticker):
+        """Canonical symbols.Listing for a ticker/company name, or None (also None without a master)."""
+        return self.symbols.resolve(ticker) if self.symbols else None
+
     def _clean_number(self, v):
         try:
             if v is None:
@@ -31,15 +87,20 @@ class DataFetcher:
             return "N/A"
 
     def _fetch_indian_data(self, ticker):
-        """Fetch Indian company data using yfinance (.NS tickers)."""
+        """
+        Fetch Indian company data using yfinance (.NS tickers).
+        Returns {} when yfinance answered but does not know the symbol, None on errors.
+        """
         ticker_norm = ticker.strip().upper()
-        if not ticker_norm.endswith(".NS"):
+        if not ticker_norm.endswith((".NS", ".BO")):
             ticker_query = ticker_norm + ".NS"
         else:
             ticker_query = ticker_norm
 
-        print(f"--- [yfinance] Trying to fetch {ticker_query} ...")
+        logger.debug("[yfinance] Trying to fetch %s ...", ticker_query)
         try:
+            import yfinance as yf  # slow import (pandas), only paid on the first fetch
+
             t = yf.Ticker(ticker_query)
 
             # Try to get info safely
@@ -49,8 +110,9 @@ class DataFetcher:
                 info = t.get_info() if hasattr(t, "get_info") else {}
 
             if not info or (not info.get("longName") and not info.get("shortName")):
-                print(f"--- [yfinance] No usable info for {ticker_query}")
-                return None
+                logger.debug("[yfinance] No usable info for %s", ticker_query)
+                FETCH_REQUESTS.inc(source="yfinance", result="empty")
+                return {}
 
             formatted_data = {
                 "Name": info.get("longName") or info.get("shortName") or ticker_query,
@@ -59,35 +121,96 @@ class DataFetcher:
                 "EPS": info.get("trailingEps") or info.get("epsTrailingTwelveMonths") or "N/A",
                 "DividendYield": info.get("dividendYield", "N/A")
             }
-            print(f"--- [yfinance] Success for {ticker_query}")
+            logger.debug("[yfinance] Success for %s", ticker_query)
+            FETCH_REQUESTS.inc(source="yfinance", result="ok")
             return formatted_data
 
         except Exception as e:
-            print(f"--- [yfinance] Error: {e}")
+            logger.warning("[yfinance] Error: %s", e)
+            FETCH_REQUESTS.inc(source="yfinance", result="error")
             return None
 
-    def _fetch_alpha_vantage_data(self, ticker):
-        """Fetch global/US data using Alpha Vantage OVERVIEW."""
-        ticker_norm = ticker.strip().upper()
-
-        params = {
+    def _alpha_vantage_params(self, ticker_norm):
+        return {
             "function": "OVERVIEW",
             "symbol": ticker_norm,
             "apikey": self.api_key
         }
 
-        print(f"--- [AlphaVantage] Trying to fetch {ticker_norm} ...")
-        try:
-            resp = requests.get(self.base_url, params=params, timeout=10)
-            resp.raise_for_status()
-            data = resp.json()
-        except Exception as e:
-            print(f"--- [AlphaVantage] Failed to fetch data: {e}")
+    def _fetch_alpha_vantage_data(self, ticker):
+        """Fetch global/US data using Alpha Vantage OVERVIEW ({} for an unknown symbol, None on errors)."""
+        ticker_norm = ticker.strip().upper()
+        params = self._alpha_vantage_params(ticker_norm)
+
+        # A rate-limited answer is retried once after waiting for the next free slot
+        for attempt in range(2):
+            if not self.scheduler.acquire(ALPHA_VANTAGE_MAX_WAIT):
+                logger.warning("[AlphaVantage] No request slot free for %s (rate limit), skipping", ticker_norm)
+                FETCH_REQUESTS.inc(source="alpha_vantage", result="rate_limited")
+                return None
+
+            logger.debug("[AlphaVantage] Trying to fetch %s ...", ticker_norm)
+            try:
+                import requests
+
+                resp = requests.get(self.base_url, params=params, timeout=10)
+                resp.raise_for_status()
+                data = resp.json()
+            except Exception as e:
+                logger.warning("[AlphaVantage] Failed to fetch data: %s", e)
+                FETCH_REQUESTS.inc(source="alpha_vantage", result="error")
+                return None
+
+            if self._rate_limited(data, ticker_norm):
+                continue
+            break
+        else:
             return None
+        return self._format_alpha_vantage(data, ticker_norm)
+
+    async def _fetch_alpha_vantage_data_async(self, ticker):
+        """_fetch_alpha_vantage_data on the shared aiohttp session."""
+        ticker_norm = ticker.strip().upper()
+        params = self._alpha_vantage_params(ticker_norm)
+
+        for attempt in range(2):
+            if not await self.scheduler.acquire_async(ALPHA_VANTAGE_MAX_WAIT):
+                logger.warning("[AlphaVantage] No request slot free for %s (rate limit), skipping", ticker_norm)
+                FETCH_REQUESTS.inc(source="alpha_vantage", result="rate_limited")
+                return None
 
-        if not data or "Note" in data or "Information" in data:
-            print(f"--- [AlphaVantage] Empty or rate-limited response for {ticker_norm}")
+            logger.debug("[AlphaVantage] Trying to fetch %s (async) ...", ticker_norm)
+            try:
+                session = await self._http_session()
+                async with session.get(self.base_url, params=params) as resp:
+                    resp.raise_for_status()
+                    data = await resp.json(content_type=None)
+            except Exception as e:
+                logger.warning("[AlphaVantage] Failed to fetch data: %s", e)
+                FETCH_REQUESTS.inc(source="alpha_vantage", result="error")
+                return None
+
+            if self._rate_limited(data, ticker_norm):
+                continue
+            break
+        else:
             return None
+        return self._format_alpha_vantage(data, ticker_norm)
+
+    def _rate_limited(self, data, ticker_norm):
+        if data and ("Note" in data or "Information" in data):
+            logger.warning("[AlphaVantage] Rate-limited response for %s, backing off", ticker_norm)
+            FETCH_REQUESTS.inc(source="alpha_vantage", result="rate_limited")
+            self.scheduler.penalize()
+            return True
+        return False
+
+    @staticmethod
+    def _format_alpha_vantage(data, ticker_norm):
+        if not data:
+            logger.debug("[AlphaVantage] Empty response for %s", ticker_norm)
+            FETCH_REQUESTS.inc(source="alpha_vantage", result="empty")
+            return {}
 
         formatted = {
             "Name": data.get("Name", ticker_norm),
@@ -97,32 +220,239 @@ class DataFetcher:
             "DividendYield": data.get("DividendYield", "N/A")
         }
 
-        print(f"--- [AlphaVantage] Success for {ticker_norm}")
+        logger.debug("[AlphaVantage] Success for %s", ticker_norm)
+        FETCH_REQUESTS.inc(source="alpha_vantage", result="ok")
         return formatted
 
     def get_company_overview(self, ticker):
         """
-        Try yfinance (India/NSE) first.
-        If yfinance fails, fallback to Alpha Vantage.
+        Cached company overview. Fresh entries are returned directly; stale ones are
+        returned immediately while a background thread refreshes them.
+        """
+        done, data, listing, key = self._cached_overview(ticker)
+        if done:
+            return data
+        data = self._fetch_company_overview(ticker, listing)
+        self._remember(key, data)
+        return data or None
+
+    async def get_company_overview_async(self, ticker):
+        """
+        get_company_overview for the event loop: Alpha Vantage goes through the pooled aiohttp
+        session; yfinance (no async API) and the SQLite cache run on worker threads.
         """
-        print(f"--- [Fetcher] Checking Indian source for '{ticker}'")
-        data = self._fetch_indian_data(ticker)
+        done, data, listing, key = await asyncio.to_thread(self._cached_overview, ticker)
+        if done:
+            return data
+        # hundreds of page views asking for the same symbol make one upstream call
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(self._fetch_and_cache_async(ticker, key, listing))
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _fetch_and_cache_async(self, ticker, key, listing):
+        data = await self._fetch_company_overview_async(ticker, listing)
+        if data is not None:
+            await asyncio.to_thread(self._remember, key, data)
+        return data or None
+
+    def _remember(self, key, data):
+        """Cache an overview; a symbol every source said it does not know goes to the negative cache."""
+        if data:
+            self.cache.set(key, json.dumps(data))
+        elif data == {} and self.symbols:
+            logger.debug("[Fetcher] No source knows '%s', not asking again for a while", key)
+            self.symbols.mark_bad(key)
+
+    def _cached_overview(self, ticker):
+        """
+        Symbol check and cache lookup shared by the blocking and async paths.
+        Returns (done, data, listing, cache key); when done is False the overview must be fetched.
+        """
+        listing = None
+        if self.symbols:
+            listing = self.symbols.resolve(ticker)
+            if listing is None and self.symbols.complete:
+                # a full listing file that lacks the name settles it without a network call
+                logger.debug("[Fetcher] '%s' is not in the symbol master, skipping", ticker)
+                return True, None, None, None
+
+        # unresolved against a partial master: the old yfinance → Alpha Vantage guess, keyed by ticker
+        key = listing.key if listing else ticker.strip().upper()
+        if self.symbols and self.symbols.is_bad(key):
+            logger.debug("[Fetcher] '%s' is a known bad symbol, skipping", ticker)
+            return True, None, None, None
+        cached, age = self.cache.get_with_age(key)
+        if cached is not None:
+            if age > MARKET_CACHE_TTL:
+                MARKET_CACHE.inc(result="stale")
+                self._refresh_in_background(ticker, key, listing)
+            else:
+                MARKET_CACHE.inc(result="fresh")
+            logger.debug("[Fetcher] Using cached overview for '%s' (%ss old)", ticker, int(age))
+            return True, json.loads(cached), listing, key
+
+        MARKET_CACHE.inc(result="miss")
+        return False, None, listing, key
+
+    def _refresh_in_background(self, ticker, key, listing=None):
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                data = self._fetch_company_overview(ticker, listing)
+                if data:
+                    self.cache.set(key, json.dumps(data))
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name=f"refresh-{key}", daemon=True).start()
+
+    def _fetch_company_overview(self, ticker, listing=None):
+        """
+        A resolved listing goes straight to its source: yfinance for NSE/BSE, Alpha Vantage otherwise.
+        Without one: try yfinance (India/NSE) first, then fall back to Alpha Vantage.
+        {} means every source asked said it does not know the symbol.
+        """
+        if listing is not None:
+            if listing.is_indian:
+                return self._timed_source("yfinance", self._fetch_indian_data, listing.yahoo_symbol)
+            return self._timed_source("alpha_vantage", self._fetch_alpha_vantage_data, listing.symbol)
+
+        logger.debug("[Fetcher] Checking Indian source for '%s'", ticker)
+        data = self._timed_source("yfinance", self._fetch_indian_data, ticker)
+        if data:
+            return data
+        unknown = data == {}
+
+        logger.debug("[Fetcher] Indian failed → Trying Alpha Vantage for '%s'", ticker)
+        data = self._timed_source("alpha_vantage", self._fetch_alpha_vantage_data, ticker)
+        return data if data or unknown else None
+
+    async def _fetch_company_overview_async(self, ticker, listing=None):
+        """_fetch_company_overview with the same routing, for the event loop."""
+        if listing is not None:
+            if listing.is_indian:
+                return await self._in_yfinance_pool(listing.yahoo_symbol)
+            return await self._timed_source_async("alpha_vantage", self._fetch_alpha_vantage_data_async,
+                                                  listing.symbol)
+
+        logger.debug("[Fetcher] Checking Indian source for '%s'", ticker)
+        data = await self._in_yfinance_pool(ticker)
         if data:
             return data
+        unknown = data == {}
 
-        print(f"--- [Fetcher] Indian failed → Trying Alpha Vantage for '{ticker}'")
-        return self._fetch_alpha_vantage_data(ticker)
+        logger.debug("[Fetcher] Indian failed → Trying Alpha Vantage for '%s'", ticker)
+        data = await self._timed_source_async("alpha_vantage", self._fetch_alpha_vantage_data_async, ticker)
+        return data if data or unknown else None
 
-    def get_competitor_stats(self, competitors):
-        
+    async def _in_yfinance_pool(self, ticker):
+        """yfinance has no async API: run it on a pool of its own, so slow quotes don't starve other thread work."""
+        if self._yfinance_pool is None:
+            self._yfinance_pool = ThreadPoolExecutor(max_workers=ASYNC_YFINANCE_THREADS,
+                                                     thread_name_prefix="yfinance")
+        return await asyncio.get_running_loop().run_in_executor(
+            self._yfinance_pool, self._timed_source, "yfinance", self._fetch_indian_data, ticker)
+
+    async def _http_session(self):
+        """Shared aiohttp session (connection pool); must be used from a single event loop."""
+        if self._http is None or self._http.closed:
+            import aiohttp
+
+            self._http = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=ASYNC_HTTP_CONNECTIONS),
+                                               timeout=aiohttp.ClientTimeout(total=10))
+        return self._http
+
+    async def aclose(self):
+        """Close the async HTTP session and the yfinance threads (ASGI shutdown)."""
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+        if self._yfinance_pool is not None:
+            self._yfinance_pool.shutdown(wait=False, cancel_futures=True)
+            self._yfinance_pool = None
+
+    @staticmethod
+    async def _timed_source_async(source, fetch, ticker):
+        start = time.perf_counter()
+        try:
+            return await fetch(ticker)
+        finally:
+            FETCH_SECONDS.observe(time.perf_counter() - start, source=source)
+
+    @staticmethod
+    def _timed_source(source, fetch, ticker):
+        # outcomes are counted inside the fetch functions, which know why they returned None
+        start = time.perf_counter()
+        try:
+            return fetch(ticker)
+        finally:
+            FETCH_SECONDS.observe(time.perf_counter() - start, source=source)
+
+    def get_competitor_stats(self, competitors, max_workers=FETCH_WORKERS, timeout=FETCH_BATCH_TIMEOUT):
+        """
+        Fetch overviews for all symbols in parallel (bounded thread pool).
+        Results keep the input order; a symbol still running when the batch
+        timeout expires gets info=None instead of holding up the others.
+        """
+        symbols = list(competitors or [])
+        if not symbols:
+            return []
+
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(symbols))),
+                                      thread_name_prefix="fetch")
+        futures = []
+        for sym in symbols:
+            logger.debug("[Fetcher] Getting stats for %s ...", sym)
+            futures.append(executor.submit(self.get_company_overview, sym))
+
+        deadline = time.monotonic() + timeout
         results = []
-        for sym in (competitors or []):
-            try:
-                print(f"--- [Fetcher] Getting stats for {sym} ...")
-                info = self.get_company_overview(sym)
+        try:
+            for sym, fut in zip(symbols, futures):
+                try:
+                    info = fut.result(timeout=max(0.0, deadline - time.monotonic()))
+                except FutureTimeout:
+                    logger.warning("[Fetcher] Timed out fetching stats for %s", sym)
+                    info = None
+                except Exception as e:
+                    logger.warning("[Fetcher] ERROR fetching stats for %s: %s", sym, e)
+                    info = None
                 # Keep a simple shape: ticker + info dict (may contain PERatio, MarketCapitalization, etc.)
                 results.append({"symbol": sym, "info": info})
-            except Exception as e:
-                print(f"--- [Fetcher] ERROR fetching stats for {sym}: {e}")
-                results.append({"symbol": sym, "info": None})
+        finally:
+            # don't wait for stragglers; their results are discarded
+            executor.shutdown(wait=False, cancel_futures=True)
+        return results
+
+    async def get_competitor_stats_async(self, competitors, timeout=FETCH_BATCH_TIMEOUT):
+        """
+        get_competitor_stats on the event loop: all symbols are fetched concurrently as tasks
+        (no thread per symbol); the same input order, timeout and result shape.
+        """
+        symbols = list(competitors or [])
+        if not symbols:
+            return []
+
+        tasks = [asyncio.ensure_future(self.get_company_overview_async(sym)) for sym in symbols]
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+        results = []
+        for sym, task in zip(symbols, tasks):
+            info = None
+            if task in pending:
+                logger.warning("[Fetcher] Timed out fetching stats for %s", sym)
+            elif task.exception() is not None:
+                logger.warning("[Fetcher] ERROR fetching stats for %s: %s", sym, task.exception())
+            else:
+                info = task.result()
+            results.append({"symbol": sym, "info": info})
         return results
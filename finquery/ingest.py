@@ -0,0 +1,223 @@
+import fnmatch
+import hashlib
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from finquery.analyzer import ReportAnalyzer
+from finquery.database import DataBaseManager
+from finquery.extractor import PDFExtractor
+from finquery.fetcher import DataFetcher
+from finquery.metrics import setup_logging
+from finquery.pipeline import ReportPipeline
+from finquery.retriever import INDEX_VERSION
+from finquery.visualizer import DataVisualizer
+
+# Worker processes, each analyzing one PDF at a time
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", min(4, os.cpu_count() or 1)))
+# Gemini requests in flight at once, across all workers
+INGEST_AI_CONCURRENCY = int(os.environ.get("INGEST_AI_CONCURRENCY", 4))
+# Finished files are committed together once this many are waiting ...
+INGEST_BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", 20))
+# ... or when the oldest of them has waited this long (seconds)
+INGEST_FLUSH_SECONDS = float(os.environ.get("INGEST_FLUSH_SECONDS", 30))
+
+# Per-process state of a pool worker (set up once by _init_worker)
+_worker = {}
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    """sha256 of a file's bytes, read in chunks (same hash as the upload dedup)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def format_seconds(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+def _init_worker(ai_slots, chart_folder, quiet):
+    """Pool initializer: one analyzer/fetcher/pipeline per worker process."""
+    # Ctrl+C is handled by the parent, which lets the files in progress finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # spawned workers start with no logging set up; quiet ones only report errors
+    setup_logging("ERROR" if quiet else "DEBUG")
+    analyzer = ReportAnalyzer(call_limit=ai_slots)
+    # files are already spread over processes; a nested page-extraction pool would only compete
+    analyzer.extractor = PDFExtractor(max_workers=1)
+    db = DataBaseManager()
+    _worker["db"] = db
+    # DataFetcher's default limiter keeps the Alpha Vantage quota in the database, shared by all workers
+    _worker["pipeline"] = ReportPipeline(analyzer, DataFetcher(),
+                                         DataVisualizer(charts_in_use=db.chart_files_in_use),
+                                         db, chart_folder)
+
+
+def _ingest_file(path, size, mtime):
+    """
+    Worker entry point: analyze one PDF without writing the report (the parent commits in batches).
+    Returns the entry for DataBaseManager.save_ingest_batch.
+    """
+    started = time.perf_counter()
+    entry = {"path": path, "size": size, "mtime": mtime, "content_hash": None, "status": "failed",
+             "report_id": None, "error": None}
+    try:
+        entry["content_hash"] = file_hash(path)
+        existing_id = _worker["db"].find_report_by_hash(entry["content_hash"])
+        if existing_id:
+            entry.update(status="duplicate", report_id=existing_id)
+        else:
+            fields, pages, index = _worker["pipeline"].analyze_file(path)
+            entry.update(status="done", report=fields, pages=pages, index=index)
+    except Exception as e:
+        entry["error"] = f"{type(e).__name__}: {e}"
+    entry["seconds"] = round(time.perf_counter() - started, 2)
+    return entry
+
+
+class BulkIngestor:
+    """
+    Non-interactive backfill of a directory of PDFs: files are analyzed on a process pool
+    (Gemini calls limited by one semaphore shared by all workers), finished reports are
+    committed in batches together with their per-file status in ingest_files, and files
+    already recorded there are skipped, so an interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, db, chart_folder, workers=INGEST_WORKERS, ai_concurrency=INGEST_AI_CONCURRENCY,
+                 batch_size=INGEST_BATCH_SIZE, flush_seconds=INGEST_FLUSH_SECONDS, quiet=True):
+        self.db = db
+        self.chart_folder = chart_folder
+        self.workers = max(1, workers)
+        self.ai_concurrency = max(1, ai_concurrency)
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.quiet = quiet
+        self.counts = {"done": 0, "duplicate": 0, "failed": 0}
+        self.pages = 0
+
+    def scan(self, root, pattern="*.pdf", retry_failed=False):
+        """
+        Files under root still to ingest, as (path, size, mtime), plus how many were skipped.
+        A file counts as ingested while its size and mtime match what was recorded.
+        """
+        known = self.db.get_ingest_files()
+        todo, skipped = [], 0
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if not fnmatch.fnmatch(name.lower(), pattern.lower()):
+                    continue
+                path = os.path.abspath(os.path.join(dirpath, name))
+                stat = os.stat(path)
+                row = known.get(path)
+                unchanged = row is not None and row["size"] == stat.st_size and row["mtime"] == stat.st_mtime
+                if unchanged and (row["status"] != "failed" or not retry_failed):
+                    skipped += 1
+                    continue
+                todo.append((path, stat.st_size, stat.st_mtime))
+        return todo, skipped
+
+    def run(self, files):
+        """Ingest (path, size, mtime) files; returns the per-status counts of this run."""
+        if not files:
+            print("--- [Ingest] Nothing to do ---")
+            return self.counts
+
+        # spawned, not forked: workers must not inherit this process's SQLite connections or gRPC threads
+        ctx = multiprocessing.get_context("spawn")
+        ai_slots = ctx.BoundedSemaphore(self.ai_concurrency)
+        workers = min(self.workers, len(files))
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                                   initargs=(ai_slots, self.chart_folder, self.quiet))
+        print(f"--- [Ingest] {len(files)} files, {workers} workers, {self.ai_concurrency} AI calls at once ---")
+
+        started = time.perf_counter()
+        queue = iter(files)
+        running = {}
+        batch, batch_started = [], None
+        seen_hashes = set()
+        try:
+            while True:
+                # keep every worker busy, without queueing thousands of futures up front
+                while len(running) < workers * 2:
+                    item = next(queue, None)
+                    if item is None:
+                        break
+                    running[pool.submit(_ingest_file, *item)] = item[0]
+                if not running:
+                    break
+
+                done, _ = wait(running, timeout=self.flush_seconds, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    path = running.pop(fut)
+                    try:
+                        entry = fut.result()
+                    except Exception as e:  # worker process died
+                        entry = {"path": path, "status": "failed", "error": f"{type(e).__name__}: {e}"}
+                    if entry["status"] == "done" and entry["content_hash"] in seen_hashes:
+                        # two copies of one file were analyzed side by side: keep the first report
+                        entry.update(status="duplicate", report=None, pages=None, index=None)
+                    if entry["status"] == "done":
+                        seen_hashes.add(entry["content_hash"])
+                    batch.append(entry)
+                    batch_started = batch_started or time.monotonic()
+                    self._report(entry, len(files), started)
+
+                if batch and (len(batch) >= self.batch_size
+                              or time.monotonic() - batch_started >= self.flush_seconds):
+                    self._flush(batch)
+                    batch, batch_started = [], None
+        except BrokenProcessPool as e:
+            print(f"--- [Ingest] Worker pool failed ({e}), committing finished files ---")
+        except KeyboardInterrupt:
+            print("--- [Ingest] Interrupted, finishing the files in progress; run again to resume ---")
+            for fut in running:
+                fut.cancel()
+            pool.shutdown(wait=True)
+            for fut, path in running.items():
+                if not fut.cancelled() and fut.exception() is None:
+                    batch.append(fut.result())
+                    self._report(batch[-1], len(files), started)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            if batch:
+                self._flush(batch)
+
+        elapsed = time.perf_counter() - started
+        processed = sum(self.counts.values())
+        print(f"--- [Ingest] Finished {processed} files in {format_seconds(elapsed)}: "
+              f"{self.counts['done']} new, {self.counts['duplicate']} duplicates, "
+              f"{self.counts['failed']} failed ---")
+        return self.counts
+
+    def _report(self, entry, total, started):
+        """One line per finished file, with throughput and ETA for the rest."""
+        self.counts[entry["status"]] += 1
+        self.pages += len(entry.get("pages") or [])
+        processed = sum(self.counts.values())
+        elapsed = max(time.perf_counter() - started, 1e-6)
+        rate = processed / elapsed
+        eta = (total - processed) / rate if rate else 0
+        detail = entry.get("error") or f"{entry.get('seconds', 0):.1f}s"
+        print(f"--- [Ingest] [{processed}/{total}] {entry['status']:<9} {os.path.basename(entry['path'])} "
+              f"({detail}) | {rate * 60:.1f} files/min, {self.pages / elapsed:.1f} pages/s, "
+              f"ETA {format_seconds(eta)} ---", flush=True)
+
+    def _flush(self, batch):
+        ids = self.db.save_ingest_batch(batch, INDEX_VERSION)
+        if ids is None:
+            # nothing of this batch was recorded, so the next run picks these files up again
+            print(f"--- [Ingest] Could not commit {len(batch)} files; they will be retried next run ---")
+            return
+        print(f"--- [Ingest] Committed {len(batch)} files ---")
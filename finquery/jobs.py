@@ -0,0 +1,104 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Analyses running at the same time per web process (the rest wait in the queue)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 4))
+# How often (seconds) a queue marks its queued and running jobs as alive; must stay well
+# below JOB_STALE_SECONDS, after which other processes fail them as abandoned
+JOB_HEARTBEAT_SECONDS = float(os.environ.get("JOB_HEARTBEAT_SECONDS", 60))
+
+
+class Job:
+    """Handle given to a running job so it can report per-stage progress."""
+
+    def __init__(self, job_id, report_id, db):
+        self.id = job_id
+        self.report_id = report_id
+        self.db = db
+        self.stages = {}
+        self._lock = threading.Lock()
+        self._started = {}
+
+    def stage_started(self, name):
+        with self._lock:
+            self._started[name] = time.perf_counter()
+            self.stages[name] = {"status": "running"}
+            self.db.update_job(self.id, stages=self.stages)
+
+    def stage_finished(self, name, ok=True, error=None):
+        with self._lock:
+            started = self._started.pop(name, None)
+            entry = {"status": "done" if ok else "failed"}
+            if started is not None:
+                entry["seconds"] = round(time.perf_counter() - started, 2)
+            if error:
+                entry["error"] = str(error)
+            self.stages[name] = entry
+            self.db.update_job(self.id, stages=self.stages)
+
+
+class JobQueue:
+    """
+    In-process job queue: work runs on a thread pool, status lives in the jobs table
+    so any request (or process sharing the database) can poll it. A heartbeat thread keeps
+    the jobs of this process, waiting or running, from looking abandoned.
+    """
+
+    def __init__(self, db, max_workers=JOB_WORKERS, heartbeat_seconds=JOB_HEARTBEAT_SECONDS):
+        self.db = db
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.heartbeat_seconds = heartbeat_seconds
+        self._active = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def submit(self, func, report_id=None, cleanup=None):
+        """
+        Queue func(job) and return the new job id immediately.
+        The job is marked done when func returns, failed if it raises. cleanup() runs after it,
+        and also when the job is dropped without running (failed as abandoned while queued).
+        """
+        job_id = uuid.uuid4().hex
+        self.db.create_job(job_id, report_id)
+        job = Job(job_id, report_id, self.db)
+        with self._lock:
+            self._active.add(job_id)
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+                self._heartbeat.start()
+        self.executor.submit(self._run, job, func, cleanup)
+        return job_id
+
+    def _run(self, job, func, cleanup=None):
+        try:
+            if not self.db.start_job(job.id):
+                logger.warning("[Jobs] Job %s is no longer queued, not running it", job.id)
+                return
+            func(job)
+            self.db.update_job(job.id, status="done")
+            logger.debug("[Jobs] Job %s finished", job.id)
+        except Exception as e:
+            logger.warning("[Jobs] Job %s failed: %s", job.id, e)
+            self.db.update_job(job.id, status="failed", error=str(e))
+        finally:
+            with self._lock:
+                self._active.discard(job.id)
+            if cleanup:
+                cleanup()
+
+    def _beat(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            with self._lock:
+                job_ids = list(self._active)
+            self.db.touch_jobs(job_ids)
+
+    def shutdown(self, wait=True):
+        self._stop.set()
+        self.executor.shutdown(wait=wait)
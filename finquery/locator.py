@@ -0,0 +1,122 @@
+import logging
+import os
+import re
+
+from finquery.tables import count_periods
+
+logger = logging.getLogger(__name__)
+
+# Prompt budgets in characters (~4 characters per token) for the located pages
+LOCATOR_COMPANY_CHARS = int(os.environ.get("LOCATOR_COMPANY_CHARS", 10000))
+LOCATOR_FINANCIALS_CHARS = int(os.environ.get("LOCATOR_FINANCIALS_CHARS", 12000))
+# A page that does not fit whole is cut to the remaining budget if at least this much is left
+LOCATOR_MIN_SLICE = int(os.environ.get("LOCATOR_MIN_SLICE", 1500))
+
+# amounts and ratios of two or more digits (single digits are mostly list markers and dates)
+_NUMBER_RE = re.compile(r"\d[\d,]*\.?\d+")
+_WORD_RE = re.compile(r"[A-Za-z]{2,}")
+
+# (phrase, weight) scored per occurrence (at most 3 per phrase); phrases are matched on lower-cased text
+PROFILES = {
+    # statement pages: P&L, results tables, financial highlights
+    "financials": {
+        "keywords": [
+            ("revenue from operations", 4), ("statement of profit and loss", 5), ("profit and loss", 3),
+            ("income statement", 4), ("financial highlights", 3), ("financial summary", 3),
+            ("quarter ended", 3), ("year ended", 1.5), ("total income", 2), ("net sales", 2),
+            ("profit before tax", 2), ("segment revenue", 2), ("consolidated", 1.5), ("standalone", 1),
+            ("ebitda", 1), ("crore", 1), ("in millions", 1), ("revenue", 1),
+        ],
+        "numbers": 6.0,   # weight of the number density (share of tokens that are amounts)
+        "periods": 1.0,   # per fiscal period name, up to 12
+        "first_pages": 0.0,
+    },
+    # who the company is and who it competes with
+    "company": {
+        "keywords": [
+            ("competitor", 3), ("competition", 2), ("peers", 2), ("market share", 2),
+            ("company overview", 3), ("about us", 3), ("who we are", 3), ("our business", 2),
+            ("headquartered", 2), ("industry", 1), ("customers", 1), ("segment", 1),
+            ("corporate identity number", 2), ("nse", 1.5), ("bse", 1.5), ("scrip", 2), ("ticker", 2),
+            ("limited", 0.5), ("result update", 2),
+        ],
+        "numbers": -2.0,  # dense tables say little about the business itself
+        "periods": 0.0,
+        "first_pages": 8.0,  # cover and opening pages name the company
+    },
+}
+
+# Pages that look important to a keyword count but rarely are
+_BOILERPLATE = [
+    ("independent auditor", 6), ("key audit matter", 6), ("notice is hereby given", 8),
+    ("forward-looking statement", 4), ("disclaimer", 4), ("analyst certification", 6),
+    ("table of contents", 5), ("rating rationale", 4), ("terms and conditions", 4),
+]
+
+
+class PageLocator:
+    """
+    Picks the pages of a report that are worth sending to the model for a task and packs
+    them into a character budget, instead of a blind head+tail slice of the text.
+    Pages are scored locally (keyword hits, share of numbers, fiscal period names,
+    minus boilerplate), taken best-first until the budget is full, and returned in page
+    order with "[Page N]" markers.
+    """
+
+    def __init__(self, min_slice=LOCATOR_MIN_SLICE):
+        self.min_slice = min_slice
+
+    def score(self, text, profile, page_no=0):
+        """Relevance of one page for a profile (higher is better, <= 0 means not worth sending)."""
+        if len(text.strip()) < 200:
+            return 0.0
+        weights = PROFILES[profile]
+        lowered = text.lower()
+
+        score = sum(weight * min(lowered.count(phrase), 3) for phrase, weight in weights["keywords"])
+        if weights["numbers"]:
+            numbers = len(_NUMBER_RE.findall(text))
+            words = len(_WORD_RE.findall(text))
+            score += weights["numbers"] * numbers / max(1, numbers + words) * 10
+        if weights["periods"]:
+            score += weights["periods"] * min(count_periods(text), 12)
+        if page_no < 3:
+            score += weights["first_pages"] * (3 - page_no) / 3
+        score -= sum(weight for phrase, weight in _BOILERPLATE if phrase in lowered)
+        return score
+
+    def select(self, pages, profile, budget):
+        """
+        The best pages for profile within budget characters, as one text; None when no page
+        scores above zero (the caller keeps its old slice).
+        """
+        ranked = sorted(((self.score(text, profile, i), i) for i, text in enumerate(pages)),
+                        key=lambda x: (-x[0], x[1]))
+        chosen = {}
+        remaining = budget
+        for score, i in ranked:
+            if score <= 0 or remaining < self.min_slice:
+                break
+            marker = f"[Page {i + 1}]\n"
+            text = pages[i].strip()
+            if len(marker) + len(text) > remaining:
+                text = self._best_slice(text, profile, remaining - len(marker))
+            chosen[i] = marker + text
+            remaining -= len(marker) + len(text) + 2
+        if not chosen:
+            return None
+
+        text = "\n\n".join(chosen[i] for i in sorted(chosen))
+        logger.debug("[Locator] %s: pages %s, %s of %s chars", profile, [i + 1 for i in sorted(chosen)], len(text),
+                     sum(len(p) for p in pages))
+        return text
+
+    @staticmethod
+    def _best_slice(text, profile, size):
+        """size characters of a long page, starting a little before its first strong keyword."""
+        lowered = text.lower()
+        strong = [lowered.find(phrase) for phrase, weight in PROFILES[profile]["keywords"] if weight >= 3]
+        hits = [pos for pos in strong if pos >= 0]
+        start = max(0, min(hits) - 200) if hits else 0
+        start = min(start, max(0, len(text) - size))
+        return text[start:start + size]
@@ -0,0 +1,204 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# METRICS=0 turns every observe/inc into a no-op
+METRICS_ENABLED = os.environ.get("METRICS", "1") != "0"
+
+# Level of the finquery log messages (DEBUG shows every stage, cache hit and upstream call);
+# unset, each entry point picks its own default
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "")
+
+# seconds: from a cached DB read up to a slow model call
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# characters of prompt / response text
+SIZE_BUCKETS = (100, 500, 1000, 2500, 5000, 10000, 20000, 50000, 100000)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic counter, one series per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics), one series per label combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][slot] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            return series[2] if series else 0
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._series.items())
+        lines = []
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', le))} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {n}")
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ======================FinQuery metrics====================================================================================
+EXTRACT_SECONDS = REGISTRY.histogram("finquery_extract_seconds", "PDF text extraction time per document")
+EXTRACT_PAGES = REGISTRY.counter("finquery_extract_pages_total", "PDF pages extracted")
+EXTRACT_ERRORS = REGISTRY.counter("finquery_extract_errors_total", "PDF extractions that raised")
+
+LLM_SECONDS = REGISTRY.histogram("finquery_llm_seconds", "Model call time (cache misses only)", ["op"])
+LLM_PROMPT_CHARS = REGISTRY.histogram("finquery_llm_prompt_chars", "Prompt size in characters", ["op"], SIZE_BUCKETS)
+LLM_RESPONSE_CHARS = REGISTRY.histogram("finquery_llm_response_chars", "Response size in characters", ["op"],
+                                        SIZE_BUCKETS)
+LLM_REQUESTS = REGISTRY.counter("finquery_llm_requests_total", "Model requests by outcome (hit, miss, error)",
+                                ["op", "result"])
+LLM_CACHE_LOOKUPS = REGISTRY.counter("finquery_llm_cache_lookups_total",
+                                     "Response cache lookups by the tier that answered (memory, disk) or miss",
+                                     ["tier"])
+
+FETCH_SECONDS = REGISTRY.histogram("finquery_fetch_seconds", "Market data fetch time per source", ["source"])
+FETCH_REQUESTS = REGISTRY.counter("finquery_fetch_requests_total",
+                                  "Market data fetches by outcome (ok, empty, error, rate_limited)",
+                                  ["source", "result"])
+MARKET_CACHE = REGISTRY.counter("finquery_market_cache_total", "Company overview lookups (fresh, stale, miss)",
+                                ["result"])
+
+DB_SECONDS = REGISTRY.histogram("finquery_db_seconds", "Database transaction time", ["op"])
+DB_ERRORS = REGISTRY.counter("finquery_db_errors_total", "Database transactions that raised", ["op"])
+
+STAGE_SECONDS = REGISTRY.histogram("finquery_pipeline_stage_seconds", "Analysis pipeline stage time", ["stage"])
+STAGE_RESULTS = REGISTRY.counter("finquery_pipeline_stages_total", "Analysis pipeline stages by outcome (ok, failed)",
+                                 ["stage", "result"])
+
+CHART_DATA_SOURCE = REGISTRY.counter("finquery_chart_data_total", "Revenue chart data by source (local, llm)",
+                                     ["source"])
+
+HTTP_SECONDS = REGISTRY.histogram("finquery_http_request_seconds", "HTTP request handling time",
+                                  ["endpoint", "method", "status"])
+
+
+@contextmanager
+def timed(histogram, errors=None, **labels):
+    """Observe the duration of the block in histogram; count it in errors (if given) when it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        if errors is not None:
+            errors.inc(**labels)
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+
+def record_stage(stage, seconds, ok=True):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    STAGE_RESULTS.inc(stage=stage, result="ok" if ok else "failed")
+
+
+def setup_logging(default="WARNING"):
+    """Send log messages to stderr at LOG_LEVEL (default when unset), unless logging is configured already."""
+    logging.basicConfig(level=(LOG_LEVEL or default).upper(),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
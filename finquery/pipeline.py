@@ -0,0 +1,453 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from finquery.extractor import source_label
+from finquery.facts import revenue_facts
+from finquery.locator import PageLocator, LOCATOR_COMPANY_CHARS, LOCATOR_FINANCIALS_CHARS
+from finquery.metrics import record_stage, CHART_DATA_SOURCE
+from finquery.retriever import ReportIndex, INDEX_VERSION
+from finquery.tables import RevenueTableExtractor
+
+logger = logging.getLogger(__name__)
+
+# How many characters we pass to the AI for the upload-stage prompts
+AI_CHAR_LIMIT = 20000
+
+# "map_reduce": summarize the whole document in chunks (see ReportAnalyzer.summarize_document);
+# "truncate": summarize only the first AI_CHAR_LIMIT and last 3000 characters
+SUMMARY_MODE = os.environ.get("SUMMARY_MODE", "map_reduce")
+
+# Read revenue tables locally first; the LLM is only asked when the local result is not confident
+LOCAL_TABLES = os.environ.get("LOCAL_TABLES", "1") != "0"
+
+# Send the competitor / table prompts the best-scoring pages (see locator.py) instead of the head+tail slice
+LOCATE_PAGES = os.environ.get("LOCATE_PAGES", "1") != "0"
+
+# Per-stage time limits (seconds) for the upload pipeline; a stage that runs over uses its fallback
+STAGE_TIMEOUTS = {
+    "summary": 180,  # map-reduce: a few waves of chunk calls plus the final call
+    "company_info": 60,
+    "competitor_rows": 60,
+    "chart_data": 60,
+    "chart": 30,
+}
+
+SUMMARY_FALLBACK = "Summary unavailable (AI error)."
+
+# Summaries starting with these markers are a failed summary stage (fallback or analyzer error text)
+FAILED_SUMMARY_MARKERS = ("Summary unavailable", "Error:")
+
+# Stages that have to run again when the stage they depend on is re-run; chart_data is not
+# stored (only its facts), so a chart can only be redrawn from freshly extracted data
+STAGE_DEPENDENTS = {"company_info": ("competitor_rows",), "chart_data": ("chart",), "chart": ("chart_data",)}
+
+
+class Stage:
+    def __init__(self, name, func, deps=(), timeout=None, fallback=None):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.fallback = fallback
+
+    def fallback_value(self):
+        # callables (e.g. dict, list) give a fresh object every time
+        return self.fallback() if callable(self.fallback) else self.fallback
+
+
+class StageGraph:
+    """
+    A tiny dependency graph of pipeline stages.
+    Every stage starts as soon as the stages it depends on have finished, so independent
+    stages run concurrently on a thread pool. A stage receives its dependencies' results
+    as keyword arguments. If it raises or runs past its timeout, its fallback value is
+    used instead and the dependent stages still run.
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.stages = {}
+        self.timings = {}
+        self.failed = {}
+
+    def add(self, name, func, deps=(), timeout=None, fallback=None):
+        self.stages[name] = Stage(name, func, deps, timeout, fallback)
+        return self
+
+    def run(self, on_stage_start=None, on_stage_done=None, given=None):
+        """
+        Run all stages and return {stage name: result}.
+        on_stage_start(name) / on_stage_done(name, result, error) are called from the
+        coordinating thread as stages start and finish (error is None on success).
+        given: {name: result} for dependencies that are known already and not in the graph.
+        """
+        results = dict(given or {})
+        pending = dict(self.stages)
+        running = {}
+        t_start = time.perf_counter()
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage")
+        try:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if all(dep in results for dep in stage.deps):
+                        kwargs = {dep: results[dep] for dep in stage.deps}
+                        started = time.perf_counter()
+                        deadline = started + stage.timeout if stage.timeout else None
+                        running[executor.submit(stage.func, **kwargs)] = (stage, started, deadline)
+                        del pending[name]
+                        if on_stage_start:
+                            on_stage_start(name)
+
+                if not running:
+                    # unknown dependency: nothing can make progress
+                    for name, stage in pending.items():
+                        self._fail(stage, results, "unmet dependencies", 0.0, on_stage_done)
+                    break
+
+                deadlines = [d for _, _, d in running.values() if d is not None]
+                wait_for = max(0.0, min(deadlines) - time.perf_counter()) if deadlines else None
+                done, _ = wait(running, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+                now = time.perf_counter()
+                for fut in done:
+                    stage, started, _ = running.pop(fut)
+                    try:
+                        results[stage.name] = fut.result()
+                        self.timings[stage.name] = now - started
+                        record_stage(stage.name, now - started)
+                    except Exception as e:
+                        self._fail(stage, results, e, now - started, on_stage_done)
+                        continue
+                    if on_stage_done:
+                        on_stage_done(stage.name, results[stage.name], None)
+
+                for fut, (stage, started, deadline) in list(running.items()):
+                    if deadline is not None and now >= deadline:
+                        # the worker thread cannot be killed; its late result is simply ignored
+                        fut.cancel()
+                        running.pop(fut)
+                        self._fail(stage, results, f"timed out after {stage.timeout}s", now - started,
+                                   on_stage_done)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        logger.debug("[Pipeline] %s stages in %.2fs %s", len(self.stages), time.perf_counter() - t_start,
+                     ", ".join(f"{n}={t:.2f}s" for n, t in self.timings.items()))
+        return {name: result for name, result in results.items() if name in self.stages}
+
+    def _fail(self, stage, results, error, elapsed, on_stage_done=None):
+        logger.warning("[Pipeline] Stage '%s' failed (%s), using fallback", stage.name, error)
+        self.failed[stage.name] = str(error)
+        self.timings[stage.name] = elapsed
+        record_stage(stage.name, elapsed, ok=False)
+        results[stage.name] = stage.fallback_value()
+        if on_stage_done:
+            on_stage_done(stage.name, results[stage.name], error)
+
+
+class _NoProgress:
+    def stage_started(self, name):
+        pass
+
+    def stage_finished(self, name, ok=True, error=None):
+        pass
+
+
+class ReportPipeline:
+    """
+    The full analysis of one uploaded PDF: text extraction, the concurrent AI/market-data
+    stages, chart rendering and Q&A indexing. Each finished stage is written to the report
+    row straight away, so a report page can fill in while the rest is still running.
+    """
+
+    def __init__(self, analyzer, fetcher, visualizer, db, chart_folder):
+        self.analyzer = analyzer
+        self.fetcher = fetcher
+        self.visualizer = visualizer
+        self.db = db
+        self.chart_folder = chart_folder
+        self.tables = RevenueTableExtractor()
+        self.locator = PageLocator()
+
+    def run(self, report_id, pdf_path, progress=None, on_extracted=None):
+        """
+        Analyze pdf_path (a path, or the PDF's bytes) into the (already created) report row report_id.
+        progress: object with stage_started(name) / stage_finished(name, ok, error), e.g. a jobs.Job.
+        on_extracted() is called once the text is stored (e.g. to register the upload for deduplication).
+        """
+        progress = progress or _NoProgress()
+
+        # 1) Extract text
+        progress.stage_started("extract")
+        started = time.perf_counter()
+        pages = self.analyzer.extract_pages_from_pdf(pdf_path)
+        if pages is None:
+            record_stage("extract", time.perf_counter() - started, ok=False)
+            progress.stage_finished("extract", ok=False, error="could not read PDF")
+            raise RuntimeError(f"Could not extract text from {source_label(pdf_path)}")
+
+        # the whole document is kept, page by page (compressed), for Q&A
+        self.db.save_report_pages(report_id, pages)
+        pdf_text = "".join(pages)
+        record_stage("extract", time.perf_counter() - started)
+        progress.stage_finished("extract")
+        if on_extracted:
+            on_extracted()
+
+        self.run_stages(pdf_path, pages, on_stage_start=progress.stage_started,
+                        on_stage_done=self._stage_recorder(report_id, progress))
+
+        # 6) Q&A index over the stored text
+        self._index_stage(report_id, pdf_text, progress)
+
+    def refresh(self, report_id, stages, pdf_path=None, progress=None):
+        """
+        Re-run only the given stages of a stored report (plus the stages that depend on them),
+        on its stored pages; pdf_path (the same PDF) lets the local table reader see its layout.
+        """
+        progress = progress or _NoProgress()
+        rec = self.db.get_report(report_id)
+        pages = [text for _, text in self.db.iter_report_pages(report_id)]
+        if not pages and rec and rec["has_text"]:
+            pages = [self.db.get_report_text(report_id) or ""]
+        if not rec or not pages:
+            raise RuntimeError(f"Report {report_id} has no stored text to refresh from")
+
+        todo = set(stages)
+        for name in list(todo):
+            todo.update(STAGE_DEPENDENTS.get(name, ()))
+        given = {}
+        if "competitor_rows" in todo and "company_info" not in todo:
+            given["company_info"] = {"main_ticker": rec["ticker"], "competitors": rec["competitors"]}
+        logger.info("[Pipeline] Refreshing report %s: %s", report_id, ', '.join(sorted(todo)))
+
+        if todo - {"index"}:
+            self.run_stages(pdf_path, pages, on_stage_start=progress.stage_started,
+                            on_stage_done=self._stage_recorder(report_id, progress),
+                            only=todo, given=given)
+        if "index" in todo:
+            self._index_stage(report_id, "".join(pages), progress)
+
+    def _stage_recorder(self, report_id, progress):
+        """on_stage_done for the graph: store the stage's report fields and whether it needs a re-run."""
+        def on_stage_done(name, result, error):
+            error = error or self.stage_problem(name, result)
+            fields = self._report_fields(name, result)
+            if fields and fields.get("facts"):
+                self.db.save_facts(report_id, fields["facts"])
+            if fields:
+                self.db.update_report(report_id, fields)
+            self.db.record_stage_result(report_id, name, error)
+            progress.stage_finished(name, ok=error is None, error=error)
+        return on_stage_done
+
+    def _index_stage(self, report_id, text, progress):
+        progress.stage_started("index")
+        started = time.perf_counter()
+        ok = self.build_report_index(report_id, text) is not None
+        record_stage("index", time.perf_counter() - started, ok=ok)
+        self.db.record_stage_result(report_id, "index", None if ok else "could not build the Q&A index")
+        progress.stage_finished("index", ok=ok)
+
+    @staticmethod
+    def stage_problem(name, result):
+        """
+        Why a stage's result is a failure even though the stage returned (the analyzer falls back
+        instead of raising), or None if it is usable.
+        """
+        if name == "summary" and (not result or str(result).startswith(FAILED_SUMMARY_MARKERS)):
+            return "no summary"
+        if name == "company_info" and (result or {}).get("main_ticker", "UNKNOWN") in ("", "UNKNOWN"):
+            return "company not identified"
+        if name == "competitor_rows" and any(not row.get("info") for row in result or []):
+            return "market data missing for some competitors"
+        if name == "chart_data" and not result:
+            return "no revenue figures"
+        return None
+
+    def run_stages(self, pdf_path, pages, on_stage_start=None, on_stage_done=None, only=None, given=None):
+        """
+        Stages 2-5 (summary, competitors, market data, chart) on already extracted pages.
+        only: run just these stages, their dependencies coming from given ({name: result}).
+        Returns the report fields they produced.
+        """
+        pdf_text = "".join(pages)
+        ai_text = pdf_text[:AI_CHAR_LIMIT] + "\n\n" + pdf_text[-3000:]
+
+        def company_info():
+            text = self.prompt_text(pages, "company", LOCATOR_COMPANY_CHARS) or ai_text
+            return self.canonical_company_info(self.analyzer.get_competitors(text) or {})
+
+        # Summary, competitor detection and table extraction only need their slice of the text,
+        # so they run concurrently; the market-data fetch waits for the competitor list only.
+        graph = StageGraph(max_workers=4)
+        graph.add("summary", lambda: self.summarize(pages),
+                  timeout=STAGE_TIMEOUTS["summary"], fallback=SUMMARY_FALLBACK)
+        graph.add("company_info", company_info,
+                  timeout=STAGE_TIMEOUTS["company_info"], fallback=dict)
+        graph.add("competitor_rows", self.fetch_competitor_rows, deps=["company_info"],
+                  timeout=STAGE_TIMEOUTS["competitor_rows"], fallback=list)
+        graph.add("chart_data", lambda: self.extract_chart_data(pdf_path, pages, ai_text),
+                  timeout=STAGE_TIMEOUTS["chart_data"], fallback=dict)
+        graph.add("chart", self.render_chart, deps=["chart_data"],
+                  timeout=STAGE_TIMEOUTS["chart"], fallback="")
+        if only is not None:
+            graph.stages = {name: stage for name, stage in graph.stages.items() if name in only}
+
+        results = graph.run(on_stage_start=on_stage_start, on_stage_done=on_stage_done, given=given)
+        fields = {}
+        for name, result in results.items():
+            fields.update(self._report_fields(name, result) or {})
+        return fields
+
+    def analyze_file(self, pdf_path):
+        """
+        The whole analysis of one PDF without writing to the database (bulk ingestion commits
+        many at once): returns (report fields, pages, serialized Q&A index or None).
+        """
+        started = time.perf_counter()
+        pages = self.analyzer.extract_pages_from_pdf(pdf_path)
+        if pages is None:
+            record_stage("extract", time.perf_counter() - started, ok=False)
+            raise RuntimeError(f"Could not extract text from {pdf_path}")
+        record_stage("extract", time.perf_counter() - started)
+
+        failed = {}
+
+        def on_stage_done(name, result, error):
+            error = error or self.stage_problem(name, result)
+            if error:
+                failed[name] = str(error)
+
+        fields = self.run_stages(pdf_path, pages, on_stage_done=on_stage_done)
+
+        started = time.perf_counter()
+        try:
+            payload = ReportIndex.build("".join(pages)).to_bytes()
+        except Exception as e:
+            logger.warning("[Index] Could not index %s: %s", pdf_path, e)
+            payload = None
+            failed["index"] = str(e)
+        record_stage("index", time.perf_counter() - started, ok=payload is not None)
+        fields["failed_stages"] = failed
+        return fields, pages, payload
+
+    def prompt_text(self, pages, profile, budget):
+        """The located pages for a prompt, or None (the caller uses the head+tail slice)."""
+        if not LOCATE_PAGES:
+            return None
+        try:
+            return self.locator.select(pages, profile, budget)
+        except Exception as e:
+            logger.warning("[Locator] Page scoring failed: %s", e)
+            return None
+
+    def summarize(self, pages):
+        """Report summary in the configured SUMMARY_MODE."""
+        if SUMMARY_MODE == "map_reduce":
+            return self.analyzer.summarize_document(pages)
+        pdf_text = "".join(pages)
+        return self.analyzer.summarize_text(pdf_text[:AI_CHAR_LIMIT] + "\n\n" + pdf_text[-3000:])
+
+    @staticmethod
+    def _report_fields(stage_name, result):
+        """Report columns filled in by a finished stage."""
+        if stage_name == "summary":
+            return {"summary": result}
+        if stage_name == "company_info":
+            return {"ticker": result.get("main_ticker", "UNKNOWN") or "UNKNOWN",
+                    "competitors": result.get("competitors", []) or []}
+        if stage_name == "competitor_rows":
+            return {"competitor_rows": result}
+        if stage_name == "chart_data":
+            # kept as normalized facts for cross-report analytics (see finquery/facts.py)
+            return {"facts": revenue_facts(result)}
+        if stage_name == "chart":
+            # chart path referenced relative to /static/
+            return {"chart_filename": f"charts/{result}" if result else ""}
+        return None
+
+    def canonical_company_info(self, company_info):
+        """
+        Replace the model's ticker/competitor guesses with canonical symbols where the symbol
+        master knows them (names like "Infosys" become "INFY"); unknown entries are kept as written.
+        """
+        resolve = getattr(self.fetcher, "resolve_symbol", None)
+        if not resolve or not company_info:
+            return company_info
+
+        def canonical(value):
+            listing = resolve(value) if isinstance(value, str) else None
+            return listing.symbol if listing else value
+
+        info = dict(company_info)
+        if info.get("main_ticker"):
+            info["main_ticker"] = canonical(info["main_ticker"])
+        competitors = []
+        for c in info.get("competitors") or []:
+            c = canonical(c)
+            if c not in competitors and c != info.get("main_ticker"):
+                competitors.append(c)
+        info["competitors"] = competitors
+        return info
+
+    def fetch_competitor_rows(self, company_info):
+        """Market data for the detected competitors (runs after company_info)."""
+        competitors = company_info.get("competitors", []) or []
+        if not competitors:
+            return []
+        try:
+            # use existing fetcher method (should handle per-ticker errors)
+            return self.fetcher.get_competitor_stats(competitors)
+        except Exception as e:
+            logger.warning("get_competitor_stats failed: %s", e)
+            # fallback: try single-company overviews
+            competitor_rows = []
+            for t in competitors:
+                try:
+                    info = self.fetcher.get_company_overview(t)
+                    competitor_rows.append({"ticker": t, "info": info})
+                except Exception:
+                    competitor_rows.append({"ticker": t, "info": None})
+            return competitor_rows
+
+    def extract_chart_data(self, pdf_path, pages, ai_text):
+        """Revenue figures for the chart: local table reader first, the LLM when it is unsure."""
+        if LOCAL_TABLES:
+            try:
+                data, confidence = self.tables.extract(pdf_path, pages)
+            except Exception as e:
+                logger.warning("[Tables] Local extraction failed: %s", e)
+                data, confidence = {}, 0.0
+            if data and confidence >= self.tables.min_confidence:
+                logger.debug("[Tables] Revenue table read locally (confidence %s): %s", confidence, list(data))
+                CHART_DATA_SOURCE.inc(source="local")
+                return data
+            logger.debug("[Tables] Local confidence %s too low, asking the AI", confidence)
+        CHART_DATA_SOURCE.inc(source="llm")
+        text = self.prompt_text(pages, "financials", LOCATOR_FINANCIALS_CHARS) or ai_text
+        return self.analyzer.extract_financial_table(text) or {}
+
+    def render_chart(self, chart_data):
+        """Revenue chart file name inside chart_folder ('' if no chart); identical data reuses the cached file."""
+        if not chart_data:
+            return ""
+        keys = list(chart_data.keys())
+        if keys and str(keys[0]).upper().startswith("Q"):
+            chart_title = "Quarterly Revenue (Cr)"
+        else:
+            chart_title = "Annual Revenue (Cr)"
+        return self.visualizer.get_chart(chart_data, chart_title, self.chart_folder)
+
+    def build_report_index(self, report_id, text):
+        """Chunk the full report text and persist its Q&A index (chunk spans are offsets into that text)."""
+        try:
+            index = ReportIndex.build(text)
+            self.db.save_report_index(report_id, index.to_bytes(), INDEX_VERSION)
+            return index
+        except Exception as e:
+            logger.warning("[Index] Could not index report %s: %s", report_id, e)
+            return None
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Classic token bucket: `capacity` requests, refilled evenly over `period` seconds."""
+
+    def __init__(self, capacity, period, now=None):
+        self.capacity = float(capacity)
+        self.period = period
+        self.rate = self.capacity / float(period)
+        self.tokens = self.capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until one token is available (0 if available now)."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def drain(self, now):
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+
+
+class RateLimitScheduler:
+    """
+    Queues API calls so they respect several limits at once (e.g. 5/minute and 25/day).
+    acquire() blocks until every bucket has a token, or gives up after max_wait seconds.
+
+    With db_path the bucket state lives in that SQLite file (table rate_limits, rows keyed
+    by name), so every process using the same API key draws on one quota and a restart does
+    not refill the daily bucket. Without it the buckets are per process.
+    """
+
+    def __init__(self, per_minute, per_day, db_path=None, name="default"):
+        self.db_path = db_path
+        self.name = name
+        # wall clock when shared: monotonic clocks are not comparable between processes
+        self._clock = time.time if db_path else time.monotonic
+        now = self._clock()
+        self.buckets = [TokenBucket(per_minute, 60, now), TokenBucket(per_day, 24 * 3600, now)]
+        self._lock = threading.Lock()
+        self._connections = None
+
+    def _shared(self):
+        """Connection layer for the shared state (table created on first use), or None."""
+        if self.db_path and self._connections is None:
+            from finquery.database import get_connections
+
+            connections = get_connections(self.db_path)
+            conn = connections.get()
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rate_limits (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+            """)
+            conn.commit()
+            self._connections = connections
+        return self._connections
+
+    def _update(self, change):
+        """
+        Run change(now) on the buckets under the lock; with shared state, inside one write
+        transaction that loads the buckets first and stores them after. Returns change's result.
+        """
+        with self._lock:
+            try:
+                connections = self._shared()
+            except Exception as e:
+                logger.warning("[RateLimit] Shared state unavailable, limiting this process only: %s", e)
+                connections = None
+                self.db_path = None
+            if connections is None:
+                return change(self._clock())
+
+            conn = connections.get()
+            keys = [f"{self.name}:{bucket.period}" for bucket in self.buckets]
+            try:
+                conn.execute("BEGIN IMMEDIATE")  # other processes wait here, so no token is taken twice
+                now = self._clock()
+                rows = dict((row[0], row[1:]) for row in conn.execute(
+                    f"SELECT key, tokens, updated FROM rate_limits WHERE key IN ({', '.join('?' * len(keys))})",
+                    keys))
+                for key, bucket in zip(keys, self.buckets):
+                    tokens, updated = rows.get(key, (bucket.capacity, now))
+                    bucket.tokens, bucket.updated = min(tokens, bucket.capacity), min(updated, now)
+                result = change(now)
+                conn.executemany("INSERT OR REPLACE INTO rate_limits (key, tokens, updated) VALUES (?, ?, ?)",
+                                 [(key, bucket.tokens, bucket.updated) for key, bucket in zip(keys, self.buckets)])
+                conn.commit()
+                return result
+            except Exception as e:
+                conn.rollback()
+                logger.warning("[RateLimit] Shared state update failed, using this process's view: %s", e)
+                return change(self._clock())
+
+    def _try_take(self):
+        """Take a token from every bucket if all have one; else return the seconds to wait."""
+        def take(now):
+            delay = max(bucket.wait_time(now) for bucket in self.buckets)
+            if delay <= 0:
+                for bucket in self.buckets:
+                    bucket.take()
+                return 0.0
+            return delay
+
+        return self._update(take)
+
+    def acquire(self, max_wait=30.0):
+        give_up = time.monotonic() + max_wait
+        while True:
+            delay = self._try_take()
+            if delay <= 0:
+                return True
+            if time.monotonic() + delay > give_up:
+                return False
+            time.sleep(min(delay, 1.0))
+
+    async def acquire_async(self, max_wait=30.0):
+        """acquire() for coroutines: waits with asyncio.sleep instead of blocking a thread."""
+        give_up = time.monotonic() + max_wait
+        while True:
+            # the shared state is a SQLite write that may wait for another process: off the loop
+            delay = await asyncio.to_thread(self._try_take) if self.db_path else self._try_take()
+            if delay <= 0:
+                return True
+            if time.monotonic() + delay > give_up:
+                return False
+            await asyncio.sleep(min(delay, 1.0))
+
+    def penalize(self):
+        """The server said we are over the limit: empty the short-term bucket so callers back off."""
+        self._update(self.buckets[0].drain)
@@ -0,0 +1,197 @@
+import io
+import re
+
+import numpy as np
+
+# Chunking used when a report is indexed (characters)
+CHUNK_SIZE = 1500
+CHUNK_OVERLAP = 200
+
+# Bump when the on-disk index format changes so old rows get rebuilt
+INDEX_VERSION = 1
+
+_DIGIT_COMMA_RE = re.compile(r"(?<=\d),(?=\d)")
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for", "from", "has",
+    "have", "how", "in", "is", "it", "its", "of", "on", "or", "that", "the", "this", "to",
+    "was", "were", "what", "when", "which", "who", "why", "will", "with",
+}
+
+
+def tokenize(text):
+    """Lower-case word/number tokens; Indian/US digit grouping is removed so 1,54,119 == 154119."""
+    text = _DIGIT_COMMA_RE.sub("", text.lower())
+    tokens = []
+    for tok in _TOKEN_RE.findall(text):
+        if tok in _STOPWORDS:
+            continue
+        # very light plural folding: "revenues" -> "revenue"
+        if len(tok) > 4 and tok.endswith("s") and not tok.endswith("ss") and not tok[0].isdigit():
+            tok = tok[:-1]
+        tokens.append(tok)
+    return tokens
+
+
+def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """
+    Split text into overlapping (start, end) character spans.
+    Chunk ends are moved back to the last line break / space so words are not cut.
+    """
+    spans = []
+    n = len(text)
+    start = 0
+    while start < n:
+        end = min(start + chunk_size, n)
+        if end < n:
+            cut = max(text.rfind("\n", start + chunk_size // 2, end), text.rfind(" ", start + chunk_size // 2, end))
+            if cut > start:
+                end = cut
+        spans.append((start, end))
+        if end >= n:
+            break
+        start = max(end - overlap, start + 1)
+    return spans
+
+
+def merge_spans(spans):
+    """Sorted (start, end) spans with overlapping or touching spans merged into one."""
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def join_spans(parts):
+    """Join non-adjacent excerpts with a visible gap marker."""
+    return "\n\n[...]\n\n".join(parts)
+
+
+class ReportIndex:
+    """
+    BM25 index over the chunks of one report.
+    Postings are stored term-major (CSC style) in flat NumPy arrays so a query only
+    touches the postings of its own terms and scoring is a couple of vector ops.
+    """
+
+    k1 = 1.5
+    b = 0.75
+
+    def __init__(self, vocab, spans, term_ptr, post_doc, post_tf, doc_lens):
+        self.vocab = vocab
+        self.term_ids = {term: i for i, term in enumerate(vocab)}
+        self.spans = spans
+        self.term_ptr = term_ptr
+        self.post_doc = post_doc
+        self.post_tf = post_tf
+        self.doc_lens = doc_lens
+
+        n_docs = len(spans)
+        df = np.diff(term_ptr).astype(np.float64)
+        self.idf = np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+        avgdl = float(doc_lens.mean()) if n_docs else 0.0
+        # per-chunk length normalisation, precomputed once
+        self._norm = self.k1 * (1.0 - self.b + self.b * doc_lens / avgdl) if avgdl else np.full(n_docs, self.k1)
+
+    @classmethod
+    def build(cls, text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+        spans = np.array(chunk_text(text, chunk_size, overlap), dtype=np.int64).reshape(-1, 2)
+
+        term_ids = {}
+        doc_of_token = []
+        term_of_token = []
+        for doc_no, (start, end) in enumerate(spans):
+            for tok in tokenize(text[start:end]):
+                term_of_token.append(term_ids.setdefault(tok, len(term_ids)))
+                doc_of_token.append(doc_no)
+
+        n_docs = len(spans)
+        n_terms = len(term_ids)
+        docs = np.asarray(doc_of_token, dtype=np.int64)
+        terms = np.asarray(term_of_token, dtype=np.int64)
+
+        # unique (term, doc) pairs -> term frequency, already sorted term-major
+        keys, tf = np.unique(terms * max(n_docs, 1) + docs, return_counts=True)
+        post_term = keys // max(n_docs, 1)
+        post_doc = (keys % max(n_docs, 1)).astype(np.int32)
+        term_ptr = np.concatenate(([0], np.cumsum(np.bincount(post_term, minlength=n_terms)))).astype(np.int64)
+        doc_lens = np.bincount(docs, minlength=n_docs).astype(np.float64)
+
+        vocab = [None] * n_terms
+        for term, i in term_ids.items():
+            vocab[i] = term
+        return cls(vocab, spans, term_ptr, post_doc, tf.astype(np.float64), doc_lens)
+
+    def search(self, query, top_k=8):
+        """Return [(chunk_no, score), ...] best first; empty if no query term is in the report."""
+        ids = sorted({self.term_ids[t] for t in tokenize(query) if t in self.term_ids})
+        if not ids or not len(self.spans):
+            return []
+
+        slices = [np.arange(self.term_ptr[i], self.term_ptr[i + 1]) for i in ids]
+        lens = [len(s) for s in slices]
+        pos = np.concatenate(slices)
+        docs = self.post_doc[pos]
+        tf = self.post_tf[pos]
+        idf = np.repeat(self.idf[ids], lens)
+
+        contrib = idf * tf * (self.k1 + 1.0) / (tf + self._norm[docs])
+        scores = np.bincount(docs, weights=contrib, minlength=len(self.spans))
+
+        k = min(top_k, int(np.count_nonzero(scores)))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def select_spans(self, query, char_budget, top_k=8):
+        """
+        Pick the top-k chunks for the query that fit in char_budget and return their
+        (start, end) spans in document order. Overlapping or adjacent chunks come back as one
+        span and their shared text counts once against the budget.
+        Falls back to the start of the report when nothing matches.
+        """
+        hits = self.search(query, top_k)
+        if not hits:
+            return [(0, char_budget)]
+
+        chosen = []
+        for chunk_no, _ in hits:
+            start, end = (int(x) for x in self.spans[chunk_no])
+            merged = merge_spans(chosen + [(start, end)])
+            if sum(b - a for a, b in merged) <= char_budget:
+                chosen = merged
+
+        if not chosen:
+            start, end = (int(x) for x in self.spans[hits[0][0]])
+            chosen = [(start, min(end, start + char_budget))]
+        return chosen
+
+    def to_bytes(self):
+        buf = io.BytesIO()
+        np.savez_compressed(
+            buf,
+            vocab=np.array(self.vocab, dtype=str),
+            spans=self.spans,
+            term_ptr=self.term_ptr,
+            post_doc=self.post_doc,
+            post_tf=self.post_tf,
+            doc_lens=self.doc_lens,
+        )
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, payload):
+        data = np.load(io.BytesIO(payload), allow_pickle=False)
+        return cls(
+            data["vocab"].tolist(),
+            data["spans"].reshape(-1, 2),
+            data["term_ptr"],
+            data["post_doc"],
+            data["post_tf"],
+            data["doc_lens"],
+        )
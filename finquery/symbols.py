@@ -0,0 +1,264 @@
+import bisect
+import csv
+import difflib
+import logging
+import os
+import re
+import threading
+
+from finquery.cache import SQLiteCache
+from finquery.database import DB_FILENAME
+
+logger = logging.getLogger(__name__)
+
+# Small seed list shipped with the package (large caps only)
+BUNDLED_SYMBOL_MASTER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "symbols.csv")
+# Symbol master file(s), os.pathsep-separated. Besides the "symbol,name,exchange" layout of the
+# bundled file, NSE's EQUITY_L.csv and NASDAQ's nasdaqlisted/otherlisted files load as they are.
+SYMBOL_MASTER_CSV = os.environ.get("SYMBOL_MASTER_CSV", BUNDLED_SYMBOL_MASTER)
+# Whether the master lists every tradable symbol, so that anything missing from it is not worth
+# a network call: "auto" = yes for a SYMBOL_MASTER_CSV of your own, no for the bundled seed
+SYMBOL_MASTER_COMPLETE = os.environ.get("SYMBOL_MASTER_COMPLETE", "auto").lower()
+# A symbol listed on several exchanges (INFY: NSE and NYSE) resolves to the first one here
+SYMBOL_EXCHANGE_PRIORITY = [e.strip().upper() for e in
+                            os.environ.get("SYMBOL_EXCHANGE_PRIORITY", "NSE,BSE,NASDAQ,NYSE").split(",") if e.strip()]
+# Company-name matches need at least this difflib similarity ratio
+SYMBOL_FUZZY_CUTOFF = float(os.environ.get("SYMBOL_FUZZY_CUTOFF", 0.85))
+# Company-name prefixes ("Tata Consultancy") need at least this many letters, so initials
+# such as "L&T" are not taken for the one listing that happens to start with them
+SYMBOL_PREFIX_MIN_CHARS = int(os.environ.get("SYMBOL_PREFIX_MIN_CHARS", 4))
+# How long a symbol the market-data sources did not know stays in the negative cache (seconds)
+SYMBOL_NEGATIVE_TTL = int(os.environ.get("SYMBOL_NEGATIVE_TTL", 24 * 3600))
+
+INDIAN_EXCHANGES = {"NSE", "BSE"}
+_SUFFIX_EXCHANGE = {".NS": "NSE", ".NSE": "NSE", ".BO": "BSE", ".BSE": "BSE"}
+_PREFIX_RE = re.compile(r"^(NSE|BSE|NASDAQ|NYSE)\s*:\s*", re.IGNORECASE)
+_NON_WORD_RE = re.compile(r"[^A-Z0-9 ]+")
+_NAME_NOISE = {"LIMITED", "LTD", "INC", "CORP", "CORPORATION", "COMPANY", "CO", "PLC", "THE", "SE", "AG",
+               "HOLDINGS", "GROUP", "SA", "NV", "CLASS", "COMMON", "STOCK", "SHARES", "ORDINARY"}
+
+
+def normalize_name(name):
+    """'Dr. Reddy's Laboratories Ltd.' -> 'DR REDDYS LABORATORIES'; '&' counts as 'AND'."""
+    name = name.upper().replace("&", " AND ").replace("'", "")
+    words = _NON_WORD_RE.sub(" ", name).split()
+    return " ".join(w for w in words if w not in _NAME_NOISE)
+
+
+class Listing:
+    __slots__ = ("symbol", "name", "exchange")
+
+    def __init__(self, symbol, name, exchange):
+        self.symbol = symbol
+        self.name = name
+        self.exchange = exchange
+
+    @property
+    def key(self):
+        return f"{self.exchange}:{self.symbol}"
+
+    @property
+    def is_indian(self):
+        return self.exchange in INDIAN_EXCHANGES
+
+    @property
+    def yahoo_symbol(self):
+        """Ticker as yfinance expects it (INFY.NS, 500209.BO, MSFT)."""
+        if self.exchange == "NSE":
+            return f"{self.symbol}.NS"
+        if self.exchange == "BSE":
+            return f"{self.symbol}.BO"
+        return self.symbol
+
+    def __repr__(self):
+        return f"Listing({self.key}, {self.name!r})"
+
+
+def _read_rows(path):
+    """Yield (symbol, name, exchange) from one master file, whatever its known layout."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        sample = f.readline()
+        delimiter = "|" if sample.count("|") > sample.count(",") else ","
+        f.seek(0)
+        reader = csv.DictReader(f, delimiter=delimiter)
+        fields = {(h or "").strip().lower(): h for h in reader.fieldnames or []}
+
+        def col(*names):
+            return next((fields[n] for n in names if n in fields), None)
+
+        symbol_col = col("symbol", "act symbol", "security id", "ticker")
+        name_col = col("name", "name of company", "security name", "company name")
+        exchange_col = col("exchange")
+        test_col = col("test issue")
+        if not symbol_col or not name_col:
+            logger.warning("[Symbols] Unknown layout in %s, skipped", path)
+            return
+        default_exchange = "NSE" if "name of company" in fields else "NASDAQ"
+
+        for row in reader:
+            symbol = (row.get(symbol_col) or "").strip().upper()
+            name = (row.get(name_col) or "").strip()
+            if not symbol or not name or (test_col and (row.get(test_col) or "").strip() == "Y"):
+                continue
+            exchange = (row.get(exchange_col) or "").strip().upper() if exchange_col else default_exchange
+            # NASDAQ's otherlisted.txt uses single-letter exchange codes
+            exchange = {"N": "NYSE", "A": "NYSE", "P": "NYSE", "Z": "NYSE", "V": "NYSE", "Q": "NASDAQ"}.get(
+                exchange, exchange)
+            yield symbol, name, exchange
+
+
+class SymbolMaster:
+    """
+    Offline listing index: symbols in a sorted array (bisect lookups) and normalized
+    company names in a second sorted array for exact, prefix and fuzzy name matches.
+    Resolutions are memoized. complete says whether the listings cover the whole market
+    (a name it cannot resolve is then not a listing at all). Symbols the market-data sources
+    answered "unknown" for go to a negative cache (memory, plus an optional persistent
+    get/set store such as cache.SQLiteCache).
+    """
+
+    def __init__(self, listings, negative_store=None, exchange_priority=SYMBOL_EXCHANGE_PRIORITY,
+                 fuzzy_cutoff=SYMBOL_FUZZY_CUTOFF, complete=False):
+        rank = {e: i for i, e in enumerate(exchange_priority)}
+        self._rank = lambda listing: rank.get(listing.exchange, len(rank))
+        self._listings = sorted(listings, key=lambda l: (l.symbol, self._rank(l)))
+        self._symbols = [l.symbol for l in self._listings]
+
+        by_name = {}
+        for i, listing in enumerate(self._listings):
+            by_name.setdefault(normalize_name(listing.name), []).append(i)
+        # per name, the listing on the preferred exchange first
+        for indices in by_name.values():
+            indices.sort(key=lambda i: self._rank(self._listings[i]))
+        self._names = sorted(n for n in by_name if n)
+        self._name_listings = by_name
+
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.complete = complete
+        self._negative_store = negative_store
+        self._negative = set()
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_csv(cls, paths=SYMBOL_MASTER_CSV, complete=None, **kwargs):
+        paths = [p for p in str(paths).split(os.pathsep) if p]
+        if complete is None:
+            complete = (SYMBOL_MASTER_COMPLETE in ("1", "true", "yes") or
+                        (SYMBOL_MASTER_COMPLETE == "auto" and
+                         any(os.path.abspath(p) != BUNDLED_SYMBOL_MASTER for p in paths)))
+        listings = []
+        for path in paths:
+            if not os.path.exists(path):
+                logger.warning("[Symbols] Symbol master %s not found", path)
+                continue
+            listings.extend(Listing(*row) for row in _read_rows(path))
+        return cls(listings, complete=complete, **kwargs)
+
+    def __len__(self):
+        return len(self._listings)
+
+    # ----------------------------------------------------------------------------------------------
+    def lookup_symbol(self, symbol, exchange=None):
+        """Listing for an exact symbol (on `exchange` if given, else by exchange priority), or None."""
+        lo = bisect.bisect_left(self._symbols, symbol)
+        hi = bisect.bisect_right(self._symbols, symbol, lo)
+        for listing in self._listings[lo:hi]:
+            if exchange is None or listing.exchange == exchange:
+                return listing
+        return None
+
+    def lookup_name(self, name):
+        """
+        Listing for a company name: exact, then unique whole-word prefix ("Tata Consultancy"),
+        then fuzzy match; None if unsure.
+        """
+        norm = normalize_name(name)
+        if not norm:
+            return None
+        if norm in self._name_listings:
+            return self._listings[self._name_listings[norm][0]]
+
+        if len(norm.replace(" AND ", "").replace(" ", "")) >= SYMBOL_PREFIX_MIN_CHARS:
+            lo = bisect.bisect_left(self._names, norm + " ")
+            hi = bisect.bisect_left(self._names, norm + " \uffff", lo)
+            if hi - lo == 1:
+                return self._listings[self._name_listings[self._names[lo]][0]]
+            if hi - lo > 1:
+                return None  # "TATA" alone is ambiguous
+
+        # fuzzy match among names with the same first letter (keeps difflib off the whole list)
+        lo = bisect.bisect_left(self._names, norm[0])
+        hi = bisect.bisect_left(self._names, chr(ord(norm[0]) + 1), lo)
+        close = difflib.get_close_matches(norm, self._names[lo:hi], n=1, cutoff=self.fuzzy_cutoff)
+        if close:
+            return self._listings[self._name_listings[close[0]][0]]
+        return None
+
+    def resolve(self, query):
+        """
+        Canonical Listing for a ticker or company name as the model wrote it ('INFY', 'INFY.NS',
+        'NSE:INFY', 'Infosys'), or None when it is not a known listing.
+        """
+        raw = (query or "").strip()
+        if not raw:
+            return None
+        with self._lock:
+            if raw in self._resolved:
+                return self._resolved[raw]
+
+        text = raw.upper()
+        exchange = None
+        prefix = _PREFIX_RE.match(text)
+        if prefix:
+            exchange, text = prefix.group(1).upper(), text[prefix.end():]
+        for suffix, suffix_exchange in _SUFFIX_EXCHANGE.items():
+            if text.endswith(suffix):
+                exchange, text = suffix_exchange, text[:-len(suffix)]
+                break
+
+        listing = self.lookup_symbol(text.strip(), exchange)
+        if listing is None and exchange:
+            listing = self.lookup_symbol(text.strip())
+        if listing is None:
+            listing = self.lookup_name(raw)
+
+        with self._lock:
+            if len(self._resolved) > 10000:
+                self._resolved.clear()
+            self._resolved[raw] = listing
+        return listing
+
+    # ----------------------------------------------------------------------------------------------
+    def is_bad(self, query):
+        """True if query (a listing key or a raw ticker) is in the negative cache."""
+        key = (query or "").strip().upper()
+        with self._lock:
+            if key in self._negative:
+                return True
+        return bool(self._negative_store and self._negative_store.get(key))
+
+    def mark_bad(self, query):
+        key = (query or "").strip().upper()
+        with self._lock:
+            self._negative.add(key)
+        if self._negative_store:
+            self._negative_store.set(key, "1")
+
+
+_default_master = None
+_default_lock = threading.Lock()
+
+
+def default_symbol_master():
+    """Process-wide master loaded from SYMBOL_MASTER_CSV on first use, or None when it has no listings."""
+    global _default_master
+    if _default_master is None:
+        with _default_lock:
+            if _default_master is None:
+                # (symbol_negative, the old table, also held names that were only missing from the seed list)
+                store = SQLiteCache(DB_FILENAME, table="symbol_not_found", max_items=50000, ttl=SYMBOL_NEGATIVE_TTL)
+                master = SymbolMaster.from_csv(negative_store=store)
+                logger.info("[Symbols] Loaded %s listings%s", len(master), '' if master.complete else ' (partial)')
+                _default_master = master
+    return _default_master if len(_default_master) else None
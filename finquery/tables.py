@@ -0,0 +1,351 @@
+import logging
+import os
+import re
+
+from finquery.extractor import open_pdf
+
+logger = logging.getLogger(__name__)
+
+# Results below this confidence (0-1) are handed to the LLM extractor instead
+TABLE_MIN_CONFIDENCE = float(os.environ.get("TABLE_MIN_CONFIDENCE", 0.6))
+# Table detection is slow-ish (0.1-0.2s/page): only this many revenue-mentioning pages are scanned
+TABLE_MAX_PAGES = int(os.environ.get("TABLE_MAX_PAGES", 12))
+
+_PERIOD_RE = re.compile(
+    r"(?<![A-Za-z0-9])(?:"
+    r"Q(?P<q>[1-4])\s*[-' ]?\s*(?:FY\s*'?(?P<qfy>\d{4}|\d{2})|(?P<qy1>(?:19|20)\d{2})\s*[-/]\s*(?P<qy2>\d{2}))"
+    r"|FY\s*'?(?P<fy>(?:19|20)\d{2}|\d{2})(?:\s*[-/]\s*(?P<fy2>\d{2}))?"
+    r"|(?P<y1>(?:19|20)\d{2})\s*[-/]\s*(?P<y2>\d{2})(?!\d)"
+    r")(?P<est>\s*[EP](?![A-Za-z]))?",
+    re.IGNORECASE,
+)
+# Columns between the periods that hold growth figures, not amounts (YoY (%), QoQ, bps ...)
+_CHANGE_COL_RE = re.compile(r"\b(?:YoY|QoQ|y-o-y|q-o-q|growth|chg|change|var)\b\s*(?:\(%\)|%)?|\(%\)", re.IGNORECASE)
+_NUMBER_RE = re.compile(r"\(-?[\d,]+(?:\.\d+)?\)|-?[\d,]+(?:\.\d+)?%?|-")
+
+_REVENUE_LABEL_RE = re.compile(
+    r"^\s*(?:total\s+)?(?:"
+    r"revenue(?:s)?(?:\s+from\s+operations)?"
+    r"|income\s+from\s+operations"
+    r"|total\s+operating\s+income|operating\s+income"
+    r"|net\s+sales|sales|turnover"
+    r")\b(?P<rest>(?:(?!\bFY|\bQ[1-4])[^\d])*)",
+    re.IGNORECASE,
+)
+# Labels that start like revenue but are something else ("Revenue growth", "Revenue per employee")
+_NOT_REVENUE_RE = re.compile(r"growth|per\s|mix|share|%|margin|cost|expense|deferred|receivable|ratio|days",
+                             re.IGNORECASE)
+# Two-digit years above this are 19xx (FY99 = 1999), the rest 20xx (FY24 = 2024), as with strptime's %y
+_CENTURY_PIVOT = 68
+# A header applies to the rows below it for this many lines
+_HEADER_REACH = 30
+
+# Multipliers to ₹ crore, and whether the unit itself implies rupees (lakh and crore do, mn/bn do not)
+_UNIT_TO_CRORE = (
+    (re.compile(r"\blakhs?\b|\blacs?\b", re.IGNORECASE), 0.01, True),
+    (re.compile(r"\b(?:bn|billion)\b", re.IGNORECASE), 100.0, False),
+    (re.compile(r"\b(?:mn|million|mio)\b", re.IGNORECASE), 0.1, False),
+    (re.compile(r"\b(?:crores?|cr)\b", re.IGNORECASE), 1.0, True),
+)
+_FOREIGN_RE = re.compile(r"US\$|USD|\$|€|EUR|£|GBP", re.IGNORECASE)
+_RUPEE_RE = re.compile(r"₹|\bRs\.?|\bINR\b", re.IGNORECASE)
+
+
+def _two_digit(year):
+    return int(year) % 100
+
+
+def _full_year(two_digit):
+    return two_digit + (1900 if two_digit > _CENTURY_PIVOT else 2000)
+
+
+def _end_year(start, end):
+    """Four-digit end year of a span such as 2023-24 or 1999-00, from its four-digit start."""
+    start = int(start)
+    return start - start % 100 + int(end) + (100 if int(end) < start % 100 else 0)
+
+
+def parse_period(match):
+    """Normalized period key from a _PERIOD_RE match ("Q1 FY25", "FY24"), and whether it is an estimate."""
+    estimate = bool(match.group("est"))
+    if match.group("q"):
+        if match.group("qfy"):
+            fy = _two_digit(match.group("qfy"))
+        else:
+            fy = _two_digit(match.group("qy2"))
+        return f"Q{match.group('q')} FY{fy:02d}", estimate
+    if match.group("fy"):
+        # FY2023-24 / FY23-24 name the year by its end
+        fy = _two_digit(match.group("fy2") or match.group("fy"))
+        return f"FY{fy:02d}", estimate
+    return f"FY{_two_digit(match.group('y2')):02d}", estimate
+
+
+def normalize_period(text):
+    """(period key, is_estimate) for a period label such as "FY2023-24" or "Q1 FY'25"; None if it is not one."""
+    match = _PERIOD_RE.search(str(text))
+    return parse_period(match) if match else None
+
+
+def fiscal_year(text):
+    """
+    Four-digit fiscal year (by its end) of a period label: 2024 for "FY2023-24" or "Q1 FY24",
+    1999 for "FY1999" or "FY99"; None if text is not a period.
+    """
+    match = _PERIOD_RE.search(str(text))
+    if not match:
+        return None
+    if match.group("q"):
+        if match.group("qy1"):
+            return _end_year(match.group("qy1"), match.group("qy2"))
+        year = match.group("qfy")
+    elif match.group("fy"):
+        year = match.group("fy")
+        if match.group("fy2"):
+            return _end_year(year, match.group("fy2")) if len(year) == 4 else _full_year(int(match.group("fy2")))
+    else:
+        return _end_year(match.group("y1"), match.group("y2"))
+    return int(year) if len(year) == 4 else _full_year(int(year))
+
+
+def count_periods(text):
+    """How many fiscal period names (Q1 FY25, FY24, 2023-24 ...) appear in text."""
+    return len(_PERIOD_RE.findall(text))
+
+
+def period_sort_key(key):
+    fy = _full_year(int(key[-2:]))
+    quarter = int(key[1]) if key.startswith("Q") else 5
+    return fy, quarter
+
+
+def parse_amount(token):
+    """'1,54,119' -> 154119.0, '(6,793)' -> -6793.0, '-' / '12%' -> None."""
+    token = token.strip()
+    if token in ("-", "") or token.endswith("%"):
+        return None
+    negative = token.startswith("(") and token.endswith(")")
+    token = token.strip("()").replace(",", "")
+    try:
+        value = float(token)
+    except ValueError:
+        return None
+    return -value if negative else value
+
+
+def parse_unit(text):
+    """(multiplier to ₹ crore, unit implies rupees) for the first unit named in text, or None."""
+    for pattern, factor, rupee_unit in _UNIT_TO_CRORE:
+        if pattern.search(text):
+            return factor, rupee_unit
+    return None
+
+
+class _Header:
+    def __init__(self, columns, unit_text):
+        self.columns = columns        # period key, or None for a growth / % column
+        self.unit_text = unit_text
+
+    @property
+    def periods(self):
+        return [c for c in self.columns if c]
+
+
+class RevenueTableExtractor:
+    """
+    Local revenue-table reader: finds revenue rows under a header of fiscal periods in
+    PyMuPDF-detected tables and in the page text, and returns the same {"Q1 FY25": 62613}
+    shape as ReportAnalyzer.extract_financial_table (values in ₹ crore where a unit is known).
+    Every candidate row gets a confidence score; the caller falls back to the LLM below
+    min_confidence.
+    """
+
+    def __init__(self, min_confidence=TABLE_MIN_CONFIDENCE, max_pages=TABLE_MAX_PAGES):
+        self.min_confidence = min_confidence
+        self.max_pages = max_pages
+
+    def extract(self, pdf_path=None, pages=None):
+        """
+        Return (data, confidence); ({}, 0.0) when nothing usable is found.
+        The page text is tried first; table detection on pdf_path (a path or the PDF's bytes) only
+        runs when that is not enough.
+        """
+        if pages:
+            data, confidence = self._best(self._line_groups(None, pages))
+            if confidence >= self.min_confidence or not pdf_path:
+                return data, confidence
+        return self._best(self._line_groups(pdf_path, pages))
+
+    def _best(self, line_groups):
+        candidates = []
+        quarterly = []
+        for unit_context, lines in line_groups:
+            found = self._candidates(lines, unit_context)
+            candidates.extend(found)
+            quarterly.extend(c for c in found if all(k.startswith("Q") for k in c[1]))
+            if any(c[0] >= self.min_confidence for c in quarterly):
+                break  # nothing can beat a confident quarterly row; skip the remaining pages
+        if not candidates:
+            return {}, 0.0
+
+        # the LLM prompt prefers quarterly data when the report has it; do the same
+        pool = quarterly if quarterly and max(c[0] for c in quarterly) >= self.min_confidence else candidates
+        confidence, data = max(pool, key=lambda c: (c[0], len(c[1])))
+        ordered = {k: data[k] for k in sorted(data, key=period_sort_key)}
+        return ordered, round(confidence, 2)
+
+    # ----------------------------------------------------------------------------------------------
+    def _line_groups(self, pdf_path, pages):
+        """(unit context, lines) per page: detected table cells first, then the plain page text."""
+        pages = pages or []
+        wanted = [i for i, text in enumerate(pages) if re.search(r"revenue|sales|operating income", text, re.I)]
+
+        if pdf_path:
+            try:
+                doc = open_pdf(pdf_path)
+                try:
+                    # a revenue table needs a header of periods: pages with the most period names
+                    # go first, pages with fewer than two are skipped
+                    if pages:
+                        counts = {i: count_periods(pages[i]) for i in wanted}
+                        page_numbers = sorted((i for i in wanted if counts[i] >= 2), key=lambda i: -counts[i])
+                    else:
+                        page_numbers = range(doc.page_count)
+                    for page_no in list(page_numbers)[:self.max_pages]:
+                        page = doc[page_no]
+                        page_text = pages[page_no] if pages else page.get_text()
+                        for table in page.find_tables().tables:
+                            # one group per table, so a header row applies to the rows under it
+                            lines = [line for row in table.extract() for cell in row if cell
+                                     for line in cell.splitlines()]
+                            yield page_text, lines
+                finally:
+                    doc.close()
+            except Exception as e:
+                logger.warning("[Tables] Table detection failed (%s), using page text only", e)
+
+        for i in wanted:
+            yield pages[i], pages[i].splitlines()
+
+    def _candidates(self, lines, unit_context):
+        """[(confidence, {period: value}), ...] for the revenue rows in one block of lines."""
+        found = []
+        header, header_line = None, 0
+        for line_no, line in enumerate(lines):
+            new_header = self._parse_header(line)
+            if new_header:
+                header, header_line = new_header, line_no
+                continue
+            if header and line_no - header_line > _HEADER_REACH:
+                header = None
+
+            label = _REVENUE_LABEL_RE.match(line)
+            if not label or _NOT_REVENUE_RE.search(label.group("rest") or ""):
+                continue
+            label_text = line[:label.end()]
+            values_text = line[label.end():]
+
+            inline = self._inline_pairs(values_text)
+            if inline:
+                found.append(self._score(inline, label_text, "", unit_context, aligned=True))
+                continue
+            if header:
+                data, aligned = self._align(header, values_text)
+                if data:
+                    found.append(self._score(data, label_text, header.unit_text, unit_context, aligned))
+        return [c for c in found if c]
+
+    @staticmethod
+    def _parse_header(line):
+        periods = list(_PERIOD_RE.finditer(line))
+        if len(periods) < 2:
+            return None
+        # a header is mostly period names; a sentence mentioning FY24 and FY25 is not
+        covered = sum(m.end() - m.start() for m in periods)
+        changes = list(_CHANGE_COL_RE.finditer(line))
+        covered += sum(m.end() - m.start() for m in changes)
+        if covered < 0.5 * len(re.sub(r"\([^)]*\)|\s+", "", line)):
+            return None
+
+        marks = [(m.start(), parse_period(m)) for m in periods]
+        marks += [(m.start(), None) for m in changes]
+        # estimated / projected years are kept as columns but never reported
+        columns = [None if period is None or period[1] else period[0] for _, period in sorted(marks, key=lambda x: x[0])]
+        return _Header(columns, line)
+
+    @staticmethod
+    def _inline_pairs(text):
+        """'FY21 164,177 FY22 191,754' -> {"FY21": 164177.0, ...} (actual years only)."""
+        data = {}
+        for m in _PERIOD_RE.finditer(text):
+            key, estimate = parse_period(m)
+            number = _NUMBER_RE.match(text[m.end():].lstrip())
+            if estimate or not number:
+                continue
+            value = parse_amount(number.group())
+            if value is not None:
+                data[key] = value
+        return data if len(data) >= 2 else {}
+
+    @staticmethod
+    def _align(header, values_text):
+        """Map the leading numbers of a row onto the header columns. Returns (data, columns_matched)."""
+        tokens = []
+        for tok in values_text.split():
+            if not _NUMBER_RE.fullmatch(tok):
+                break
+            tokens.append(tok)
+
+        if len(tokens) == len(header.columns):
+            pairs = zip(header.columns, tokens)
+            aligned = True
+        elif len(tokens) == len(header.periods) and len(tokens) < len(header.columns):
+            # the growth columns are empty in this row
+            pairs = zip([c for c in header.columns if c is not None], tokens)
+            aligned = False
+        else:
+            return {}, False
+
+        data = {}
+        for period, tok in pairs:
+            if not period:
+                continue
+            value = parse_amount(tok)
+            if value is not None:
+                data[period] = value
+        return (data if len(data) >= 2 else {}), aligned
+
+    def _score(self, data, label_text, header_text, unit_context, aligned):
+        """Convert to ₹ crore and rate how trustworthy the row looks, as (confidence, data)."""
+        own_text = f"{label_text} {header_text}"
+        if _FOREIGN_RE.search(own_text):
+            return None  # a US$ revenue line next to the ₹ one would mix currencies in the chart
+        unit = parse_unit(own_text) or parse_unit(unit_context)
+        rupee_page = bool(_RUPEE_RE.search(unit_context)) and not _FOREIGN_RE.search(unit_context)
+        # the amounts are known to be rupees when the unit says so (crore, lakh), the row or its
+        # header names ₹, or the page names ₹ and no other currency
+        rupees = unit is not None and (unit[1] or bool(_RUPEE_RE.search(own_text)) or rupee_page)
+        if not rupees and _FOREIGN_RE.search(unit_context) and not _RUPEE_RE.search(unit_context):
+            return None  # "Key financials (US$ mn)": not rupees, and no conversion would be right
+        multiplier = unit[0] if unit else None
+
+        values = list(data.values())
+        if any(v <= 0 for v in values):
+            return None
+
+        confidence = 0.45
+        confidence += 0.2 if aligned else 0.05
+        confidence += 0.2 if rupees else 0.0
+        confidence += 0.1 if len(data) >= 3 else 0.0
+        if max(values) / min(values) > 5:  # revenue rarely jumps 5x between reported periods
+            confidence -= 0.35
+        if "operating income" in label_text.lower():
+            confidence -= 0.05  # close cousin of revenue in broker reports
+        if not rupees:
+            # amounts in an unknown unit or currency: the LLM gets to read the page instead
+            confidence = min(confidence, self.min_confidence - 0.1)
+
+        factor = multiplier or 1.0
+        converted = {k: round(v * factor, 2) if factor != 1.0 else (int(v) if v.is_integer() else v)
+                     for k, v in data.items()}
+        return min(confidence, 1.0), converted
@@ -0,0 +1,120 @@
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import time
+
+from werkzeug.exceptions import RequestEntityTooLarge
+
+logger = logging.getLogger(__name__)
+
+# Largest accepted PDF upload (MB)
+UPLOAD_MAX_MB = float(os.environ.get("UPLOAD_MAX_MB", 100))
+# Uploads up to this size stay in memory; larger ones spill to a temp file (MB)
+UPLOAD_MEMORY_MB = float(os.environ.get("UPLOAD_MEMORY_MB", 8))
+# Where spilled uploads go while their analysis runs
+UPLOAD_SPOOL_DIR = os.environ.get("UPLOAD_SPOOL_DIR", "uploads")
+# Spool files older than this were left behind by a crashed process (seconds)
+UPLOAD_SPOOL_MAX_AGE = int(os.environ.get("UPLOAD_SPOOL_MAX_AGE", 24 * 3600))
+
+SPOOL_PREFIX = "spool-"
+
+
+class UploadSpool:
+    """
+    Write-once buffer for one uploaded file, handed to werkzeug's form parser as the
+    file stream so the body lands here as it arrives: sha256 is computed chunk by chunk,
+    the size limit is enforced while reading, and the data stays in memory until it
+    passes memory_limit, when it moves to a temp file in spool_dir.
+    source() gives what PyMuPDF needs (bytes or a path) without another copy.
+    Unless claim()ed by whoever will release() it later, the app drops it when the request ends.
+    """
+
+    def __init__(self, memory_limit=UPLOAD_MEMORY_MB * 1024 * 1024, max_bytes=UPLOAD_MAX_MB * 1024 * 1024,
+                 spool_dir=UPLOAD_SPOOL_DIR):
+        self.memory_limit = memory_limit
+        self.max_bytes = max_bytes
+        self.spool_dir = spool_dir
+        self.size = 0
+        self.path = None
+        self.claimed = False
+        self._digest = hashlib.sha256()
+        self._head = b""
+        self._file = io.BytesIO()
+
+    def __getattr__(self, name):
+        # read/readline/seek/tell/flush ... of whichever buffer holds the data
+        return getattr(self._file, name)
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes and self.size > self.max_bytes:
+            self.release()
+            raise RequestEntityTooLarge(f"Uploads are limited to {self.max_bytes / 1024 / 1024:.0f} MB.")
+        if len(self._head) < 8:
+            self._head += data[:8]
+        self._digest.update(data)
+        if self.path is None and self.size > self.memory_limit:
+            self._spill()
+        return self._file.write(data)
+
+    def _spill(self):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        spilled = tempfile.NamedTemporaryFile(prefix=SPOOL_PREFIX, suffix=".pdf", dir=self.spool_dir, delete=False)
+        spilled.write(self._file.getbuffer())
+        self._file = spilled
+        self.path = spilled.name
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+    def looks_like_pdf(self):
+        return self._head.lstrip().startswith(b"%PDF")
+
+    def source(self):
+        """The upload for PDFExtractor / fitz.open: bytes when in memory, else the temp file path."""
+        if self.path is None:
+            return self._file.getvalue()  # shares the buffer, no copy
+        self._file.flush()
+        return self.path
+
+    def claim(self):
+        """Take over the data beyond the request (e.g. for a background job, which must release() it)."""
+        self.claimed = True
+
+    def close(self):
+        """Called by werkzeug when the request ends; the spilled file stays until release()."""
+        if self.path is not None:
+            self._file.close()
+
+    def release(self):
+        """Drop the data: close the buffer and delete the temp file, if any."""
+        self._file.close()
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+
+def cleanup_stale_spools(spool_dir=UPLOAD_SPOOL_DIR, max_age=UPLOAD_SPOOL_MAX_AGE):
+    """Delete spool files left behind by a process that died mid-analysis; returns how many."""
+    removed = 0
+    cutoff = time.time() - max_age
+    try:
+        names = os.listdir(spool_dir)
+    except OSError:
+        return 0
+    for name in names:
+        path = os.path.join(spool_dir, name)
+        try:
+            if name.startswith(SPOOL_PREFIX) and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    if removed:
+        logger.info("[Uploads] Removed %s stale spool files", removed)
+    return removed
@@ -1,41 +1,151 @@
-import matplotlib.pyplot as plt
+import hashlib
+import io
+import json
+import logging
 import os
+import tempfile
+import time
 
+logger = logging.getLogger(__name__)
 
-class DataVisualizer:
-    def create_bar_chart(self, data_dict, chart_title, filename="chart.png"):
-        print(f"--- Drawing chart: '{chart_title}' ---")
+# Rendered charts kept on disk beyond the ones saved reports show (oldest-used files are removed)
+CHART_CACHE_MAX_FILES = int(os.environ.get("CHART_CACHE_MAX_FILES", 500))
+# Charts written this recently (seconds) are never evicted: their report may not be saved yet
+CHART_EVICT_GRACE = int(os.environ.get("CHART_EVICT_GRACE", 3600))
 
 
-        if not data_dict:
-            print("--- [Visualizer] No numeric data to plot. Skipping chart. ---")
-            return False
+class DataVisualizer:
 
-        labels = list(data_dict.keys())
-        values = []
+    def __init__(self, max_cached_files=CHART_CACHE_MAX_FILES, charts_in_use=None):
+        self.max_cached_files = max_cached_files
+        # callable returning the chart file names saved reports reference (never evicted)
+        self.charts_in_use = charts_in_use
 
-        for v in data_dict.values():
+    @staticmethod
+    def _numeric_series(data_dict):
+        labels = []
+        values = []
+        for label, v in data_dict.items():
             try:
-                v_clean = float(str(v).replace(",", ""))
-                values.append(v_clean)
+                values.append(float(str(v).replace(",", "")))
+                labels.append(str(label))
             except:
-                print(f"[Visualizer] Skipping non-numeric value: {v}")
+                logger.debug("[Visualizer] Skipping non-numeric value: %s", v)
+        return labels, values
 
+    def render_bar_chart(self, data_dict, chart_title, fmt="png"):
+        """
+        Draw the bar chart and return the image bytes ("png" or "svg"), or None if
+        there is nothing numeric to plot. Safe to call from several threads at once.
+        """
+        if not data_dict:
+            logger.debug("[Visualizer] No numeric data to plot. Skipping chart.")
+            return None
 
+        labels, values = self._numeric_series(data_dict)
         if not values:
-            print("--- [Visualizer] No valid numeric values found. Skipping chart. ---")
-            return False
+            logger.debug("[Visualizer] No valid numeric values found. Skipping chart.")
+            return None
+
+        # Object-oriented Agg API only: no pyplot, so no global figure state shared between threads.
+        # Imported here because matplotlib is slow to import and most requests never draw.
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        fig = Figure(figsize=(8, 5))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        ax.bar(labels, values, color="skyblue")
+        ax.set_title(chart_title)
+        ax.set_xlabel("Period")
+        ax.set_ylabel("Value")
+
+        buf = io.BytesIO()
+        fig.savefig(buf, format=fmt)
+        return buf.getvalue()
+
+    @staticmethod
+    def chart_key(data_dict, chart_title, fmt="png"):
+        """Content address of a chart: hash of its data, title and format."""
+        payload = json.dumps({"data": data_dict, "title": chart_title, "fmt": fmt}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
 
+    def get_chart(self, data_dict, chart_title, chart_folder, fmt="png"):
+        """
+        Return the file name (inside chart_folder) of the chart for this data, rendering it
+        only if the same data + title was never drawn before. Returns "" if there is no chart.
+        """
+        filename = f"{self.chart_key(data_dict, chart_title, fmt)}.{fmt}"
+        path = os.path.join(chart_folder, filename)
         try:
-            plt.figure(figsize=(8,5))
-            plt.bar(labels, values, color="skyblue")
-            plt.title(chart_title)
-            plt.xlabel("Period")
-            plt.ylabel("Value")
-            plt.savefig(filename)
-            plt.close()
-            print(f"--- Chart saved successfully as '{filename}' ---")
+            os.utime(path)  # mark as recently used for eviction
+            logger.debug("[Visualizer] Reusing cached chart '%s'", filename)
+            return filename
+        except FileNotFoundError:
+            pass  # never drawn, or evicted (maybe by another process) since: draw it again
+
+        logger.debug("Drawing chart: '%s'", chart_title)
+        try:
+            image = self.render_bar_chart(data_dict, chart_title, fmt)
+        except Exception as e:
+            logger.warning("An error occurred while drawing chart: %s", e)
+            return ""
+        if image is None:
+            return ""
+
+        self._write_atomic(path, image)
+        self._evict(chart_folder)
+        logger.debug("Chart saved successfully as '%s'", path)
+        return filename
+
+    def create_bar_chart(self, data_dict, chart_title, filename="chart.png"):
+        logger.debug("Drawing chart: '%s'", chart_title)
+        fmt = "svg" if filename.lower().endswith(".svg") else "png"
+        try:
+            image = self.render_bar_chart(data_dict, chart_title, fmt)
+            if image is None:
+                return False
+            self._write_atomic(filename, image)
+            logger.debug("Chart saved successfully as '%s'", filename)
             return True
         except Exception as e:
-            print(f"An error occurred while drawing chart: {e}")
+            logger.warning("An error occurred while drawing chart: %s", e)
             return False
+
+    @staticmethod
+    def _write_atomic(path, data):
+        # write to a temp file and rename, so readers never see a half-written image
+        folder = os.path.dirname(path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _evict(self, chart_folder):
+        """Remove the oldest-used charts beyond max_cached_files, sparing those saved reports reference."""
+        try:
+            entries = [e for e in os.scandir(chart_folder)
+                       if e.is_file() and len(os.path.splitext(e.name)[0]) == 32]
+        except OSError:
+            return
+        if len(entries) <= self.max_cached_files:
+            return
+        if self.charts_in_use is not None:
+            try:
+                in_use = self.charts_in_use()
+            except Exception as e:
+                logger.warning("[Visualizer] Could not list the charts in use, not evicting: %s", e)
+                return
+            entries = [e for e in entries if e.name not in in_use]
+        excess = len(entries) - self.max_cached_files
+        if excess <= 0:
+            return
+        cutoff = time.time() - CHART_EVICT_GRACE
+        entries = sorted((e for e in entries if e.stat().st_mtime < cutoff), key=lambda e: e.stat().st_mtime)
+        for entry in entries[:excess]:
+            try:
+                # scandir's stat is cached: skip charts get_chart reused since the scan
+                if os.stat(entry.path).st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# finquery reads its settings at import time: keep the test run away from the real database
+_workdir = tempfile.mkdtemp(prefix="finquery_tests_")
+os.environ["REPORTS_DB"] = os.path.join(_workdir, "reports.db")
+os.environ.setdefault("LLM_CACHE", "0")
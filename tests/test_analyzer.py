@@ -0,0 +1,130 @@
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from finquery.analyzer import ReportAnalyzer, group_pages
+
+
+class FakeModel:
+    """Answers each prompt kind with canned text; records the prompts it saw."""
+
+    def __init__(self):
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def answer(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+        if "main_ticker" in prompt:
+            return json.dumps({"main_ticker": "TCS", "competitors": ["INFY", "WIPRO"]})
+        if "revenue figures" in prompt:
+            return '```json\n{"FY23": 225458, "FY24": 240893}\n```'
+        if "SECTION TEXT" in prompt:
+            return "- note"
+        return "- Headline: summary"
+
+    def generate_content(self, prompt, *args, **kwargs):
+        return SimpleNamespace(text=self.answer(prompt))
+
+    async def generate_content_async(self, prompt, *args, **kwargs):
+        return SimpleNamespace(text=self.answer(prompt))
+
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    analyzer = ReportAnalyzer(cache=False)
+    analyzer.model = FakeModel()
+    return analyzer
+
+
+def test_async_variants_match_the_sync_calls(analyzer):
+    text = "Tata Consultancy Services revenue"
+
+    async def run():
+        return await asyncio.gather(analyzer.summarize_text_async(text), analyzer.get_competitors_async(text),
+                                    analyzer.extract_financial_table_async(text))
+
+    assert list(asyncio.run(run())) == [analyzer.summarize_text(text), analyzer.get_competitors(text),
+                                        analyzer.extract_financial_table(text)]
+
+
+def test_async_variants_fall_back_on_errors(analyzer):
+    async def fail(*args, **kwargs):
+        raise RuntimeError("quota")
+
+    analyzer.model.generate_content_async = fail
+    assert asyncio.run(analyzer.get_competitors_async("x")) == {"main_ticker": "UNKNOWN", "competitors": []}
+    assert asyncio.run(analyzer.extract_financial_table_async("x")) == {}
+    assert asyncio.run(analyzer.summarize_text_async("x")).startswith("Error")
+
+
+class DictCache:
+    def __init__(self):
+        self.items = {}
+
+    def get(self, key):
+        return self.items.get(key)
+
+    def set(self, key, value):
+        self.items[key] = value
+
+
+def test_calls_log_instead_of_printing(analyzer, capsys, caplog):
+    analyzer.cache = DictCache()
+    with caplog.at_level("DEBUG", logger="finquery.analyzer"):
+        analyzer.summarize_text("text")
+        analyzer.summarize_text("text")
+    assert capsys.readouterr().out == ""
+    assert "[Cache] Using cached AI response" in caplog.messages
+
+
+def test_group_pages_splits_on_page_boundaries():
+    pages = ["a" * 40, "b" * 40, "c" * 40, "   ", "d" * 250]
+    assert [(first, last, len(text)) for first, last, text in group_pages(pages, chunk_chars=100)] == [
+        (1, 2, 80), (3, 4, 43), (5, 5, 100), (5, 5, 100), (5, 5, 50)]
+    # max_chunks wins over chunk_chars: chunks grow instead of multiplying
+    assert [(first, last) for first, last, _ in group_pages(pages, chunk_chars=100, max_chunks=1)] == [(1, 5)]
+
+
+def section_notes(prompt):
+    if "SECTION TEXT" not in prompt:
+        return "- Headline: summary"
+    section = prompt.split("SECTION TEXT:\n", 1)[1]
+    return "NONE" if section.startswith("cover") else f"- {section[:5]}"
+
+
+def test_summarize_document_maps_chunks_then_reduces_their_notes(analyzer):
+    analyzer.model.answer = lambda prompt: analyzer.model.prompts.append(prompt) or section_notes(prompt)
+    pages = ["cover page ".ljust(60), "sales up".ljust(60), "profit up".ljust(60)]
+
+    assert analyzer.summarize_document(pages, chunk_chars=100) == "- Headline: summary"
+    chunk_prompts = [p for p in analyzer.model.prompts if "SECTION TEXT" in p]
+    assert len(chunk_prompts) == 3
+    final = analyzer.model.prompts[-1]
+    assert "[Pages 2-2]\n- sales" in final and "[Pages 3-3]\n- profi" in final
+    assert "cover" not in final  # a chunk without substance leaves no note
+
+
+def test_summarize_document_short_document_is_one_call(analyzer):
+    assert analyzer.summarize_document(["short report"]) == "- Headline: summary"
+    assert len(analyzer.model.prompts) == 1 and "short report" in analyzer.model.prompts[0]
+
+
+def test_summarize_document_without_notes_summarizes_the_start(analyzer):
+    analyzer.model.answer = lambda prompt: analyzer.model.prompts.append(prompt) or (
+        "NONE" if "SECTION TEXT" in prompt else "- Headline: summary")
+    pages = ["x" * 80, "y" * 80]
+    assert analyzer.summarize_document(pages, chunk_chars=100) == "- Headline: summary"
+    assert analyzer.model.prompts[-1].endswith("x" * 80 + "y" * 20)
+
+
+def test_async_summarize_document_matches_the_threaded_one(analyzer):
+    analyzer.model.answer = lambda prompt: section_notes(prompt) if "SECTION TEXT" in prompt else prompt[-200:]
+    pages = ["sales up".ljust(60), "profit up".ljust(60), "cash up".ljust(60)]
+    expected = analyzer.summarize_document(pages, chunk_chars=100)
+    assert "[Pages 1-1]" in expected
+    assert asyncio.run(analyzer.summarize_document_async(pages, chunk_chars=100)) == expected
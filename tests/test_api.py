@@ -0,0 +1,213 @@
+import base64
+import io
+import os
+import time
+
+import pytest
+
+import app as web
+
+
+@pytest.fixture
+def client():
+    with web.db._transaction() as cursor:
+        cursor.execute("DELETE FROM reports")
+    return web.app.test_client()
+
+
+def token(raw):
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def test_report_listing_follows_next_cursor(client):
+    ids = [web.db.save_report({"ticker": "TCS", "summary": ""}) for _ in range(5)]
+    seen, params = [], {"limit": 2}
+    while True:
+        body = client.get("/api/reports", query_string=params).get_json()
+        seen.extend(r["id"] for r in body["reports"])
+        if not body["next_cursor"]:
+            break
+        params["cursor"] = body["next_cursor"]
+    assert seen == sorted(ids, reverse=True)
+
+
+@pytest.mark.parametrize("cursor", [
+    token(b"5"), token(b'"x"'), token(b"[1]"), token(b'["2024-01-01", "7"]'), token(b'["2024-01-01", true]'),
+    token(b"not json"), "%%%", "é",
+])
+def test_malformed_cursor_is_a_bad_request(client, cursor):
+    response = client.get("/api/reports", query_string={"cursor": cursor})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("value, end, expected", [
+    ("2024-05-01", False, "2024-05-01 00:00:00"),
+    ("2024-05-01", True, "2024-05-02 00:00:00"),
+    ("2024-05-01T10:30:00", False, "2024-05-01 10:30:00"),
+    ("2024-05-01T10:30:00+05:30", False, "2024-05-01 05:00:00"),
+    ("2024-05-01T01:00:00+05:30", False, "2024-04-30 19:30:00"),
+    ("2024-05-01T10:30:00Z", False, "2024-05-01 10:30:00"),
+])
+def test_parse_date_arg_converts_to_utc(value, end, expected):
+    assert web.parse_date_arg(value, end=end) == expected
+
+
+PDF = b"%PDF-1.4\n% test document\n"
+
+
+def wait_for_job(job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = web.db.get_job(job_id)
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+def upload(client, name, data=PDF):
+    response = client.post("/upload", data={"pdf_file": (io.BytesIO(data), name)},
+                           headers={"Accept": "application/json"}, content_type="multipart/form-data")
+    assert response.status_code == 202
+    return response.get_json()
+
+
+class StubAnalyzer:
+    """The analyzer calls ReportPipeline makes, counted; every stage succeeds."""
+
+    def __init__(self):
+        self.calls = []
+
+    def extract_pages_from_pdf(self, source):
+        self.calls.append("extract")
+        return ["Tata Consultancy Services annual report. ", "Revenue from operations grew. "]
+
+    def summarize_document(self, pages):
+        self.calls.append("summary")
+        return "- Headline: fresh summary"
+
+    def get_competitors(self, text):
+        self.calls.append("company_info")
+        return {"main_ticker": "TCS", "competitors": ["INFY"]}
+
+    def extract_financial_table(self, text):
+        self.calls.append("chart_data")
+        return {"FY23": 225458, "FY24": 240893}
+
+
+class StubFetcher:
+    def get_competitor_stats(self, competitors):
+        return [{"symbol": c, "info": {"Name": c}} for c in competitors]
+
+
+class StubVisualizer:
+    def get_chart(self, chart_data, title, folder):
+        return "chart.png"
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    from finquery.pipeline import ReportPipeline
+
+    analyzer = StubAnalyzer()
+    stub = ReportPipeline(analyzer, StubFetcher(), StubVisualizer(), web.db, web.STATIC_CHART_FOLDER)
+    monkeypatch.setitem(web._clients, "pipeline", stub)
+    monkeypatch.setattr(stub.tables, "extract", lambda pdf_path, pages: ({}, 0.0))
+    with web.db._transaction() as cursor:
+        cursor.execute("DELETE FROM pdf_hashes")
+        cursor.execute("DELETE FROM jobs")
+    return analyzer
+
+
+def test_same_pdf_under_another_name_is_the_same_report(client, pipeline):
+    first = upload(client, "tcs-annual-report.pdf")
+    assert wait_for_job(first["job_id"])["status"] == "done"
+    assert web.db.get_report(first["report_id"])["ticker"] == "TCS"
+
+    pipeline.calls.clear()
+    again = upload(client, "copy of report.pdf")
+    assert again["report_id"] == first["report_id"]
+    assert again["job_id"] is None and pipeline.calls == []
+
+
+def test_duplicate_upload_reruns_only_the_stale_stage(client, pipeline):
+    first = upload(client, "tcs.pdf", PDF + b"stale")
+    wait_for_job(first["job_id"])
+    report_id = first["report_id"]
+    web.db.update_report(report_id, {"summary": "Summary unavailable (AI error)."})
+    web.db.record_stage_result(report_id, "summary", "timed out")
+
+    pipeline.calls.clear()
+    again = upload(client, "tcs-again.pdf", PDF + b"stale")
+    assert again["report_id"] == report_id
+    job = wait_for_job(again["job_id"])
+    assert job["status"] == "done" and list(job["stages"]) == ["summary"]
+    assert pipeline.calls == ["summary"]
+    assert web.db.get_report(report_id)["summary"] == "- Headline: fresh summary"
+    assert web.db.get_failed_stages(report_id) == {}
+
+
+def test_failed_competitor_lookup_is_rerun_with_its_dependents(client, pipeline):
+    first = upload(client, "tcs.pdf", PDF + b"competitors")
+    wait_for_job(first["job_id"])
+    web.db.record_stage_result(first["report_id"], "company_info", "company not identified")
+
+    pipeline.calls.clear()
+    job = wait_for_job(upload(client, "tcs.pdf", PDF + b"competitors")["job_id"])
+    assert sorted(job["stages"]) == ["company_info", "competitor_rows"]
+    assert pipeline.calls == ["company_info"]
+
+
+def test_job_status_reports_progress_and_the_report(client, pipeline):
+    job_id = upload(client, "status.pdf", PDF + b"status")["job_id"]
+    wait_for_job(job_id)
+    body = client.get(f"/jobs/{job_id}").get_json()
+    assert body["status"] == "done" and body["error"] is None
+    assert set(body["stages"]) == {"extract", "summary", "company_info", "competitor_rows", "chart_data", "chart",
+                                   "index"}
+    assert all(stage["status"] == "done" for stage in body["stages"].values())
+    report = body["report"]
+    assert report["ticker"] == "TCS" and report["competitors"] == ["INFY"]
+    assert report["chart_url"].endswith("/static/charts/chart.png")
+
+
+def test_job_status_of_unknown_job(client):
+    response = client.get("/jobs/nope")
+    assert response.status_code == 404 and response.get_json() == {"error": "job not found"}
+
+
+@pytest.fixture
+def spools(monkeypatch, tmp_path):
+    """Every upload spills to a file in tmp_path; returns the spools created."""
+    created = []
+
+    class SpillingSpool(web.UploadSpool):
+        def __init__(self):
+            super().__init__(memory_limit=0, spool_dir=str(tmp_path))
+            created.append(self)
+
+    monkeypatch.setattr(web, "UploadSpool", SpillingSpool)
+    return created
+
+
+def test_rejected_upload_spool_is_dropped_when_the_request_ends(client, spools, tmp_path):
+    response = client.post("/upload", data={"pdf_file": (io.BytesIO(b"<html>not a pdf</html>"), "fake.pdf")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 302
+    assert len(spools) == 1 and spools[0].path is None and os.listdir(tmp_path) == []
+
+
+def test_claimed_upload_spool_lives_until_its_job_ends(client, pipeline, spools, tmp_path, monkeypatch):
+    seen = []
+    extract = pipeline.extract_pages_from_pdf
+
+    def extract_spooled(source):
+        with open(source, "rb") as f:  # the request has ended; the job still reads the spooled file
+            seen.append(f.read())
+        return extract(source)
+
+    monkeypatch.setattr(pipeline, "extract_pages_from_pdf", extract_spooled)
+    job_id = upload(client, "spool.pdf", PDF + b"spool")["job_id"]
+    assert wait_for_job(job_id)["status"] == "done"
+    assert seen == [PDF + b"spool"] and spools[0].claimed
+    assert spools[0].path is None and os.listdir(tmp_path) == []
@@ -0,0 +1,64 @@
+import finquery.cache as cache_module
+from finquery.cache import SQLiteCache
+
+
+def make_cache(tmp_path, **kwargs):
+    return SQLiteCache(str(tmp_path / "cache.db"), table="market_cache", **kwargs)
+
+
+def test_get_with_age_counts_as_a_use(tmp_path):
+    cache = make_cache(tmp_path, max_items=2, ttl=0)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get_with_age("a")[0] == "1"
+    cache.set("c", "3")
+    conn = cache._get_connection()
+    cache._evict(conn, 0)
+    conn.commit()
+    assert cache.get_with_age("a")[0] == "1" and cache.get_with_age("b") == (None, None)
+
+
+def accessed_at(cache, key):
+    return cache._get_connection().execute(
+        "SELECT accessed_at FROM market_cache WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_hits_do_not_write_until_a_batch_is_due(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "CACHE_TOUCH_BATCH", 3)
+    cache = make_cache(tmp_path, ttl=0)
+    cache.set("a", "1")
+    written = accessed_at(cache, "a")
+    conn = cache._get_connection()
+    changes = conn.total_changes
+
+    assert cache.get("a") == "1" and cache.get("a") == "1"
+    assert conn.total_changes == changes and accessed_at(cache, "a") == written
+    cache.get_with_age("a")
+    cache.get("missing")
+    assert cache.get("a") == "1"  # one key touched, but the third hit makes a batch due
+    assert accessed_at(cache, "a") > written
+
+
+def test_expired_entries_are_skipped_without_a_write(tmp_path):
+    cache = make_cache(tmp_path, ttl=60)
+    cache.set("a", "1")
+    conn = cache._get_connection()
+    conn.execute("UPDATE market_cache SET created_at = created_at - 120")
+    conn.commit()
+    changes = conn.total_changes
+    assert cache.get("a") is None and cache.get_with_age("a") == (None, None)
+    assert conn.total_changes == changes
+
+
+def test_tiered_cache_counts_lookups_per_tier(tmp_path):
+    from finquery.cache import LRUCache, TieredCache
+    from finquery.metrics import Registry
+
+    lookups = Registry().counter("lookups_total", "test", ["tier"])
+    disk = make_cache(tmp_path)
+    cache = TieredCache([LRUCache(), disk], names=["memory", "disk"], lookups=lookups)
+    disk.set("k", "v")
+    assert cache.get("k") == "v"  # from disk, copied to memory
+    assert cache.get("k") == "v"
+    assert cache.get("other") is None
+    assert [lookups.value(tier=t) for t in ("memory", "disk", "miss")] == [1, 1, 1]
@@ -0,0 +1,116 @@
+import pytest
+
+from finquery.database import DataBaseManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DataBaseManager(str(tmp_path / "reports.db"))
+
+
+def age_job(db, job_id, seconds):
+    with db._transaction() as cursor:
+        cursor.execute("UPDATE jobs SET updated_at = datetime('now', ?) WHERE id = ?", (f"-{seconds} seconds", job_id))
+
+
+def test_stale_running_job_is_failed_with_its_placeholder(db):
+    report_id = db.save_report({"ticker": "PENDING", "summary": ""})
+    db.save_pdf_hash("abc", report_id)
+    db.create_job("job1", report_id, status="running")
+    age_job(db, "job1", 7200)
+
+    job = db.get_job("job1")
+    assert job["status"] == "failed"
+    assert db.get_report(report_id)["ticker"] == "FAILED"
+    assert db.find_report_by_hash("abc") is None
+
+
+def test_recent_running_job_is_left_alone(db):
+    report_id = db.save_report({"ticker": "PENDING", "summary": ""})
+    db.create_job("job1", report_id, status="running")
+    age_job(db, "job1", 60)
+
+    assert db.fail_unfinished_jobs(older_than=1800) == 0
+    assert db.get_job("job1")["status"] == "running"
+    assert db.get_report(report_id)["ticker"] == "PENDING"
+
+
+def test_placeholder_reports_are_not_listed(db):
+    db.save_report({"ticker": "PENDING", "summary": ""})
+    failed = db.save_report({"ticker": "PENDING", "summary": ""})
+    db.fail_placeholder_report(failed)
+    done = db.save_report({"ticker": "TCS", "summary": ""})
+
+    rows, has_more = db.list_reports()
+    assert [r["id"] for r in rows] == [done] and not has_more
+
+
+def test_delete_pdf_hash_only_for_its_report(db):
+    db.save_pdf_hash("abc", 2)
+    db.delete_pdf_hash("abc", report_id=1)
+    with db._transaction() as cursor:
+        cursor.execute("SELECT report_id FROM pdf_hashes WHERE content_hash = 'abc'")
+        assert cursor.fetchone()["report_id"] == 2
+
+
+def save_dated(db, ticker, analysis_date):
+    report_id = db.save_report({"ticker": ticker, "summary": f"{ticker} report"})
+    with db._transaction() as cursor:
+        cursor.execute("UPDATE reports SET analysis_date = ? WHERE id = ?", (analysis_date, report_id))
+    return report_id
+
+
+def walk(db, limit, **kwargs):
+    """Every page of list_reports, following the (analysis_date, id) of each page's last row."""
+    seen, after = [], None
+    while True:
+        rows, has_more = db.list_reports(after=after, limit=limit, **kwargs)
+        seen.append([r["id"] for r in rows])
+        if not has_more:
+            return seen
+        after = (rows[-1]["analysis_date"], rows[-1]["id"])
+
+
+@pytest.fixture
+def dated(db):
+    # ids 1-3 share a timestamp, so only the id tells them apart
+    ids = [save_dated(db, "TCS", "2024-05-01 10:00:00") for _ in range(3)]
+    ids.append(save_dated(db, "INFY", "2024-04-01 09:00:00"))
+    ids.append(save_dated(db, "TCS", "2024-06-01 08:00:00"))
+    return ids
+
+
+def test_cursor_walk_visits_every_report_once_newest_first(db, dated):
+    pages = walk(db, 2)
+    assert pages == [[5, 3], [2, 1], [4]]
+
+
+def test_cursor_walk_oldest_first(db, dated):
+    assert walk(db, 2, newest_first=False) == [[4, 1], [2, 3], [5]]
+
+
+def test_cursor_walk_with_filters(db, dated):
+    assert walk(db, 1, ticker="TCS", newest_first=False) == [[1], [2], [3], [5]]
+    assert walk(db, 10, since="2024-05-01 10:00:00", until="2024-06-01 08:00:00") == [[3, 2, 1]]
+
+
+def test_exact_page_size_has_no_empty_last_page(db, dated):
+    rows, has_more = db.list_reports(limit=5)
+    assert len(rows) == 5 and not has_more
+
+
+def test_read_text_spans_reads_only_the_pages_it_needs(db, monkeypatch):
+    import finquery.database as database
+
+    pages = [f"page{i:02d}|" * 10 for i in range(50)]  # 70 characters each
+    report_id = db.save_report({"ticker": "TCS", "summary": ""})
+    db.save_report_pages(report_id, pages)
+    text = "".join(pages)
+
+    decompressed = []
+    real = database.decompress_text
+    monkeypatch.setattr(database, "decompress_text", lambda codec, blob: decompressed.append(1) or real(codec, blob))
+    spans = [(75, 90), (3460, 3490), (130, 150), (0, 0), (3490, 3600)]
+    assert db.read_text_spans(report_id, spans) == [text[a:b] for a, b in spans]
+    # pages 1, 2 and 49, each once; the pages in between stay compressed
+    assert len(decompressed) == 3
@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+from finquery.facts import FACT_COLUMNS, FactAnalytics, revenue_facts
+
+
+def test_revenue_facts_normalizes_labels_and_values():
+    facts = revenue_facts({"FY2023-24": "2,40,893", "Q1 FY25": 62613, "FY26E": 270000, "Growth": 5, "FY23": "-"})
+    assert sorted(facts) == [("revenue", "FY24", 2024, 0, 240893.0), ("revenue", "Q1 FY25", 2025, 1, 62613.0)]
+
+
+def test_revenue_facts_keep_the_century_of_old_years():
+    facts = revenue_facts({"FY1998": 100, "FY99": 120, "FY1999-00": 150})
+    assert sorted((fy, value) for _, _, fy, _, value in facts) == [(1998, 100.0), (1999, 120.0), (2000, 150.0)]
+
+
+def analytics(rows):
+    frame = pd.DataFrame.from_records(
+        [(report_id, ticker, date, "revenue", period, fy, quarter, value)
+         for report_id, ticker, date, period, fy, quarter, value in rows], columns=FACT_COLUMNS)
+    return FactAnalytics(frame)
+
+
+@pytest.fixture
+def peers():
+    return analytics([
+        (1, "TCS", "2024-05-01", "FY22", 2022, 0, 100.0),
+        (1, "TCS", "2024-05-01", "FY23", 2023, 0, 110.0),
+        (1, "TCS", "2024-05-01", "FY24", 2024, 0, 121.0),
+        (1, "TCS", "2024-05-01", "Q1 FY24", 2024, 1, 30.0),
+        (2, "INFY", "2024-05-02", "FY23", 2023, 0, 50.0),
+        (2, "INFY", "2024-05-02", "FY24", 2024, 0, 60.0),
+        (3, "INFY", "2024-06-01", "FY24", 2024, 0, 64.0),  # a later report restates FY24
+    ])
+
+
+def test_yoy_and_cagr(peers):
+    yoy = peers.yoy().set_index(["ticker", "period"])["yoy"]
+    assert yoy[("TCS", "FY24")] == pytest.approx(0.10)
+    assert yoy[("INFY", "FY24")] == pytest.approx(0.28)
+    assert pd.isna(yoy[("TCS", "Q1 FY24")])  # no Q1 FY23 to compare with
+
+    cagr = peers.cagr().set_index("ticker")
+    assert cagr.loc["TCS", "years"] == 2 and cagr.loc["TCS", "cagr"] == pytest.approx(0.10)
+    assert cagr.loc["INFY", "cagr"] == pytest.approx(0.28)
+    assert peers.cagr(end_fy=2023).set_index("ticker").loc["TCS", "cagr"] == pytest.approx(0.10)
+
+
+def test_peer_ranking(peers):
+    table = peers.peer_ranking()
+    assert list(table["ticker"]) == ["TCS", "INFY"]
+    assert list(table["value"]) == [121.0, 64.0]
+    assert list(table["value_rank"]) == [1, 2]
+    assert list(table["yoy_rank"]) == [2, 1] and list(table["cagr_rank"]) == [2, 1]
+
+    earlier = peers.peer_ranking(fy=2023).set_index("ticker")
+    assert earlier.loc["TCS", "yoy"] == pytest.approx(0.10) and pd.isna(earlier.loc["INFY", "yoy"])
+    assert list(peers.peer_ranking(tickers=["INFY"])["ticker"]) == ["INFY"]
+    assert peers.peer_ranking(tickers=["WIPRO"]).empty
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from finquery.cache import SQLiteCache
+from finquery.fetcher import DataFetcher
+
+
+class SlowFetcher(DataFetcher):
+    """Overviews answer after a per-symbol delay; "BAD" raises."""
+
+    def __init__(self, tmp_path, delays):
+        super().__init__(cache=SQLiteCache(str(tmp_path / "market.db"), table="market_cache"), symbols=False)
+        self.delays = delays
+        self.release = threading.Event()
+
+    def get_company_overview(self, ticker):
+        if ticker == "BAD":
+            raise RuntimeError("upstream error")
+        self.release.wait(self.delays.get(ticker, 0))
+        return {"Symbol": ticker}
+
+    async def get_company_overview_async(self, ticker):
+        if ticker == "BAD":
+            raise RuntimeError("upstream error")
+        await asyncio.sleep(self.delays.get(ticker, 0))
+        return {"Symbol": ticker}
+
+
+@pytest.fixture(autouse=True)
+def api_key(monkeypatch):
+    monkeypatch.setenv("ALPHA_VANTAGE_KEY", "test")
+
+
+EXPECTED = [{"symbol": "INFY", "info": {"Symbol": "INFY"}}, {"symbol": "SLOW", "info": None},
+            {"symbol": "BAD", "info": None}, {"symbol": "WIPRO", "info": {"Symbol": "WIPRO"}}]
+
+
+def test_competitor_stats_keep_order_and_do_not_wait_for_a_slow_symbol(tmp_path):
+    fetcher = SlowFetcher(tmp_path, {"INFY": 0.05, "SLOW": 10, "WIPRO": 0.05})
+    started = time.perf_counter()
+    stats = fetcher.get_competitor_stats(["INFY", "SLOW", "BAD", "WIPRO"], max_workers=4, timeout=0.5)
+    fetcher.release.set()
+    assert time.perf_counter() - started < 2
+    assert stats == EXPECTED
+
+
+def test_competitor_stats_run_concurrently(tmp_path):
+    fetcher = SlowFetcher(tmp_path, {sym: 0.2 for sym in ("A", "B", "C", "D")})
+    started = time.perf_counter()
+    stats = fetcher.get_competitor_stats(["A", "B", "C", "D"], max_workers=4)
+    assert time.perf_counter() - started < 0.6  # 0.8s one after the other
+    assert [s["symbol"] for s in stats] == ["A", "B", "C", "D"] and all(s["info"] for s in stats)
+    assert fetcher.get_competitor_stats([]) == []
+
+
+def test_async_competitor_stats_match_the_threaded_ones(tmp_path):
+    fetcher = SlowFetcher(tmp_path, {"INFY": 0.05, "SLOW": 10, "WIPRO": 0.05})
+    stats = asyncio.run(fetcher.get_competitor_stats_async(["INFY", "SLOW", "BAD", "WIPRO"], timeout=0.5))
+    assert stats == EXPECTED
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from finquery.database import DataBaseManager
+from finquery.ingest import BulkIngestor, file_hash
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DataBaseManager(str(tmp_path / "reports.db"))
+
+
+@pytest.fixture
+def folder(tmp_path):
+    root = tmp_path / "pdfs"
+    (root / "2024").mkdir(parents=True)
+    for name in ("a.pdf", "b.PDF", "2024/c.pdf", "notes.txt"):
+        (root / name).write_bytes(b"%PDF-1.4 " + name.encode())
+    return root
+
+
+def entry(path, status, **fields):
+    stat = os.stat(path)
+    return {"path": str(path), "size": stat.st_size, "mtime": stat.st_mtime, "content_hash": file_hash(path),
+            "status": status, "report_id": None, "error": None, **fields}
+
+
+def test_scan_resumes_after_committed_files(db, folder, tmp_path):
+    ingestor = BulkIngestor(db, str(tmp_path / "charts"))
+    todo, skipped = ingestor.scan(str(folder))
+    assert [os.path.basename(p) for p, _, _ in todo] == ["a.pdf", "b.PDF", "c.pdf"] and skipped == 0
+
+    report = {"ticker": "TCS", "summary": "- ok", "facts": [("revenue", "FY24", 2024, 0, 100.0)]}
+    ids = db.save_ingest_batch([entry(folder / "a.pdf", "done", report=report, pages=["page one"]),
+                                entry(folder / "b.PDF", "failed", error="ValueError: no text")], 1)
+    assert db.find_report_by_hash(file_hash(folder / "a.pdf")) == ids[str(folder / "a.pdf")]
+
+    todo, skipped = ingestor.scan(str(folder))
+    assert [os.path.basename(p) for p, _, _ in todo] == ["c.pdf"] and skipped == 2
+    todo, skipped = ingestor.scan(str(folder), retry_failed=True)
+    assert [os.path.basename(p) for p, _, _ in todo] == ["b.PDF", "c.pdf"] and skipped == 1
+
+
+def test_scan_picks_up_a_changed_file_again(db, folder, tmp_path):
+    db.save_ingest_batch([entry(folder / "a.pdf", "done", report={"ticker": "TCS", "summary": "- ok"})], 1)
+    (folder / "a.pdf").write_bytes(b"%PDF-1.4 a newer edition")
+    todo, _ = BulkIngestor(db, str(tmp_path / "charts")).scan(str(folder), pattern="a.pdf")
+    assert [os.path.basename(p) for p, _, _ in todo] == ["a.pdf"]
+
+
+def test_run_without_files_starts_no_workers(db, tmp_path):
+    assert BulkIngestor(db, str(tmp_path / "charts")).run([]) == {"done": 0, "duplicate": 0, "failed": 0}
@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from finquery.database import DataBaseManager
+from finquery.jobs import JobQueue
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DataBaseManager(str(tmp_path / "reports.db"))
+
+
+def age_job(db, job_id, seconds):
+    with db._transaction() as cursor:
+        cursor.execute("UPDATE jobs SET updated_at = datetime('now', ?) WHERE id = ?", (f"-{seconds} seconds", job_id))
+
+
+def is_fresh(db, job_id):
+    with db._transaction() as cursor:
+        cursor.execute("SELECT updated_at > datetime('now', '-60 seconds') FROM jobs WHERE id = ?", (job_id,))
+        return bool(cursor.fetchone()[0])
+
+
+def wait_until(check, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not check():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_job_waiting_in_the_queue_past_the_timeout_is_kept_alive(db):
+    queue = JobQueue(db, max_workers=1, heartbeat_seconds=0.02)
+    release = threading.Event()
+    ran = []
+    queue.submit(lambda job: release.wait(5))
+    waiting = queue.submit(lambda job: ran.append(job.id))
+
+    age_job(db, waiting, 7200)  # queued for two hours behind a slow upload
+    wait_until(lambda: is_fresh(db, waiting))  # the heartbeat touched it
+    assert db.fail_unfinished_jobs(older_than=1800) == 0
+    assert db.get_job(waiting)["status"] == "queued"
+
+    release.set()
+    wait_until(lambda: db.get_job(waiting)["status"] == "done")
+    assert ran == [waiting]
+    queue.shutdown()
+
+
+def test_job_failed_while_queued_is_not_run_but_cleaned_up(db):
+    queue = JobQueue(db, max_workers=1, heartbeat_seconds=60)
+    release = threading.Event()
+    ran, cleaned = [], []
+    queue.submit(lambda job: release.wait(5))
+    dropped = queue.submit(lambda job: ran.append(job.id), cleanup=lambda: cleaned.append(1))
+
+    age_job(db, dropped, 7200)
+    assert db.get_job(dropped)["status"] == "failed"  # no heartbeat came: abandoned
+    release.set()
+    queue.shutdown()
+    assert ran == [] and cleaned == [1]
+    assert db.get_job(dropped)["status"] == "failed"
+
+
+def test_failing_job_records_its_error_and_runs_cleanup(db):
+    queue = JobQueue(db, max_workers=1)
+    cleaned = []
+
+    def boom(job):
+        job.stage_started("extract")
+        job.stage_finished("extract", ok=False, error="could not read PDF")
+        raise RuntimeError("could not read PDF")
+
+    job_id = queue.submit(boom, cleanup=lambda: cleaned.append(1))
+    queue.shutdown()
+    job = db.get_job(job_id)
+    assert job["status"] == "failed" and job["error"] == "could not read PDF"
+    assert job["stages"] == {"extract": {"status": "failed", "seconds": 0.0, "error": "could not read PDF"}}
+    assert cleaned == [1]
@@ -0,0 +1,41 @@
+from finquery.locator import PageLocator
+
+FILLER = "The company continued to invest in its people and communities across the regions it serves. "
+COVER = "Tata Consultancy Services Limited Annual Report. Company overview: who we are. " + FILLER * 3
+AUDITOR = "Independent auditor's report. Key audit matter: revenue recognition. " + FILLER * 4
+STATEMENT = ("Consolidated statement of profit and loss for the year ended 31 March 2024 (Rs crore)\n"
+             "Particulars FY24 FY23 Q4 FY24 Q4 FY23\n"
+             "Revenue from operations 2,40,893 2,25,458 61,237 59,162\n"
+             "Total income 2,45,315 2,28,907 62,613 60,583\n"
+             "Profit before tax 62,087 56,907 16,295 15,353\n")
+
+
+def test_financial_statement_pages_are_chosen_in_page_order():
+    pages = [COVER, AUDITOR, FILLER * 4, STATEMENT, STATEMENT.replace("Consolidated", "Standalone")]
+    text = PageLocator(min_slice=100).select(pages, "financials", budget=5000)
+    assert text.startswith("[Page 4]\n") and "\n\n[Page 5]\n" in text
+    assert "[Page 1]" not in text and "[Page 2]" not in text and "[Page 3]" not in text
+
+
+def test_company_profile_prefers_the_opening_pages():
+    pages = [COVER, STATEMENT, FILLER * 4]
+    text = PageLocator(min_slice=100).select(pages, "company", budget=5000)
+    assert text.startswith("[Page 1]\n" + COVER.strip())
+    assert "[Page 2]" not in text
+
+
+def test_selection_stays_within_the_budget():
+    statement = "Unrelated front matter. " * 100 + STATEMENT
+    pages = [statement, STATEMENT, STATEMENT]
+    text = PageLocator(min_slice=100).select(pages, "financials", budget=800)
+    assert len(text) <= 800
+    cut, whole = text.split("\n\n[Page 2]\n")
+    assert whole.count(STATEMENT.strip()) == 2  # the best pages whole, the rest of the budget for a slice
+    # the slice of the long page starts just before its statement, not at its front matter
+    assert cut.startswith("[Page 1]\n") and "Consolidated statement" in cut
+    assert not cut.startswith("[Page 1]\nUnrelated")
+
+
+def test_nothing_relevant_returns_none():
+    assert PageLocator().select([FILLER * 4, "short"], "financials", budget=5000) is None
+    assert PageLocator().select([], "financials", budget=5000) is None
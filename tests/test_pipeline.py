@@ -0,0 +1,54 @@
+import threading
+import time
+
+from finquery.pipeline import StageGraph
+
+
+def test_independent_stages_run_concurrently_and_feed_their_dependents():
+    both_started = threading.Barrier(2, timeout=2)  # fails unless a and b run at the same time
+
+    def a():
+        both_started.wait()
+        return 1
+
+    def b():
+        both_started.wait()
+        return 2
+
+    graph = StageGraph(max_workers=2).add("a", a).add("b", b).add("sum", lambda a, b: a + b, deps=("a", "b"))
+    assert graph.run() == {"a": 1, "b": 2, "sum": 3}
+    assert graph.failed == {}
+
+
+def test_failed_and_slow_stages_use_their_fallback():
+    release = threading.Event()
+    events = []
+
+    def boom():
+        raise ValueError("bad PDF")
+
+    def slow():
+        release.wait(5)
+        return "late"
+
+    graph = (StageGraph()
+             .add("broken", boom, fallback=lambda: {})
+             .add("slow", slow, timeout=0.05, fallback="fallback")
+             .add("after", lambda slow: f"got {slow}", deps=("slow",)))
+    started = time.perf_counter()
+    results = graph.run(on_stage_done=lambda name, result, error: events.append((name, error is None)))
+    release.set()
+
+    assert time.perf_counter() - started < 2  # the timed-out stage was not waited for
+    assert results == {"broken": {}, "slow": "fallback", "after": "got fallback"}
+    assert graph.failed == {"broken": "bad PDF", "slow": "timed out after 0.05s"}
+    assert sorted(events) == [("after", True), ("broken", False), ("slow", False)]
+
+
+def test_given_results_satisfy_dependencies_and_unknown_ones_fail():
+    graph = StageGraph().add("chart", lambda chart_data: len(chart_data), deps=("chart_data",))
+    assert graph.run(given={"chart_data": {"FY24": 1}}) == {"chart": 1}
+
+    graph = StageGraph().add("chart", lambda chart_data: 1, deps=("chart_data",), fallback="none")
+    assert graph.run() == {"chart": "none"}
+    assert graph.failed == {"chart": "unmet dependencies"}
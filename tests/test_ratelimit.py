@@ -0,0 +1,26 @@
+from finquery.ratelimit import RateLimitScheduler
+
+
+def test_buckets_limit_one_process():
+    scheduler = RateLimitScheduler(per_minute=2, per_day=100)
+    assert scheduler.acquire(max_wait=0) and scheduler.acquire(max_wait=0)
+    assert not scheduler.acquire(max_wait=0)
+
+
+def test_shared_state_is_one_quota_for_every_scheduler(tmp_path):
+    path = str(tmp_path / "limits.db")
+    first = RateLimitScheduler(per_minute=5, per_day=3, db_path=path, name="api")
+    second = RateLimitScheduler(per_minute=5, per_day=3, db_path=path, name="api")
+    assert first.acquire(max_wait=0) and second.acquire(max_wait=0) and first.acquire(max_wait=0)
+    assert not second.acquire(max_wait=0)
+    # a restarted process sees the same (empty) daily bucket
+    assert not RateLimitScheduler(per_minute=5, per_day=3, db_path=path, name="api").acquire(max_wait=0)
+    # other names have their own quota
+    assert RateLimitScheduler(per_minute=5, per_day=3, db_path=path, name="other").acquire(max_wait=0)
+
+
+def test_penalize_is_shared(tmp_path):
+    path = str(tmp_path / "limits.db")
+    RateLimitScheduler(per_minute=5, per_day=100, db_path=path, name="api").penalize()
+    assert not RateLimitScheduler(per_minute=5, per_day=100, db_path=path, name="api").acquire(max_wait=0)
+
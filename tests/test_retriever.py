@@ -0,0 +1,84 @@
+import pytest
+
+from finquery.retriever import ReportIndex, chunk_text, merge_spans, tokenize
+
+SECTIONS = [
+    "The board met four times during the year to review strategy and governance matters. ",
+    "Revenue from operations grew to 2,40,893 crore in FY24 driven by banking clients. ",
+    "Attrition fell to 12.5 percent as hiring slowed and utilisation improved across units. ",
+    "The company declared a final dividend of 28 rupees per share for the financial year. ",
+]
+
+
+@pytest.fixture
+def text():
+    return "".join(section * 20 for section in SECTIONS)
+
+
+def test_tokenize_folds_digit_grouping_plurals_and_stopwords():
+    assert tokenize("What were the Revenues of 2,40,893 crore?") == ["revenue", "240893", "crore"]
+    assert tokenize("Margin was 24.6%") == ["margin", "24.6"]
+
+
+def test_chunks_cover_the_text_with_overlap_and_whole_words(text):
+    spans = chunk_text(text, chunk_size=500, overlap=100)
+    assert spans[0][0] == 0 and spans[-1][1] == len(text)
+    for (_, prev_end), (start, end) in zip(spans, spans[1:]):
+        assert start < prev_end  # consecutive chunks overlap
+        assert end - start <= 500
+    for _, end in spans[:-1]:
+        assert text[end] in " \n"  # cut at a word boundary
+
+
+def test_chunk_text_edge_cases():
+    assert chunk_text("") == []
+    assert chunk_text("short text", chunk_size=100) == [(0, 10)]
+    # no space to cut at: hard cut, still making progress
+    assert chunk_text("x" * 25, chunk_size=10, overlap=5) == [(0, 10), (5, 15), (10, 20), (15, 25)]
+
+
+def test_search_ranks_the_matching_section_first(text):
+    index = ReportIndex.build(text, chunk_size=400, overlap=50)
+    hits = index.search("How much did revenues grow?", top_k=3)
+    assert hits and [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+    start, end = index.spans[hits[0][0]]
+    assert "Revenue from operations" in text[start:end]
+
+    start, end = index.spans[index.search("final dividend per share")[0][0]]
+    assert "dividend" in text[start:end]
+
+
+def test_search_without_known_terms(text):
+    index = ReportIndex.build(text, chunk_size=400, overlap=50)
+    assert index.search("cryptocurrency") == []
+    assert index.search("the and of") == []
+    assert ReportIndex.build("").search("revenue") == []
+
+
+def test_select_spans_stays_in_budget_in_document_order(text):
+    index = ReportIndex.build(text, chunk_size=400, overlap=50)
+    spans = index.select_spans("attrition hiring utilisation", char_budget=1000, top_k=5)
+    assert spans == sorted(spans)
+    assert sum(end - start for start, end in spans) <= 1000
+    assert index.select_spans("cryptocurrency", char_budget=300) == [(0, 300)]
+
+
+def test_select_spans_merges_adjacent_chunks(text):
+    index = ReportIndex.build(text, chunk_size=400, overlap=50)
+    # chunks 3 and 4 share 50 characters: they come back as one span, the overlap counted once
+    first, second = (tuple(int(x) for x in index.spans[i]) for i in (3, 4))
+    assert second[0] < first[1]
+    index.search = lambda query, top_k: [(4, 2.0), (3, 1.0)]
+    budget = second[1] - first[0]
+    assert index.select_spans("q", char_budget=budget) == [(first[0], second[1])]
+
+
+def test_merge_spans():
+    assert merge_spans([(50, 60), (0, 10), (5, 20), (20, 30)]) == [(0, 30), (50, 60)]
+    assert merge_spans([]) == []
+
+
+def test_index_round_trips_through_bytes(text):
+    index = ReportIndex.build(text, chunk_size=400, overlap=50)
+    restored = ReportIndex.from_bytes(index.to_bytes())
+    assert restored.search("dividend share") == index.search("dividend share")
@@ -0,0 +1,99 @@
+import pytest
+
+from finquery.cache import SQLiteCache
+from finquery.fetcher import DataFetcher
+from finquery.symbols import Listing, SymbolMaster
+
+LISTINGS = [
+    Listing("LT", "Larsen & Toubro Limited", "NSE"),
+    Listing("LTTS", "L&T Technology Services Limited", "NSE"),
+    Listing("TCS", "Tata Consultancy Services Limited", "NSE"),
+    Listing("TATAMOTORS", "Tata Motors Limited", "NSE"),
+    Listing("INFY", "Infosys Limited", "NSE"),
+    Listing("INFY", "Infosys Limited", "NYSE"),
+]
+
+
+@pytest.fixture
+def master():
+    return SymbolMaster(LISTINGS)
+
+
+@pytest.mark.parametrize("query, symbol", [
+    ("TCS", "TCS"),
+    ("tcs.ns", "TCS"),
+    ("Larsen & Toubro", "LT"),
+    ("Tata Consultancy", "TCS"),
+    ("Infosys", "INFY"),
+    ("L&T", None),  # initials: not taken for L&T Technology Services
+    ("Tata", None),  # ambiguous prefix
+    ("Infos", None),  # prefixes stop at word boundaries
+])
+def test_resolve(master, query, symbol):
+    listing = master.resolve(query)
+    assert (listing.symbol if listing else None) == symbol
+
+
+def test_resolve_prefers_home_exchange(master):
+    assert master.resolve("INFY").exchange == "NSE"
+
+
+def test_bundled_master_is_partial_and_custom_files_are_complete(tmp_path):
+    assert not SymbolMaster.from_csv().complete
+    path = tmp_path / "listing.csv"
+    path.write_text("symbol,name,exchange\nTCS,Tata Consultancy Services Limited,NSE\n")
+    assert SymbolMaster.from_csv(str(path)).complete
+
+
+class StubFetcher(DataFetcher):
+    """DataFetcher whose sources answer from dicts: a missing symbol is "unknown", "error" an error."""
+
+    def __init__(self, tmp_path, symbols, yahoo=None, alpha=None):
+        super().__init__(cache=SQLiteCache(str(tmp_path / "market.db"), table="market_cache"), symbols=symbols)
+        self.yahoo, self.alpha, self.calls = yahoo or {}, alpha or {}, []
+
+    def _fetch_indian_data(self, ticker):
+        self.calls.append(("yfinance", ticker))
+        return self.yahoo.get(ticker, {})
+
+    def _fetch_alpha_vantage_data(self, ticker):
+        self.calls.append(("alpha_vantage", ticker))
+        value = self.alpha.get(ticker, {})
+        return None if value == "error" else value
+
+
+@pytest.fixture(autouse=True)
+def api_key(monkeypatch):
+    monkeypatch.setenv("ALPHA_VANTAGE_KEY", "test")
+
+
+def test_partial_master_falls_back_to_upstream(tmp_path, master):
+    fetcher = StubFetcher(tmp_path, master, alpha={"GOOG": {"Name": "Alphabet Inc"}})
+    assert fetcher.get_company_overview("GOOG") == {"Name": "Alphabet Inc"}
+    assert fetcher.calls == [("yfinance", "GOOG"), ("alpha_vantage", "GOOG")]
+    assert not master.is_bad("GOOG")
+
+
+def test_resolved_listing_goes_to_its_source(tmp_path, master):
+    fetcher = StubFetcher(tmp_path, master, yahoo={"TCS.NS": {"Name": "TCS"}})
+    assert fetcher.get_company_overview("Tata Consultancy") == {"Name": "TCS"}
+    assert fetcher.calls == [("yfinance", "TCS.NS")]
+
+
+def test_only_symbols_unknown_upstream_are_negative_cached(tmp_path, master):
+    fetcher = StubFetcher(tmp_path, master, alpha={"FLAKY": "error"})
+    assert fetcher.get_company_overview("FLAKY") is None
+    assert not master.is_bad("FLAKY")
+
+    assert fetcher.get_company_overview("NOPE") is None
+    assert master.is_bad("NOPE")
+    fetcher.calls.clear()
+    assert fetcher.get_company_overview("NOPE") is None
+    assert fetcher.calls == []
+
+
+def test_complete_master_skips_unlisted_names(tmp_path):
+    fetcher = StubFetcher(tmp_path, SymbolMaster(LISTINGS, complete=True))
+    assert fetcher.get_company_overview("GOOG") is None
+    assert fetcher.calls == []
+    assert not fetcher.symbols.is_bad("GOOG")
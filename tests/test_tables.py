@@ -0,0 +1,117 @@
+import pytest
+
+from finquery.tables import (RevenueTableExtractor, fiscal_year, normalize_period, parse_amount, parse_unit,
+                             period_sort_key)
+
+ROWS = "Particulars FY23 FY24 FY25\nRevenue 27,927 29,080 30,179\n"
+
+
+@pytest.mark.parametrize("label, expected", [
+    ("FY24", ("FY24", False)),
+    ("FY2024", ("FY24", False)),
+    ("FY2023-24", ("FY24", False)),
+    ("FY23-24", ("FY24", False)),
+    ("2023-24", ("FY24", False)),
+    ("Q1 FY25", ("Q1 FY25", False)),
+    ("Q1FY'25", ("Q1 FY25", False)),
+    ("Q3 2024-25", ("Q3 FY25", False)),
+    ("FY26E", ("FY26", True)),
+    ("FY26P", ("FY26", True)),
+    ("Revenue", None),
+])
+def test_normalize_period(label, expected):
+    assert normalize_period(label) == expected
+
+
+@pytest.mark.parametrize("label, expected", [
+    ("FY24", 2024),
+    ("FY2023-24", 2024),
+    ("Q3 2024-25", 2025),
+    ("FY99", 1999),
+    ("FY1998", 1998),
+    ("FY1999-00", 2000),
+    ("Revenue", None),
+])
+def test_fiscal_year(label, expected):
+    assert fiscal_year(label) == expected
+
+
+def test_period_sort_key_puts_quarters_before_their_full_year():
+    keys = ["FY25", "Q4 FY25", "FY24", "Q1 FY25"]
+    assert sorted(keys, key=period_sort_key) == ["FY24", "Q1 FY25", "Q4 FY25", "FY25"]
+    assert sorted(["FY00", "FY24", "FY99"], key=period_sort_key) == ["FY99", "FY00", "FY24"]
+
+
+@pytest.mark.parametrize("token, expected", [
+    ("1,54,119", 154119.0), ("(6,793)", -6793.0), ("12.5", 12.5), ("-", None), ("12%", None), ("n/a", None),
+])
+def test_parse_amount(token, expected):
+    assert parse_amount(token) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("(₹ crore)", (1.0, True)), ("Rs in lakhs", (0.01, True)), ("(Rs mn)", (0.1, False)),
+    ("US$ bn", (100.0, False)), ("Key financials", None),
+])
+def test_parse_unit(text, expected):
+    assert parse_unit(text) == expected
+
+
+def extract(text):
+    return RevenueTableExtractor().extract(pages=[text])
+
+
+def test_crore_table_is_read_as_is():
+    data, confidence = extract("Key financials (₹ crore)\n" + ROWS)
+    assert data == {"FY23": 27927, "FY24": 29080, "FY25": 30179}
+    assert confidence >= RevenueTableExtractor().min_confidence
+
+
+def test_rupee_millions_are_converted_to_crore():
+    data, confidence = extract("Key financials (Rs mn)\n" + ROWS)
+    assert data == {"FY23": 2792.7, "FY24": 2908.0, "FY25": 3017.9}
+    assert confidence >= RevenueTableExtractor().min_confidence
+
+
+def test_dollar_table_is_rejected():
+    assert extract("Key financials (US$ mn)\n" + ROWS) == ({}, 0.0)
+
+
+def test_dollar_revenue_row_is_rejected():
+    assert extract("Particulars FY23 FY24 FY25\nRevenue (US$ mn) 27,927 29,080 30,179\n") == ({}, 0.0)
+
+
+def test_row_without_a_unit_goes_to_the_llm():
+    data, confidence = extract("Key financials\n" + ROWS)
+    assert data
+    assert confidence < RevenueTableExtractor().min_confidence
+
+
+def test_millions_on_a_page_with_two_currencies_go_to_the_llm():
+    _, confidence = extract("Key financials (mn), ₹ and US$ figures\n" + ROWS)
+    assert confidence < RevenueTableExtractor().min_confidence
+
+
+def test_crore_table_on_a_page_mentioning_dollars_is_kept():
+    data, confidence = extract("Key financials (₹ crore); US$ revenue grew 4%\n" + ROWS)
+    assert data["FY25"] == 30179
+    assert confidence >= RevenueTableExtractor().min_confidence
+
+
+def test_estimate_columns_are_dropped():
+    data, _ = extract("(₹ crore)\nParticulars FY24 FY25 FY26E\nRevenue 29,080 30,179 32,000\n")
+    assert data == {"FY24": 29080, "FY25": 30179}
+
+
+def test_growth_columns_are_skipped():
+    data, _ = extract("(₹ crore)\nParticulars FY24 FY25 YoY (%)\nRevenue 29,080 30,179 3.8%\n")
+    assert data == {"FY24": 29080, "FY25": 30179}
+
+
+def test_inline_pairs():
+    data, _ = extract("Revenue (₹ crore) FY21 164,177 FY22 191,754 FY23 225,458\n")
+    assert data == {"FY21": 164177, "FY22": 191754, "FY23": 225458}
+
+
+def test_revenue_growth_row_is_not_revenue():
+    assert extract("(₹ crore)\nParticulars FY24 FY25\nRevenue growth 7 8\n") == ({}, 0.0)
@@ -0,0 +1,58 @@
+import hashlib
+import os
+import time
+
+import pytest
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from finquery.uploads import SPOOL_PREFIX, UploadSpool, cleanup_stale_spools
+
+DATA = b"%PDF-1.7\n" + b"x" * 5000
+
+
+def fill(spool, data=DATA, chunk=1000):
+    for start in range(0, len(data), chunk):
+        spool.write(data[start:start + chunk])
+    spool.seek(0)
+    return spool
+
+
+def test_small_upload_stays_in_memory(tmp_path):
+    spool = fill(UploadSpool(memory_limit=10000, spool_dir=str(tmp_path)))
+    assert spool.path is None and os.listdir(tmp_path) == []
+    assert spool.hexdigest() == hashlib.sha256(DATA).hexdigest()
+    assert spool.looks_like_pdf() and spool.source() == DATA and spool.read() == DATA
+
+
+def test_large_upload_spills_to_a_file_until_released(tmp_path):
+    spool = fill(UploadSpool(memory_limit=2000, spool_dir=str(tmp_path)))
+    path = spool.source()
+    assert path == spool.path and os.path.basename(path).startswith(SPOOL_PREFIX)
+    assert spool.hexdigest() == hashlib.sha256(DATA).hexdigest()
+    spool.close()  # the request ends; a claimed spool is still needed by its job
+    with open(path, "rb") as f:
+        assert f.read() == DATA
+    spool.release()
+    assert not os.path.exists(path) and spool.path is None
+
+
+def test_upload_over_the_limit_is_rejected_and_dropped(tmp_path):
+    spool = UploadSpool(memory_limit=1000, max_bytes=3000, spool_dir=str(tmp_path))
+    with pytest.raises(RequestEntityTooLarge):
+        fill(spool)
+    assert os.listdir(tmp_path) == []
+
+
+def test_not_a_pdf(tmp_path):
+    assert not fill(UploadSpool(spool_dir=str(tmp_path)), b"<html>" + b"x" * 10).looks_like_pdf()
+
+
+def test_cleanup_removes_only_old_spool_files(tmp_path):
+    for name in (f"{SPOOL_PREFIX}old.pdf", f"{SPOOL_PREFIX}new.pdf", "report.pdf"):
+        (tmp_path / name).write_bytes(b"%PDF")
+    old = time.time() - 7200
+    os.utime(tmp_path / f"{SPOOL_PREFIX}old.pdf", (old, old))
+    os.utime(tmp_path / "report.pdf", (old, old))
+    assert cleanup_stale_spools(str(tmp_path), max_age=3600) == 1
+    assert sorted(os.listdir(tmp_path)) == ["report.pdf", f"{SPOOL_PREFIX}new.pdf"]
+    assert cleanup_stale_spools(str(tmp_path / "missing")) == 0
@@ -0,0 +1,72 @@
+import os
+import time
+
+from finquery.visualizer import DataVisualizer
+
+
+def make_charts(folder, count, age=7200):
+    names = []
+    for i in range(count):
+        name = f"{i:032x}.png"
+        path = folder / name
+        path.write_bytes(b"png")
+        stamp = time.time() - age + i  # chart 0 is the oldest
+        os.utime(path, (stamp, stamp))
+        names.append(name)
+    return names
+
+
+def test_evict_removes_oldest_charts_beyond_the_limit(tmp_path):
+    names = make_charts(tmp_path, 5)
+    DataVisualizer(max_cached_files=3)._evict(str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == names[2:]
+
+
+def test_evict_spares_charts_reports_reference(tmp_path):
+    names = make_charts(tmp_path, 5)
+    in_use = set(names[:3])
+    DataVisualizer(max_cached_files=1, charts_in_use=lambda: in_use)._evict(str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == names[:3] + names[4:]
+
+
+def test_evict_spares_charts_written_recently(tmp_path):
+    names = make_charts(tmp_path, 4, age=60)
+    DataVisualizer(max_cached_files=1, charts_in_use=set)._evict(str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == names
+
+
+class CountingVisualizer(DataVisualizer):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.renders = 0
+
+    def render_bar_chart(self, data_dict, chart_title, fmt="png"):
+        self.renders += 1
+        return b"png"
+
+
+def test_get_chart_reuses_and_redraws_an_evicted_chart(tmp_path):
+    visualizer = CountingVisualizer()
+    name = visualizer.get_chart({"FY24": 1}, "Revenue", str(tmp_path))
+    assert visualizer.get_chart({"FY24": 1}, "Revenue", str(tmp_path)) == name
+    assert visualizer.renders == 1
+
+    os.remove(tmp_path / name)  # evicted between two requests
+    assert visualizer.get_chart({"FY24": 1}, "Revenue", str(tmp_path)) == name
+    assert visualizer.renders == 2 and (tmp_path / name).read_bytes() == b"png"
+
+
+def test_evict_spares_a_chart_reused_after_the_scan(tmp_path, monkeypatch):
+    names = make_charts(tmp_path, 3)
+    visualizer = DataVisualizer(max_cached_files=1, charts_in_use=set)
+    stat = os.stat
+
+    def reuse_then_stat(path, *args, **kwargs):
+        if path.endswith(names[0]):
+            os.utime(path)  # get_chart touches the oldest chart while eviction runs
+        return stat(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, "stat", reuse_then_stat)
+    visualizer._evict(str(tmp_path))
+    monkeypatch.undo()
+    assert sorted(os.listdir(tmp_path)) == [names[0], names[2]]